@@ -27,6 +27,32 @@ MAX_ITERATIONS = 10              # Max conversation loop iterations
 COST_WARNING_THRESHOLD = 0.50    # Warn if request exceeds $0.50
 MAX_COST_PER_REQUEST = 2.00      # Hard limit, abort if exceeded
 
+# API Client Configuration
+# The SDK retries 429/5xx with jittered exponential backoff and honors Retry-After
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+OPENAI_TIMEOUT = float(os.getenv("OPENAI_TIMEOUT", "600"))  # Seconds per request
+
+# Response Cache
+# Final answers to exact repeats of a request are cached
+RESPONSE_CACHE_ENABLED = os.getenv("LOLO_RESPONSE_CACHE", "1") != "0"
+# Optional similarity matching of near-identical questions, off unless both are set:
+# a directory with an (INT8 quantized) ONNX sentence-transformer and tokenizer.json
+# (needs onnxruntime), and the cosine similarity threshold calibrated for that model.
+SEMANTIC_CACHE_MODEL_DIR = os.getenv("LOLO_EMBEDDING_MODEL_DIR")
+SEMANTIC_CACHE_THRESHOLD = (
+    float(os.environ["LOLO_SEMANTIC_CACHE_THRESHOLD"]) if os.getenv("LOLO_SEMANTIC_CACHE_THRESHOLD") else None
+)
+
+# Image Uploads
+# Local images are sent inline as base64 data URLs. With LOLO_IMAGE_UPLOAD=1 they are
+# uploaded to the Files API once per run and sent by file_id instead; the uploaded
+# files are deleted again when Lolo exits.
+IMAGE_UPLOAD_ENABLED = os.getenv("LOLO_IMAGE_UPLOAD", "0") == "1"
+
+# Image Editing
+# Edit inputs with a longer edge than this are downscaled before upload (0 = never)
+FLUX_MAX_EDGE = int(os.getenv("FLUX_MAX_EDGE", "2048"))
+
 # Pricing per 1M tokens (input / output / cached)
 MODEL_PRICING = {
     "gpt-5.2" : {"input": 1.75, "output": 14.00, "cached": 0.175},
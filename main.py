@@ -26,22 +26,6 @@ from config.settings import (
     get_system_prompt
 )
 from services import OpenAIService, MemoryManager
-from tools import (
-    web_search_tool_definition,
-    fetch_webpage,
-    web_fetch_tool_definition,
-    analyze_image,
-    analyze_image_tool_definition,
-    generate_image,
-    generate_image_tool_definition,
-    edit_image,
-    edit_image_tool_definition,
-    execute_command,
-    execute_command_tool_definition,
-    execute_python,
-    python_executor_tool_definition,
-)
-from tools.terminal import classify_command_risk, prompt_user_confirmation
 
 # Initialize Rich console
 console = Console()
@@ -59,6 +43,24 @@ def get_available_tools(ask_mode: bool = False):
     """
     import os
     
+    # Imported on first use: the tool modules pull in PIL, bs4 and requests,
+    # which `--help` or `--list-voices` never need
+    from tools import (
+        web_search_tool_definition,
+        fetch_webpage,
+        web_fetch_tool_definition,
+        analyze_image,
+        analyze_image_tool_definition,
+        generate_image,
+        generate_image_tool_definition,
+        edit_image,
+        edit_image_tool_definition,
+        execute_command,
+        execute_command_tool_definition,
+        execute_python,
+        python_executor_tool_definition,
+    )
+    
     # Base tools available in all modes
     tools = [
         web_search_tool_definition,
@@ -414,6 +416,7 @@ def process_question(question: str, memory_manager: MemoryManager, memory: dict,
             # Check if any execute_command calls are dangerous and need confirmation BEFORE spinner
             # This ensures the confirmation prompt can properly read stdin
             dangerous_commands_confirmed = {}
+            from tools.terminal import classify_command_risk, prompt_user_confirmation
             for item in response.output:
                 if item.type == "function_call" and item.name == "execute_command":
                     if hasattr(item, "arguments"):
@@ -643,6 +646,7 @@ Examples:
   python main.py --voice                                 # Voice mode with speech input/output
   python main.py --voice --ptt                           # Voice mode with push-to-talk (hold Space)
   python main.py --voice --ask                           # Voice mode, read-only
+  python main.py --voice --resume                        # Voice mode, continue the last voice session
   python main.py --list-voices                           # List available voices
         """
     )
@@ -691,6 +695,12 @@ Examples:
         help="Push-to-talk mode: hold Spacebar to record (prevents accidental voice input)"
     )
     
+    parser.add_argument(
+        "--resume",
+        action="store_true",
+        help="Voice mode: continue the conversation of the last voice session"
+    )
+    
     return parser.parse_args()
 
 
@@ -749,7 +759,7 @@ def main():
     if args.voice:
         from services import run_voice_mode
         console.print()
-        run_voice_mode(ask_mode=args.ask, voice=args.voice_name, push_to_talk=args.ptt)
+        run_voice_mode(ask_mode=args.ask, voice=args.voice_name, push_to_talk=args.ptt, resume=args.resume)
         return
     
     # For non-voice mode, require a question
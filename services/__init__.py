@@ -1,7 +1,9 @@
 """Services package."""
 from .openai_service import OpenAIService
 from .memory_manager import MemoryManager
-from .cache_manager import CacheManager, web_cache, system_cache
+from .cache_manager import CacheManager, web_cache, system_cache, response_cache
+from .response_cache import ResponseCache
+from .onnx_embedder import OnnxEmbedder
 from .realtime_service import RealtimeService
 from .audio_handler import AudioHandler
 from .voice_session import VoiceSession, run_voice_mode
@@ -12,6 +14,9 @@ __all__ = [
     "CacheManager",
     "web_cache",
     "system_cache",
+    "response_cache",
+    "ResponseCache",
+    "OnnxEmbedder",
     "RealtimeService",
     "AudioHandler",
     "VoiceSession",
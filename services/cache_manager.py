@@ -2,7 +2,7 @@
 import json
 import time
 from pathlib import Path
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
 
 
 class CacheManager:
@@ -30,6 +30,37 @@ class CacheManager:
         key_hash = hashlib.md5(key.encode()).hexdigest()
         return self.cache_dir / f"{key_hash}.json"
     
+    def _load_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        """Get the raw cache entry for a key, expired or not."""
+        # Check memory cache first
+        entry = self._memory_cache.get(key)
+        if entry is not None:
+            return entry
+        
+        # Check disk cache
+        cache_path = self._get_cache_path(key)
+        if not cache_path.exists():
+            return None
+        
+        try:
+            with open(cache_path, 'r') as f:
+                entry = json.load(f)
+        except Exception:
+            # If there's any error reading cache, treat it as missing
+            return None
+        
+        # Add to memory cache for faster access
+        self._memory_cache[key] = entry
+        return entry
+    
+    def _evict(self, key: str):
+        """Remove a cache entry from memory and disk."""
+        self._memory_cache.pop(key, None)
+        try:
+            self._get_cache_path(key).unlink()
+        except OSError:
+            pass
+    
     def get(self, key: str) -> Optional[Any]:
         """
         Get a value from cache.
@@ -40,37 +71,39 @@ class CacheManager:
         Returns:
             Cached value or None if not found or expired
         """
-        # Check memory cache first
-        if key in self._memory_cache:
-            entry = self._memory_cache[key]
-            if time.time() - entry["timestamp"] < self.ttl:
-                return entry["value"]
-            else:
-                # Expired, remove from memory cache
-                del self._memory_cache[key]
-        
-        # Check disk cache
-        cache_path = self._get_cache_path(key)
-        if not cache_path.exists():
+        entry = self._load_entry(key)
+        if entry is None:
             return None
         
-        try:
-            with open(cache_path, 'r') as f:
-                entry = json.load(f)
-            
-            # Check if expired
-            if time.time() - entry["timestamp"] > self.ttl:
-                # Expired, delete file
-                cache_path.unlink()
-                return None
-            
-            # Add to memory cache for faster access
-            self._memory_cache[key] = entry
-            
+        if time.time() - entry["timestamp"] < self.ttl:
             return entry["value"]
-        except Exception:
-            # If there's any error reading cache, return None
+        
+        # Expired, delete it
+        self._evict(key)
+        return None
+    
+    def get_stale(self, key: str, max_stale: float) -> Optional[Tuple[Any, float]]:
+        """
+        Get a value from cache, also returning it up to `max_stale` seconds past its TTL.
+        
+        Args:
+            key: Cache key
+            max_stale: Seconds after expiry during which the value is still returned
+        
+        Returns:
+            Tuple of (cached value, age in seconds), or None if not found or too old
+        """
+        entry = self._load_entry(key)
+        if entry is None:
             return None
+        
+        age = time.time() - entry["timestamp"]
+        if age < self.ttl + max_stale:
+            return entry["value"], age
+        
+        # Too old even to serve stale, delete it
+        self._evict(key)
+        return None
     
     def set(self, key: str, value: Any):
         """
@@ -132,3 +165,6 @@ web_cache = CacheManager(cache_dir="~/.lolo/cache/web", ttl=3600)
 
 # Global cache instance for system info (5 minutes TTL)
 system_cache = CacheManager(cache_dir="~/.lolo/cache/system", ttl=300)
+
+# Global cache instance for model responses (15 minutes TTL)
+response_cache = CacheManager(cache_dir="~/.lolo/cache/responses", ttl=900)
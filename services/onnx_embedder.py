@@ -0,0 +1,102 @@
+"""Sentence embeddings from a quantized ONNX model for the response cache.
+
+Expects a directory with a sentence-transformer exported to ONNX (for example
+all-MiniLM-L6-v2 via `optimum-cli export onnx --task feature-extraction`),
+ideally quantized with onnxruntime.quantization.quantize_dynamic to INT8,
+plus its tokenizer.json.
+"""
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+# numpy, onnxruntime and tokenizers are optional (without them the response cache only
+# matches exact repeats) and imported where they are used, so startup never loads them
+# unless the semantic cache is enabled
+
+# Model files tried in order, INT8 quantized first
+MODEL_FILENAMES = ("model_quantized.onnx", "model.onnx")
+
+# Prompts are truncated to this many tokens before embedding
+MAX_TOKENS = 128
+
+
+class OnnxEmbedder:
+    """Mean-pooled, L2-normalized sentence embeddings computed with ONNX Runtime on CPU."""
+    
+    def __init__(self, model_dir: str):
+        """
+        Load the model and tokenizer.
+        
+        Args:
+            model_dir: Directory containing the ONNX model and tokenizer.json
+        
+        Raises:
+            ImportError: If onnxruntime or tokenizers is not installed
+            FileNotFoundError: If the directory has no ONNX model
+        """
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+        
+        model_dir = Path(model_dir).expanduser()
+        model_path = next(
+            (model_dir / name for name in MODEL_FILENAMES if (model_dir / name).exists()),
+            None
+        )
+        if model_path is None:
+            raise FileNotFoundError(f"No ONNX model found in {model_dir}")
+        
+        self.session = ort.InferenceSession(str(model_path), providers=["CPUExecutionProvider"])
+        self._input_names = {model_input.name for model_input in self.session.get_inputs()}
+        
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=MAX_TOKENS)
+        self.tokenizer.enable_padding()
+    
+    def __call__(self, text: str) -> List[float]:
+        """Embed a single text."""
+        return self.embed_batch([text])[0]
+    
+    def embed_batch(self, texts: Sequence[str]) -> List[List[float]]:
+        """
+        Embed several texts in one session run.
+        
+        Args:
+            texts: Normalized texts to embed
+        
+        Returns:
+            One unit-length vector per text
+        """
+        import numpy as np
+        
+        encodings = self.tokenizer.encode_batch(list(texts))
+        input_ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+        attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if "token_type_ids" in self._input_names:
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        
+        hidden = self.session.run(None, feeds)[0]
+        
+        # Mean pooling over real (non-padding) tokens, then L2 normalization
+        mask = attention_mask[..., None].astype(np.float32)
+        pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.tolist()
+
+
+def load_embedder(model_dir: Optional[str]) -> Optional[OnnxEmbedder]:
+    """
+    Load the ONNX embedder if it is configured and its dependencies are installed.
+    
+    Args:
+        model_dir: Model directory, or None if not configured
+    
+    Returns:
+        OnnxEmbedder, or None if similarity matching is not available
+    """
+    if not model_dir:
+        return None
+    try:
+        return OnnxEmbedder(model_dir)
+    except Exception:  # Dependencies missing (ImportError) or model not loadable
+        return None
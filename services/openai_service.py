@@ -1,17 +1,117 @@
 """OpenAI service for handling API interactions."""
-import json
+import atexit
+import copy
+import functools
+import hashlib
+import inspect
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from openai import OpenAI
-from typing import List, Dict, Any, Optional
+from openai.types.responses import Response
+from typing import List, Dict, Any, Optional, Callable, FrozenSet, Iterator, Tuple
+
+from config.settings import (
+    IMAGE_UPLOAD_ENABLED,
+    OPENAI_MAX_RETRIES,
+    OPENAI_TIMEOUT,
+    RESPONSE_CACHE_ENABLED,
+    SEMANTIC_CACHE_MODEL_DIR,
+    SEMANTIC_CACHE_THRESHOLD,
+)
+from utils import fast_json
+from .cache_manager import response_cache
+from .onnx_embedder import load_embedder
+from .response_cache import ResponseCache
+
+# Prompt sent with an image when the model did not ask a specific question
+DEFAULT_IMAGE_QUESTION = "What's in this image?"
+
+# Files API IDs of local images uploaded by this process, keyed by (path, mtime, size).
+# Shared by every OpenAIService so an image is uploaded once, and deleted again at exit.
+_uploaded_images: Dict[Tuple[str, int, int], str] = {}
+_upload_lock = threading.Lock()
+_upload_client: Optional[OpenAI] = None
+
+# Seconds within which an identical request returns the previous response
+DUPLICATE_REQUEST_WINDOW = 5.0
+
+# (request hash, response, monotonic time) of the last API call, to absorb duplicate
+# submits. Shared by every OpenAIService, since main.py creates one per question.
+_last_request: Optional[Tuple[bytes, Any, float]] = None
+_last_request_lock = threading.Lock()
+
+# Tools that run on the calling thread in response order instead of the tool pool.
+# Shell commands can depend on each other and may prompt for confirmation on stdin.
+SERIAL_TOOLS = {"execute_command"}
+
+# Serialized request JSON minus the input, keyed by the model settings. Each entry holds a
+# copy of the tools it was built from and is rebuilt when the tools differ. Every call of
+# an agent loop (and every question) sends the same tools, only the input grows.
+_STATIC_BODY_CACHE: Dict[tuple, tuple] = {}
+
+# Pool the I/O-bound tool calls of a response run on, shared by every OpenAIService.
+# Separate from utils.background_executor, which the tools use for their own helper work.
+_TOOL_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix="lolo-tool")
+
+
+def _delete_files(client: OpenAI, file_ids: List[str]):
+    """Delete uploaded files, ignoring failures (they are only storage)."""
+    # Short timeout and no retries, this runs while the CLI is exiting
+    client = client.with_options(timeout=5, max_retries=0)
+    for file_id in file_ids:
+        try:
+            client.files.delete(file_id)
+        except Exception:
+            pass
+
+
+def _delete_uploaded_images():
+    """Delete the images this process uploaded to the Files API (registered with atexit)."""
+    with _upload_lock:
+        file_ids = list(_uploaded_images.values())
+        _uploaded_images.clear()
+    if file_ids:
+        _delete_files(_upload_client, file_ids)
+
+
+@functools.lru_cache(maxsize=None)
+def shared_response_cache() -> ResponseCache:
+    """
+    Get the process-wide response cache, built on first use.
+    
+    The ONNX embedder (if similarity matching is configured) is loaded once here,
+    not for every OpenAIService.
+    
+    Returns:
+        ResponseCache backed by the persistent response store
+    """
+    embed = load_embedder(SEMANTIC_CACHE_MODEL_DIR) if SEMANTIC_CACHE_THRESHOLD is not None else None
+    return ResponseCache(response_cache, threshold=SEMANTIC_CACHE_THRESHOLD, embed=embed)
 
 
 class OpenAIService:
     """Service class to handle OpenAI API interactions using Responses API."""
     
+    __slots__ = (
+        "client",
+        "model",
+        "reasoning",
+        "verbosity",
+        "response_cache",
+        "_base_kwargs",
+        "_supports_raw_body",
+        "_argument_hooks",
+        "_output_handlers",
+    )
+    
     def __init__(
         self, 
         model: str = "gpt-5.1",
         reasoning: str = "none",
-        verbosity: str = "medium"
+        verbosity: str = "medium",
+        use_cache: bool = RESPONSE_CACHE_ENABLED
     ):
         """
         Initialize the OpenAI service.
@@ -20,11 +120,32 @@ class OpenAIService:
             model: The model to use for completions (default: gpt-5.1)
             reasoning: Reasoning effort level (none, low, medium, high)
             verbosity: Output verbosity level (low, medium, high)
+            use_cache: Whether to serve repeated questions from the response cache
         """
-        self.client = OpenAI()
+        # Transient 429/5xx errors are retried by the SDK instead of failing the agent step
+        self.client = OpenAI(max_retries=OPENAI_MAX_RETRIES, timeout=OPENAI_TIMEOUT)
         self.model = model
         self.reasoning = reasoning
         self.verbosity = verbosity
+        self.response_cache = shared_response_cache() if use_cache else None
+        
+        # Per-call kwargs start as a copy of this; reasoning/text are the defaults unless overridden
+        self._base_kwargs = {
+            "model": model,
+            "reasoning": {"effort": reasoning},
+            "text": {"verbosity": verbosity},
+        }
+        
+        self._supports_raw_body = "content" in inspect.signature(self.client.post).parameters
+        
+        # Per-tool hooks, built once instead of branching on the name for every call
+        self._argument_hooks = {
+            "execute_command": self._apply_pre_confirmation,
+        }
+        self._output_handlers = {
+            "analyze_image": self._handle_analyze_image_output,
+        }
+    
     
     def create_response(
         self,
@@ -47,26 +168,86 @@ class OpenAIService:
         Returns:
             The API response object
         """
-        kwargs = {
-            "model": self.model,
-            "tools": tools,
-            "input": input_list,
-            "tool_choice": tool_choice,
-        }
+        global _last_request
+        kwargs = self._build_kwargs(input_list, tools, reasoning, text, tool_choice)
+        body = self._serialize_body(kwargs)
         
-        # Add reasoning configuration
-        if reasoning:
-            kwargs["reasoning"] = reasoning
+        # A re-issued identical request (retry, re-render) gets the response it just got
+        request_key = hashlib.blake2b(body, digest_size=16).digest()
+        with _last_request_lock:
+            last = _last_request
+        if last and last[0] == request_key and time.monotonic() - last[2] < DUPLICATE_REQUEST_WINDOW:
+            return last[1]
+        
+        if self.response_cache:
+            cached = self.response_cache.get(kwargs)
+            if cached is not None:
+                return cached
+        
+        if self._supports_raw_body:
+            # Send pre-serialized JSON, skipping the SDK's per-call transform of the whole body
+            response = self.client.post(
+                "/responses",
+                cast_to=Response,
+                content=body,
+                options={"headers": {"Content-Type": "application/json"}}
+            )
         else:
-            kwargs["reasoning"] = {"effort": self.reasoning}
+            response = self.client.responses.create(**kwargs)
+        
+        with _last_request_lock:
+            _last_request = (request_key, response, time.monotonic())
+        
+        if self.response_cache:
+            self.response_cache.set(kwargs, response)
+        
+        return response
+    
+    def _serialize_body(self, kwargs: Dict[str, Any]) -> bytes:
+        """
+        Serialize request kwargs to JSON, reusing the cached JSON for everything but the input.
+        
+        Args:
+            kwargs: Keyword arguments built by _build_kwargs
+        
+        Returns:
+            UTF-8 encoded JSON request body
+        """
+        tools = kwargs["tools"]
+        key = (kwargs["model"], kwargs["tool_choice"], repr(kwargs["reasoning"]), repr(kwargs["text"]))
+        
+        cached = _STATIC_BODY_CACHE.get(key)
+        # Compared by value, a plain dict comparison is far cheaper than serializing the tools
+        if cached is None or cached[0] != tools:
+            static = {name: value for name, value in kwargs.items() if name != "input"}
+            prefix = fast_json.dumps(static, default=fast_json.sdk_default)[:-1] + ',"input":'
+            cached = (copy.deepcopy(tools), prefix)
+            _STATIC_BODY_CACHE[key] = cached
+        
+        input_json = fast_json.dumps(kwargs["input"], default=fast_json.sdk_default)
+        return (cached[1] + input_json + "}").encode("utf-8")
+    
+    def _build_kwargs(
+        self,
+        input_list: List[Dict[str, Any]],
+        tools: List[Dict[str, Any]],
+        reasoning: Optional[Dict[str, str]],
+        text: Optional[Dict[str, str]],
+        tool_choice: str
+    ) -> Dict[str, Any]:
+        """Build keyword arguments for a Responses API call."""
+        kwargs = self._base_kwargs.copy()
+        kwargs["tools"] = tools
+        kwargs["input"] = input_list
+        kwargs["tool_choice"] = tool_choice
         
-        # Add verbosity configuration
+        # Override reasoning and verbosity configuration if given
+        if reasoning:
+            kwargs["reasoning"] = reasoning
         if text:
             kwargs["text"] = text
-        else:
-            kwargs["text"] = {"verbosity": self.verbosity}
         
-        return self.client.responses.create(**kwargs)
+        return kwargs
     
     def process_function_calls(
         self,
@@ -85,96 +266,196 @@ class OpenAIService:
         Returns:
             List of function call output objects and/or user messages with image data
         """
-        function_outputs = []
+        return list(self.iter_function_calls(response, function_handlers, dangerous_commands_confirmed))
+    
+    def iter_function_calls(
+        self,
+        response: Any,
+        function_handlers: Dict[str, callable],
+        dangerous_commands_confirmed: Optional[Dict[str, bool]] = None
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Run the function calls from the API response and yield their output items.
+        
+        Outputs are yielded in response order as each call finishes, so a
+        consumer that only serializes or forwards them never builds a list.
+        All calls start on the first next().
+        
+        Args:
+            response: The API response containing function calls
+            function_handlers: Dictionary mapping function names to handler functions
+            dangerous_commands_confirmed: Optional dict of command -> confirmed status for pre-confirmed dangerous commands
+        
+        Yields:
+            Function call output objects and/or user messages with image data
+        """
         dangerous_commands_confirmed = dangerous_commands_confirmed or {}
+        execute = self._execute_function_call
+        
+        # Split the command -> bool map into sets once, so each call is a plain membership test
+        confirmations = (
+            frozenset(dangerous_commands_confirmed),
+            frozenset(command for command, ok in dangerous_commands_confirmed.items() if ok)
+        )
         
+        # One slot per call, in response order - the API expects outputs in that order
+        results: List[Any] = []
         for item in response.output:
-            if item.type == "function_call":
-                handler = function_handlers.get(item.name)
-                if handler:
-                    # Parse arguments and call the function
-                    args = json.loads(item.arguments)
-                    
-                    # For execute_command, check if we have a pre-confirmation result
-                    if item.name == "execute_command":
-                        command = args.get("command", "")
-                        if command in dangerous_commands_confirmed:
-                            # Pass the pre-confirmation result
-                            args["_pre_confirmed"] = dangerous_commands_confirmed[command]
-                    
-                    result = handler(**args)
-                    
-                    # Special handling for analyze_image
-                    if item.name == "analyze_image":
-                        # Parse the result JSON
-                        result_data = json.loads(result) if isinstance(result, str) else result
-                        
-                        if result_data.get("status") == "success":
-                            # Extract image data and question
-                            image_data = result_data.get("image_data", {})
-                            question = result_data.get("question")
-                            
-                            # Build content array for user message
-                            content = []
-                            
-                            # Add question text if provided
-                            if question:
-                                content.append({
-                                    "type": "input_text",
-                                    "text": question
-                                })
-                            else:
-                                content.append({
-                                    "type": "input_text",
-                                    "text": "What's in this image?"
-                                })
-                            
-                            # Add image
-                            image_content = {
-                                "type": "input_image",
-                                "image_url": image_data.get("image_url")
-                            }
-                            
-                            # Add detail if specified
-                            detail = image_data.get("detail")
-                            if detail and detail != "auto":
-                                image_content["detail"] = detail
-                            
-                            content.append(image_content)
-                            
-                            # Add as user message with image
-                            function_outputs.append({
-                                "role": "user",
-                                "content": content
-                            })
-                            
-                            # Also add function call output to acknowledge the tool call
-                            source = result_data.get("source", "image")
-                            token_cost = result_data.get("token_cost", 0)
-                            function_outputs.append({
-                                "type": "function_call_output",
-                                "call_id": item.call_id,
-                                "output": f"✓ Image loaded successfully from {source} (estimated {token_cost} tokens). Analyzing..."
-                            })
-                        else:
-                            # Error case - return error message
-                            error = result_data.get("error", "Unknown error")
-                            suggestion = result_data.get("suggestion", "")
-                            error_msg = f"❌ Error: {error}"
-                            if suggestion:
-                                error_msg += f"\n\n💡 {suggestion}"
-                            
-                            function_outputs.append({
-                                "type": "function_call_output",
-                                "call_id": item.call_id,
-                                "output": error_msg
-                            })
-                    else:
-                        # Standard function call handling
-                        function_outputs.append({
-                            "type": "function_call_output",
-                            "call_id": item.call_id,
-                            "output": json.dumps(result) if not isinstance(result, str) else result
-                        })
-        
-        return function_outputs
+            if item.type != "function_call":
+                continue
+            
+            if item.name in SERIAL_TOOLS:
+                results.append(item)
+            else:
+                # I/O-bound handlers run side by side on the tool pool
+                results.append(_TOOL_EXECUTOR.submit(execute, item, function_handlers, confirmations))
+        
+        # Serial tools run here, one at a time in response order, while the pool works
+        for i, result in enumerate(results):
+            if not isinstance(result, Future):
+                results[i] = execute(result, function_handlers, confirmations)
+        
+        for result in results:
+            yield from (result.result() if isinstance(result, Future) else result)
+    
+    def _execute_function_call(
+        self,
+        item: Any,
+        function_handlers: Dict[str, callable],
+        confirmations: Tuple[FrozenSet[str], FrozenSet[str]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Run the handler for one function call and build its output items.
+        
+        Args:
+            item: The function_call output item
+            function_handlers: Dictionary mapping function names to handler functions
+            confirmations: (prompted, confirmed) sets of dangerous commands the caller already asked about
+        
+        Returns:
+            Output items for the call (empty if no handler is registered)
+        """
+        outputs: List[Dict[str, Any]] = []
+        name = item.name
+        handler = function_handlers.get(name)
+        if not handler:
+            return outputs
+        
+        # Parse arguments and call the function
+        args = fast_json.loads(item.arguments)
+        
+        argument_hook = self._argument_hooks.get(name)
+        if argument_hook:
+            argument_hook(args, confirmations)
+        
+        result = handler(**args)
+        
+        output_handler = self._output_handlers.get(name, self._handle_default_output)
+        output_handler(item, result, outputs.append)
+        return outputs
+    
+    def _apply_pre_confirmation(self, args: Dict[str, Any], confirmations: Tuple[FrozenSet[str], FrozenSet[str]]):
+        """Pass a pre-confirmation result to execute_command if the caller already prompted."""
+        prompted, confirmed = confirmations
+        command = args.get("command", "")
+        if command in prompted:
+            args["_pre_confirmed"] = command in confirmed
+    
+    def _handle_default_output(self, item: Any, result: Any, append_output: Callable[[Dict[str, Any]], None]):
+        """Standard function call handling - return the result as the call output."""
+        append_output({
+            "type": "function_call_output",
+            "call_id": item.call_id,
+            "output": result if isinstance(result, str) else fast_json.dumps(result)
+        })
+    
+    def _handle_analyze_image_output(self, item: Any, result: Any, append_output: Callable[[Dict[str, Any]], None]):
+        """Turn an analyze_image result dict into a user message carrying the image."""
+        if result.get("status") != "success":
+            # Error case - return error message
+            error = result.get("error", "Unknown error")
+            suggestion = result.get("suggestion", "")
+            error_msg = f"❌ Error: {error}"
+            if suggestion:
+                error_msg += f"\n\n💡 {suggestion}"
+            
+            append_output({
+                "type": "function_call_output",
+                "call_id": item.call_id,
+                "output": error_msg
+            })
+            return
+        
+        # Extract image data and question
+        image_data = result.get("image_data", {})
+        question = result.get("question") or DEFAULT_IMAGE_QUESTION
+        
+        # Add image
+        image_content = {"type": "input_image"}
+        file_id = self._image_file_id(image_data)
+        if file_id:
+            image_content["file_id"] = file_id
+        else:
+            from tools.image_analysis import image_url_for
+            image_content["image_url"] = image_url_for(image_data)
+        
+        # Add detail if specified
+        detail = image_data.get("detail")
+        if detail and detail != "auto":
+            image_content["detail"] = detail
+        
+        # Add as user message with image
+        append_output({
+            "role": "user",
+            "content": [
+                {"type": "input_text", "text": question},
+                image_content,
+            ]
+        })
+        
+        # Also add function call output to acknowledge the tool call
+        source = result.get("source", "image")
+        token_cost = result.get("token_cost", 0)
+        append_output({
+            "type": "function_call_output",
+            "call_id": item.call_id,
+            "output": f"✓ Image loaded successfully from {source} (estimated {token_cost} tokens). Analyzing..."
+        })
+    
+    def _image_file_id(self, image_data: Dict) -> Optional[str]:
+        """
+        Get a Files API ID for a local image, uploading it on first use.
+        
+        Args:
+            image_data: Dictionary returned by format_image_for_api
+        
+        Returns:
+            The file ID, or None to send the image inline as a data URL
+        """
+        global _upload_client
+        file_path = image_data.get("file_path")
+        if not IMAGE_UPLOAD_ENABLED or not file_path:
+            return None
+        try:
+            # A changed file gets a new key and is uploaded again
+            stat = os.stat(file_path)
+            key = (file_path, stat.st_mtime_ns, stat.st_size)
+            with _upload_lock:
+                file_id = _uploaded_images.get(key)
+            if file_id:
+                return file_id
+            
+            with open(file_path, "rb") as image_file:
+                file_id = self.client.files.create(file=image_file, purpose="vision").id
+        except Exception:
+            return None
+        
+        with _upload_lock:
+            if _upload_client is None:
+                _upload_client = self.client
+                atexit.register(_delete_uploaded_images)
+            cached = _uploaded_images.setdefault(key, file_id)
+        if cached != file_id:
+            # Another call uploaded the same image meanwhile, drop this copy
+            _delete_files(self.client, [file_id])
+        return cached
@@ -1,13 +1,29 @@
 """Realtime API service for voice interactions via WebSocket."""
 import os
-import json
-import base64
+import asyncio
+import copy
+import functools
 import threading
 import queue
-from typing import Optional, Callable, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Callable, Dict, Any, List, NamedTuple, Tuple
 from dataclasses import dataclass, field
 from rich.console import Console
 
+try:
+    from pybase64 import b64decode, b64encode
+except ImportError:  # pybase64 is optional (SIMD base64), stdlib base64 works everywhere
+    from base64 import b64decode, b64encode
+
+try:
+    from websockets.asyncio.client import connect as ws_connect
+    from websockets.exceptions import ConnectionClosedOK
+except ImportError:  # Only needed for voice mode, checked in connect()
+    ws_connect = None
+
+from config.settings import REALTIME_PRICING, get_system_prompt
+from utils import fast_json
+
 console = Console()
 
 # Audio configuration
@@ -15,6 +31,121 @@ SAMPLE_RATE = 24000  # OpenAI Realtime API uses 24kHz
 CHANNELS = 1
 CHUNK_SIZE = 1024
 
+# WebSocket flow control: inbound frames buffered before reading pauses,
+# and outbound bytes buffered before send() waits for the socket to drain
+WS_MAX_QUEUE = 16
+WS_WRITE_LIMIT = 64 * 1024
+
+# Outgoing microphone audio is coalesced into one append event per batch
+AUDIO_SEND_MAX_BYTES = 32 * 1024  # Max PCM bytes per input_audio_buffer.append
+AUDIO_SEND_MAX_WAIT = 0.02        # Max seconds to wait for more chunks before sending
+
+# input_audio_buffer.append envelope around the base64 audio (base64 needs no JSON escaping)
+_AUDIO_APPEND_PREFIX = b'{"type":"input_audio_buffer.append","audio":"'
+_AUDIO_APPEND_SUFFIX = b'"}'
+
+# Static control events, serialized once
+_EVT_RESPONSE_CANCEL = b'{"type":"response.cancel"}'
+_EVT_RESPONSE_CREATE = b'{"type":"response.create"}'
+_EVT_AUDIO_COMMIT = b'{"type":"input_audio_buffer.commit"}'
+
+# Unplayed output audio kept in audio_output_queue, oldest dropped beyond this
+MAX_BUFFERED_AUDIO_SECONDS = 2.0
+
+
+def _normalize_tool_definition(tool_def: dict) -> dict:
+    """Convert a standard tool definition to Realtime API format."""
+    if tool_def.get("type") == "function":
+        # Check if it's the new format (name at top level) or old format (inside function key)
+        if "name" in tool_def:
+            # New format - name is at top level
+            return {
+                "type": "function",
+                "name": tool_def.get("name"),
+                "description": tool_def.get("description"),
+                "parameters": tool_def.get("parameters", {})
+            }
+        else:
+            # Old format - name is inside function key
+            func = tool_def.get("function", {})
+            return {
+                "type": "function",
+                "name": func.get("name"),
+                "description": func.get("description"),
+                "parameters": func.get("parameters", {})
+            }
+    return tool_def
+
+
+@functools.lru_cache(maxsize=4)
+def _build_realtime_tools(ask_mode: bool, has_bfl: bool) -> Tuple[dict, ...]:
+    """
+    Build the converted realtime tool list for a mode.
+    
+    The list only depends on ask mode and whether BFL_API_KEY is set,
+    so it is built once per combination.
+    
+    Args:
+        ask_mode: If True, leave out command execution
+        has_bfl: If True, include image generation/editing tools
+    
+    Returns:
+        Tuple of tool definitions in Realtime API format
+    """
+    # Imported here, the tool modules pull in PIL, bs4 and requests
+    from tools import (
+        web_search_function_tool_definition,
+        web_fetch_tool_definition,
+        analyze_image_tool_definition,
+        python_executor_tool_definition,
+        execute_command_tool_definition,
+        generate_image_tool_definition,
+        edit_image_tool_definition,
+    )
+    
+    # Add web search as a function tool (internally uses OpenAI's web search API)
+    tools = [_normalize_tool_definition(web_search_function_tool_definition)]
+    
+    # Add function tools available in all modes
+    tools.append(_normalize_tool_definition(web_fetch_tool_definition))
+    tools.append(_normalize_tool_definition(python_executor_tool_definition))
+    tools.append(_normalize_tool_definition(analyze_image_tool_definition))
+    
+    # Add image generation/editing tools only if BFL_API_KEY is set
+    if has_bfl:
+        tools.append(_normalize_tool_definition(generate_image_tool_definition))
+        tools.append(_normalize_tool_definition(edit_image_tool_definition))
+    
+    # Add command execution only if not in ask mode
+    if not ask_mode:
+        tools.append(_normalize_tool_definition(execute_command_tool_definition))
+    
+    return tuple(tools)
+
+
+@functools.lru_cache(maxsize=8)
+def _resolved_pricing(model: str) -> Optional[Tuple[float, float, float]]:
+    """
+    Resolve per-token (input, cached, output) prices for a model.
+    
+    Falls back to gpt-realtime pricing. The per-1M-token prices are divided
+    once here, so cost calculation is three multiplications.
+    """
+    pricing = REALTIME_PRICING.get(model, REALTIME_PRICING.get("gpt-realtime"))
+    if not pricing:
+        return None
+    return (
+        pricing["input"] / 1_000_000,
+        pricing["cached"] / 1_000_000,
+        pricing["output"] / 1_000_000,
+    )
+
+
+class ToolResult(NamedTuple):
+    """Output of a tool call, already serialized for function_call_output."""
+    text: str
+    is_json: bool  # True if text is JSON produced from a structured result
+
 
 @dataclass
 class UsageStats:
@@ -24,16 +155,33 @@ class UsageStats:
     cached_tokens: int = 0
     input_audio_tokens: int = 0
     output_audio_tokens: int = 0
-    total_cost: float = 0.0
     response_count: int = 0
+    model: str = "gpt-realtime"
+    
+    # (model and token counts, cost) of the last total_cost calculation
+    _cost_cache: Tuple[Optional[tuple], float] = field(default=(None, 0.0), repr=False, compare=False)
+    
+    @property
+    def total_cost(self) -> float:
+        """Total cost so far, recalculated only when the token counts changed."""
+        key = (
+            self.model,
+            self.input_tokens,
+            self.output_tokens,
+            self.cached_tokens,
+            self.input_audio_tokens,
+            self.output_audio_tokens,
+        )
+        if self._cost_cache[0] != key:
+            self._cost_cache = (key, self.calculate_cost(self.model))
+        return self._cost_cache[1]
     
     def calculate_cost(self, model: str) -> float:
         """Calculate cost based on token usage and model pricing."""
-        from config.settings import REALTIME_PRICING
-        
-        pricing = REALTIME_PRICING.get(model, REALTIME_PRICING.get("gpt-realtime"))
+        pricing = _resolved_pricing(model)
         if not pricing:
             return 0.0
+        input_price, cached_price, output_price = pricing
         
         # Total input = text + audio tokens
         total_input = self.input_tokens + self.input_audio_tokens
@@ -42,11 +190,7 @@ class UsageStats:
         # Cached tokens are billed at reduced rate, subtract from full-price input
         non_cached_input = max(0, total_input - self.cached_tokens)
         
-        input_cost = non_cached_input * pricing["input"] / 1_000_000
-        cached_cost = self.cached_tokens * pricing["cached"] / 1_000_000
-        output_cost = total_output * pricing["output"] / 1_000_000
-        
-        return input_cost + cached_cost + output_cost
+        return non_cached_input * input_price + self.cached_tokens * cached_price + total_output * output_price
 
 
 class RealtimeService:
@@ -76,9 +220,16 @@ class RealtimeService:
         self.connected = False
         self.session_id = None
         
-        # Audio queues
-        self.audio_input_queue = queue.Queue()
-        self.audio_output_queue = queue.Queue()
+        # Audio queues (output is bounded to ~2s of PCM16 so a stalled consumer can't grow it forever,
+        # and only filled when no on_audio_delta callback is set).
+        # The input queue is a lock-free SimpleQueue; the sender task is woken through
+        # _audio_ready only when it is actually waiting for audio.
+        max_audio_buffered_chunks = int(MAX_BUFFERED_AUDIO_SECONDS * SAMPLE_RATE * 2 / CHUNK_SIZE)
+        self.audio_input_queue = queue.SimpleQueue()
+        self._audio_ready: Optional[asyncio.Event] = None
+        self._audio_waiting = False
+        self._send_buffer = bytearray(AUDIO_SEND_MAX_BYTES)  # Reused for every coalesced batch
+        self.audio_output_queue = queue.Queue(maxsize=max_audio_buffered_chunks)
         
         # Event callbacks
         self.on_transcript: Optional[Callable[[str, str], None]] = None  # (role, text)
@@ -87,19 +238,57 @@ class RealtimeService:
         self.on_session_created: Optional[Callable[[Dict], None]] = None
         self.on_response_done: Optional[Callable[[Dict, UsageStats], None]] = None  # (event, usage)
         self.on_interrupted: Optional[Callable[[], None]] = None  # Called when user interrupts
+        self.on_disconnected: Optional[Callable[[], None]] = None  # Called when the connection closes
         
         # State tracking
         self.is_speaking = False
-        self.current_response_text = ""
-        self.current_audio_transcript = ""
+        # Deltas are collected in lists and joined once when the part is done
+        self._response_text_parts: List[str] = []
+        self._audio_transcript_parts: List[str] = []
+        
+        # Serializes barge-in against audio deltas; _interrupted stops repeat interrupts until the next response
+        self._interrupt_lock = threading.Lock()
+        self._interrupted = False
         
         # Usage tracking
-        self.usage = UsageStats()
+        self.usage = UsageStats(model=model)
+        
+        # Inbound event type -> handler, looked up once per message
+        # (input_audio_buffer.speech_stopped and unknown types are ignored)
+        self._event_handlers: Dict[str, Callable[[dict], None]] = {
+            "response.output_audio.delta": self._h_audio_delta,
+            "response.output_audio_transcript.delta": self._h_audio_transcript_delta,
+            "response.output_text.delta": self._h_text_delta,
+            "response.created": self._h_response_created,
+            "session.created": self._h_session_created,
+            "session.updated": self._h_session_updated,
+            "conversation.item.input_audio_transcription.completed": self._h_input_transcription_completed,
+            "response.output_audio_transcript.done": self._h_audio_transcript_done,
+            "response.output_text.done": self._h_text_done,
+            "response.done": self._h_response_done,
+            "response.function_call_arguments.done": self._handle_function_call,
+            "error": self._h_error,
+            "input_audio_buffer.speech_started": self._h_speech_started,
+        }
         
-        # Thread control
+        # Thread control - one background thread runs the asyncio loop for all socket I/O
         self._stop_event = threading.Event()
+        self._connected_event = threading.Event()  # Set by _on_open
         self._ws_thread: Optional[threading.Thread] = None
-        self._audio_send_thread: Optional[threading.Thread] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        
+        # Runs non-critical callbacks (usage display) off the socket thread, one at a time in order
+        self._callback_executor = ThreadPoolExecutor(max_workers=1)
+    
+    @property
+    def current_response_text(self) -> str:
+        """Text response received so far for the current response."""
+        return "".join(self._response_text_parts)
+    
+    @property
+    def current_audio_transcript(self) -> str:
+        """Audio transcript received so far for the current response."""
+        return "".join(self._audio_transcript_parts)
     
     def connect(self) -> bool:
         """
@@ -108,10 +297,8 @@ class RealtimeService:
         Returns:
             bool: True if connection successful
         """
-        try:
-            import websocket
-        except ImportError:
-            console.print("[red]Error: websocket-client not installed. Run: pip install websocket-client[/red]")
+        if ws_connect is None:
+            console.print("[red]Error: websockets not installed. Run: pip install websockets[/red]")
             return False
         
         api_key = os.environ.get("OPENAI_API_KEY")
@@ -121,52 +308,64 @@ class RealtimeService:
         
         url = f"wss://api.openai.com/v1/realtime?model={self.model}"
         
-        self.ws = websocket.WebSocketApp(
-            url,
-            header=[f"Authorization: Bearer {api_key}"],
-            on_open=self._on_open,
-            on_message=self._on_message,
-            on_error=self._on_error,
-            on_close=self._on_close
-        )
-        
-        # Start WebSocket in a separate thread
+        # Start the event loop running the WebSocket in a separate thread
         self._stop_event.clear()
-        self._ws_thread = threading.Thread(target=self._run_websocket, daemon=True)
+        self._connected_event.clear()
+        self._ws_thread = threading.Thread(target=self._run_websocket, args=(url, api_key), daemon=True)
         self._ws_thread.start()
         
         # Wait for connection
-        import time
-        timeout = 10
-        start = time.time()
-        while not self.connected and time.time() - start < timeout:
-            time.sleep(0.1)
-        
+        self._connected_event.wait(timeout=10)
         return self.connected
     
-    def _run_websocket(self):
-        """Run the WebSocket connection."""
-        self.ws.run_forever()
+    def _run_websocket(self, url: str, api_key: str):
+        """Run the WebSocket connection on a private event loop."""
+        asyncio.run(self._websocket_main(url, api_key))
+    
+    async def _websocket_main(self, url: str, api_key: str):
+        """Connect, then receive messages while a task sends queued audio."""
+        self._loop = asyncio.get_running_loop()
+        self._audio_ready = asyncio.Event()
+        ws = None
+        try:
+            async with ws_connect(
+                url,
+                additional_headers={"Authorization": f"Bearer {api_key}"},
+                max_queue=WS_MAX_QUEUE,
+                write_limit=WS_WRITE_LIMIT
+            ) as ws:
+                self.ws = ws
+                self._on_open(ws)
+                
+                # Audio sending runs as a task on this loop instead of its own thread
+                sender = asyncio.create_task(self._audio_send_loop())
+                try:
+                    while not self._stop_event.is_set():
+                        # decode=False skips UTF-8 decoding - fast_json.loads accepts bytes
+                        message = await ws.recv(decode=False)
+                        self._on_message(ws, message)
+                except ConnectionClosedOK:
+                    pass
+                finally:
+                    sender.cancel()
+        except Exception as e:
+            if not self._stop_event.is_set():
+                self._on_error(ws, e)
+        finally:
+            self._loop = None
+            self._on_close(ws, None, None)
     
     def _on_open(self, ws):
         """Handle WebSocket connection opened."""
         self.connected = True
+        self._connected_event.set()
         console.print("[green]✓ Connected to Realtime API[/green]")
         
         # Configure the session
         self._configure_session()
-        
-        # Start audio sending thread
-        self._audio_send_thread = threading.Thread(target=self._audio_send_loop, daemon=True)
-        self._audio_send_thread.start()
     
     def _configure_session(self):
         """Send session configuration to the API."""
-        from config.settings import get_system_prompt, get_system_info
-        import getpass
-        import socket
-        from datetime import datetime
-        
         # Get system prompt based on mode (use the same as CLI)
         instructions = self.instructions or get_system_prompt(ask_mode=self.ask_mode)
         
@@ -201,159 +400,146 @@ class RealtimeService:
     
     def _get_tools(self) -> list:
         """Get available tools for the realtime session."""
-        import os
-        from tools import (
-            web_search_function_tool_definition,
-            web_fetch_tool_definition,
-            analyze_image_tool_definition,
-            python_executor_tool_definition,
-            execute_command_tool_definition,
-            generate_image_tool_definition,
-            edit_image_tool_definition,
-        )
-        
-        tools = []
-        
-        # Add web search as a function tool (internally uses OpenAI's web search API)
-        tools.append(self._convert_to_realtime_tool(web_search_function_tool_definition))
-        
-        # Add function tools available in all modes
-        tools.append(self._convert_to_realtime_tool(web_fetch_tool_definition))
-        tools.append(self._convert_to_realtime_tool(python_executor_tool_definition))
-        tools.append(self._convert_to_realtime_tool(analyze_image_tool_definition))
-        
-        # Add image generation/editing tools only if BFL_API_KEY is set
-        if os.environ.get("BFL_API_KEY"):
-            tools.append(self._convert_to_realtime_tool(generate_image_tool_definition))
-            tools.append(self._convert_to_realtime_tool(edit_image_tool_definition))
-        
-        # Add command execution only if not in ask mode
-        if not self.ask_mode:
-            tools.append(self._convert_to_realtime_tool(execute_command_tool_definition))
-        
-        return tools
-    
-    def _convert_to_realtime_tool(self, tool_def: dict) -> dict:
-        """Convert a standard tool definition to Realtime API format."""
-        if tool_def.get("type") == "function":
-            # Check if it's the new format (name at top level) or old format (inside function key)
-            if "name" in tool_def:
-                # New format - name is at top level
-                return {
-                    "type": "function",
-                    "name": tool_def.get("name"),
-                    "description": tool_def.get("description"),
-                    "parameters": tool_def.get("parameters", {})
-                }
-            else:
-                # Old format - name is inside function key
-                func = tool_def.get("function", {})
-                return {
-                    "type": "function",
-                    "name": func.get("name"),
-                    "description": func.get("description"),
-                    "parameters": func.get("parameters", {})
-                }
-        return tool_def
+        return list(_build_realtime_tools(self.ask_mode, bool(os.environ.get("BFL_API_KEY"))))
     
     def _on_message(self, ws, message):
         """Handle incoming WebSocket messages."""
         try:
-            event = json.loads(message)
-            event_type = event.get("type", "")
-            
-            # Handle different event types
-            if event_type == "session.created":
-                self.session_id = event.get("session", {}).get("id")
-                if self.on_session_created:
-                    self.on_session_created(event)
-                    
-            elif event_type == "session.updated":
-                console.print("[dim]Session configured[/dim]")
-                
-            elif event_type == "conversation.item.input_audio_transcription.completed":
-                # User's speech transcribed
-                transcript = event.get("transcript", "")
-                if transcript and self.on_transcript:
-                    self.on_transcript("user", transcript)
-                    
-            elif event_type == "response.output_audio_transcript.delta":
-                # Assistant's audio transcript delta
-                delta = event.get("delta", "")
-                self.current_audio_transcript += delta
-                
-            elif event_type == "response.output_audio_transcript.done":
-                # Assistant's audio transcript complete
-                transcript = event.get("transcript", self.current_audio_transcript)
-                if transcript and self.on_transcript:
-                    self.on_transcript("assistant", transcript)
-                self.current_audio_transcript = ""
-                
-            elif event_type == "response.output_text.delta":
-                # Text response delta
-                delta = event.get("delta", "")
-                self.current_response_text += delta
-                
-            elif event_type == "response.output_text.done":
-                # Text response complete
-                text = event.get("text", self.current_response_text)
-                if text and self.on_transcript:
-                    self.on_transcript("assistant", text)
-                self.current_response_text = ""
-                
-            elif event_type == "response.output_audio.delta":
-                # Audio output delta
-                audio_b64 = event.get("delta", "")
-                if audio_b64:
-                    audio_bytes = base64.b64decode(audio_b64)
-                    self.audio_output_queue.put(audio_bytes)
-                    if self.on_audio_delta:
-                        self.on_audio_delta(audio_bytes)
-                        
-            elif event_type == "response.done":
-                self.is_speaking = False
-                self._process_usage(event)
-                if self.on_response_done:
-                    self.on_response_done(event, self.usage)
-                    
-            elif event_type == "response.function_call_arguments.done":
-                # Handle function call
-                self._handle_function_call(event)
-                
-            elif event_type == "error":
-                error_msg = event.get("error", {}).get("message", "Unknown error")
-                # Suppress harmless cancellation errors (happens when user speaks but no response is active)
-                if "no active response" in error_msg.lower():
-                    pass  # Ignore - this is expected when cancelling during silence
-                else:
-                    console.print(f"[red]API Error: {error_msg}[/red]")
-                    if self.on_error:
-                        self.on_error(error_msg)
-                    
-            elif event_type == "input_audio_buffer.speech_started":
-                # User started speaking - interrupt any ongoing response (barge-in)
-                self.is_speaking = False
-                # Cancel the current response to stop audio generation
-                self._send_event({"type": "response.cancel"})
-                # Clear audio output queue
-                while not self.audio_output_queue.empty():
-                    try:
-                        self.audio_output_queue.get_nowait()
-                    except queue.Empty:
-                        break
-                # Notify callback to clear audio handler queue too
-                if self.on_interrupted:
-                    self.on_interrupted()
-                        
-            elif event_type == "input_audio_buffer.speech_stopped":
-                # User stopped speaking
-                pass
-                
-        except json.JSONDecodeError as e:
+            event = fast_json.loads(message)
+            handler = self._event_handlers.get(event.get("type", ""))
+            if handler:
+                handler(event)
+        except fast_json.JSONDecodeError as e:
             console.print(f"[red]Failed to parse message: {e}[/red]")
         except Exception as e:
             console.print(f"[red]Error handling message: {e}[/red]")
     
+    def _h_session_created(self, event: dict):
+        """Session created - remember its ID."""
+        self.session_id = event.get("session", {}).get("id")
+        if self.on_session_created:
+            self.on_session_created(event)
+    
+    def _h_session_updated(self, event: dict):
+        """Session configuration acknowledged."""
+        console.print("[dim]Session configured[/dim]")
+    
+    def _h_input_transcription_completed(self, event: dict):
+        """User's speech transcribed."""
+        transcript = event.get("transcript", "")
+        if transcript and self.on_transcript:
+            self.on_transcript("user", transcript)
+    
+    def _h_audio_transcript_delta(self, event: dict):
+        """Assistant's audio transcript delta."""
+        self._audio_transcript_parts.append(event.get("delta", ""))
+    
+    def _h_audio_transcript_done(self, event: dict):
+        """Assistant's audio transcript complete."""
+        transcript = event.get("transcript")
+        if transcript is None:
+            transcript = "".join(self._audio_transcript_parts)
+        if transcript and self.on_transcript:
+            self.on_transcript("assistant", transcript)
+        self._audio_transcript_parts.clear()
+    
+    def _h_text_delta(self, event: dict):
+        """Text response delta."""
+        self._response_text_parts.append(event.get("delta", ""))
+    
+    def _h_text_done(self, event: dict):
+        """Text response complete."""
+        text = event.get("text")
+        if text is None:
+            text = "".join(self._response_text_parts)
+        if text and self.on_transcript:
+            self.on_transcript("assistant", text)
+        self._response_text_parts.clear()
+    
+    def _h_audio_delta(self, event: dict):
+        """Audio output delta."""
+        audio_b64 = event.get("delta", "")
+        if audio_b64:
+            audio_bytes = b64decode(audio_b64)
+            # Never interleave with an interrupt in progress
+            with self._interrupt_lock:
+                if self.on_audio_delta:
+                    self.on_audio_delta(audio_bytes)
+                else:
+                    # No callback owns playback - keep the audio for audio_output_queue readers
+                    self._queue_output_audio(audio_bytes)
+    
+    def _h_response_created(self, event: dict):
+        """A new response started - it can be interrupted again."""
+        with self._interrupt_lock:
+            self._interrupted = False
+    
+    def _h_response_done(self, event: dict):
+        """Response finished - record usage."""
+        self.is_speaking = False
+        self._process_usage(event)
+        if self.on_response_done:
+            # The callback gets a snapshot so later responses don't change it underneath
+            self._callback_executor.submit(self.on_response_done, event, copy.copy(self.usage))
+    
+    def _h_error(self, event: dict):
+        """API error event."""
+        error_msg = event.get("error", {}).get("message", "Unknown error")
+        # Suppress harmless cancellation errors (happens when user speaks but no response is active)
+        if "no active response" in error_msg.lower():
+            return  # Ignore - this is expected when cancelling during silence
+        console.print(f"[red]API Error: {error_msg}[/red]")
+        if self.on_error:
+            self.on_error(error_msg)
+    
+    def _h_speech_started(self, event: dict):
+        """User started speaking - interrupt any ongoing response (barge-in)."""
+        self._interrupt()
+    
+    def _interrupt(self):
+        """
+        Cancel the current response and discard its pending output in one critical section.
+        
+        A repeated interrupt before the next response starts does nothing.
+        """
+        with self._interrupt_lock:
+            if self._interrupted:
+                return
+            self._interrupted = True
+            self.is_speaking = False
+            # Cancel the current response to stop audio generation
+            self._send_raw(_EVT_RESPONSE_CANCEL)
+            # Clear audio output queue and partial transcripts
+            self._drain_audio_output()
+            self._response_text_parts.clear()
+            self._audio_transcript_parts.clear()
+            # Notify callback to clear audio handler queue too
+            if self.on_interrupted:
+                self.on_interrupted()
+    
+    def _queue_output_audio(self, audio_bytes: bytes):
+        """Queue output audio, dropping the oldest chunk when the queue is full."""
+        try:
+            self.audio_output_queue.put_nowait(audio_bytes)
+        except queue.Full:
+            try:
+                self.audio_output_queue.get_nowait()
+            except queue.Empty:
+                pass
+            try:
+                self.audio_output_queue.put_nowait(audio_bytes)
+            except queue.Full:
+                pass  # Another producer refilled it - dropping this chunk is fine
+    
+    def _drain_audio_output(self):
+        """Discard all queued output audio in one locked deque clear."""
+        audio_queue = self.audio_output_queue
+        with audio_queue.mutex:
+            audio_queue.queue.clear()
+            audio_queue.unfinished_tasks = 0
+            audio_queue.all_tasks_done.notify_all()
+            audio_queue.not_full.notify_all()
+    
     def _process_usage(self, event: dict):
         """Process usage information from response.done event."""
         response = event.get("response", {})
@@ -384,9 +570,6 @@ class RealtimeService:
             self.usage.input_audio_tokens += audio_input
             self.usage.output_audio_tokens += audio_output
             self.usage.response_count += 1
-            
-            # Calculate total cost
-            self.usage.total_cost = self.usage.calculate_cost(self.model)
     
     def _handle_function_call(self, event):
         """Handle a function call from the model."""
@@ -395,8 +578,8 @@ class RealtimeService:
         arguments = event.get("arguments", "{}")
         
         try:
-            args = json.loads(arguments)
-        except json.JSONDecodeError:
+            args = fast_json.loads(arguments)
+        except fast_json.JSONDecodeError:
             args = {}
         
         # Tool icons for display
@@ -412,76 +595,75 @@ class RealtimeService:
         icon = tool_icons.get(name, "🔧")
         console.print(f"[yellow]{icon} Tool: {name}[/yellow]")
         
-        # Long-running tools that need to run in background thread to avoid WebSocket timeout
-        long_running_tools = {"generate_image", "edit_image"}
-        
-        if name in long_running_tools:
-            # Run in background thread to prevent WebSocket keepalive timeout
-            thread = threading.Thread(
-                target=self._execute_tool_async,
-                args=(call_id, name, args),
-                daemon=True
-            )
-            thread.start()
-        else:
-            # Execute quick tools synchronously
-            result = self._execute_tool(name, args)
-            self._send_function_result(call_id, result)
+        # Run tools off the event loop so a slow tool can't stall audio or keepalive pings
+        thread = threading.Thread(
+            target=self._execute_tool_async,
+            args=(call_id, name, args),
+            daemon=True
+        )
+        thread.start()
     
-    def _execute_tool(self, name: str, args: dict) -> str:
+    def _execute_tool(self, name: str, args: dict) -> ToolResult:
         """Execute a tool and return the result."""
-        from tools import (
-            web_search,
-            fetch_webpage,
-            execute_python,
-            execute_command,
-            analyze_image,
-            generate_image,
-            edit_image,
-        )
-        
         try:
+            from tools import (
+                web_search,
+                fetch_webpage,
+                analyze_image,
+                execute_python,
+                execute_command,
+                generate_image,
+                edit_image,
+            )
+            from tools.image_analysis import image_url_for
+            
             if name == "web_search":
-                return web_search(**args)
+                return ToolResult(web_search(**args), False)
             elif name == "fetch_webpage":
-                return fetch_webpage(**args)
+                return ToolResult(fetch_webpage(**args), False)
             elif name == "execute_python":
-                return execute_python(**args)
+                return ToolResult(execute_python(**args), False)
             elif name == "analyze_image":
-                return analyze_image(**args)
+                result = analyze_image(**args)
+                image_data = result.get("image_data")
+                if image_data and "image_bytes" in image_data:
+                    # Raw bytes are not JSON serializable - send the data URL
+                    image_data["image_url"] = image_url_for(image_data)
+                    del image_data["image_bytes"]
+                return ToolResult(fast_json.dumps(result), True)
             elif name == "generate_image":
-                return generate_image(**args)
+                return ToolResult(generate_image(**args), False)
             elif name == "edit_image":
-                return edit_image(**args)
+                return ToolResult(edit_image(**args), False)
             elif name == "execute_command":
                 if self.ask_mode:
-                    return "Command execution is disabled in ask-only mode."
+                    return ToolResult("Command execution is disabled in ask-only mode.", False)
                 else:
-                    return execute_command(**args)
+                    return ToolResult(execute_command(**args), False)
             else:
-                return f"Unknown function: {name}"
+                return ToolResult(f"Unknown function: {name}", False)
         except Exception as e:
-            return f"Error executing {name}: {str(e)}"
+            return ToolResult(f"Error executing {name}: {str(e)}", False)
     
     def _execute_tool_async(self, call_id: str, name: str, args: dict):
-        """Execute a long-running tool in background and send result when done."""
+        """Execute a tool in a background thread and send the result when done."""
         result = self._execute_tool(name, args)
         self._send_function_result(call_id, result)
     
-    def _send_function_result(self, call_id: str, result: str):
+    def _send_function_result(self, call_id: str, result: ToolResult):
         """Send function call result back to the API."""
         event = {
             "type": "conversation.item.create",
             "item": {
                 "type": "function_call_output",
                 "call_id": call_id,
-                "output": result if isinstance(result, str) else json.dumps(result)
+                "output": result.text
             }
         }
         self._send_event(event)
         
         # Trigger response generation
-        self._send_event({"type": "response.create"})
+        self._send_raw(_EVT_RESPONSE_CREATE)
     
     def _on_error(self, ws, error):
         """Handle WebSocket errors."""
@@ -492,31 +674,109 @@ class RealtimeService:
     def _on_close(self, ws, close_status_code, close_msg):
         """Handle WebSocket connection closed."""
         self.connected = False
+        # Wake connect() right away if the connection closed before opening
+        self._connected_event.set()
+        if self.on_disconnected:
+            self.on_disconnected()
         console.print(f"[yellow]Disconnected from Realtime API[/yellow]")
     
     def _send_event(self, event: dict):
         """Send an event to the WebSocket."""
-        if self.ws and self.connected:
-            self.ws.send(json.dumps(event))
+        self._send_raw(fast_json.dumpb(event))
+    
+    def _send_raw(self, payload):
+        """
+        Send an already serialized JSON event as a text frame.
+        
+        Safe to call from any thread. Sends are scheduled on the event loop
+        in call order.
+        """
+        loop = self._loop
+        if not (self.ws and self.connected and loop):
+            return
+        
+        send = self.ws.send(payload, text=True)
+        try:
+            on_loop = asyncio.get_running_loop() is loop
+        except RuntimeError:
+            on_loop = False
+        
+        if on_loop:
+            loop.create_task(send)
+        else:
+            asyncio.run_coroutine_threadsafe(send, loop)
     
-    def _audio_send_loop(self):
+    async def _audio_send_loop(self):
         """Loop to send audio data to the API."""
+        loop = asyncio.get_running_loop()
+        audio_queue = self.audio_input_queue
         while not self._stop_event.is_set() and self.connected:
             try:
-                audio_chunk = self.audio_input_queue.get(timeout=0.1)
-                if audio_chunk:
-                    # Encode audio as base64 and send
-                    audio_b64 = base64.b64encode(audio_chunk).decode("utf-8")
-                    event = {
-                        "type": "input_audio_buffer.append",
-                        "audio": audio_b64
-                    }
-                    self._send_event(event)
-            except queue.Empty:
-                continue
+                audio_chunk = await self._next_audio_chunk()
+                if not audio_chunk:
+                    continue
+                
+                # Coalesce queued chunks so each WebSocket frame carries more audio
+                length = self._write_send_buffer(0, audio_chunk)
+                deadline = loop.time() + AUDIO_SEND_MAX_WAIT
+                while length < AUDIO_SEND_MAX_BYTES:
+                    try:
+                        length = self._write_send_buffer(length, audio_queue.get_nowait())
+                        continue
+                    except queue.Empty:
+                        pass
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    await asyncio.sleep(remaining)
+                
+                # Encode audio as base64 once per batch and send it inside the prebuilt envelope.
+                # Awaiting the send applies the connection's write_limit backpressure.
+                with memoryview(self._send_buffer) as view:
+                    payload = _AUDIO_APPEND_PREFIX + b64encode(view[:length]) + _AUDIO_APPEND_SUFFIX
+                await self.ws.send(payload, text=True)
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 console.print(f"[red]Error sending audio: {e}[/red]")
     
+    async def _next_audio_chunk(self) -> bytes:
+        """Wait for the next microphone chunk without a loop wake-up per chunk."""
+        audio_queue = self.audio_input_queue
+        while True:
+            try:
+                return audio_queue.get_nowait()
+            except queue.Empty:
+                pass
+            
+            # Announce we're waiting, then re-check so a put racing with us is not missed
+            self._audio_ready.clear()
+            self._audio_waiting = True
+            try:
+                try:
+                    return audio_queue.get_nowait()
+                except queue.Empty:
+                    pass
+                await self._audio_ready.wait()
+            finally:
+                self._audio_waiting = False
+    
+    def _write_send_buffer(self, length: int, chunk: bytes) -> int:
+        """
+        Copy a chunk into the reusable send buffer at the given offset.
+        
+        The buffer only grows (when a batch overshoots it) and is never
+        shrunk, so steady-state batching allocates nothing.
+        
+        Returns:
+            New length of the buffered audio
+        """
+        end = length + len(chunk)
+        if end > len(self._send_buffer):
+            self._send_buffer.extend(bytes(end - len(self._send_buffer)))
+        self._send_buffer[length:end] = chunk
+        return end
+    
     def send_audio(self, audio_data: bytes):
         """
         Queue audio data to be sent to the API.
@@ -525,6 +785,11 @@ class RealtimeService:
             audio_data: Raw PCM16 audio bytes
         """
         self.audio_input_queue.put(audio_data)
+        
+        # Wake the sender only if it is idle - while it is batching it drains the queue itself
+        loop = self._loop
+        if self._audio_waiting and loop:
+            loop.call_soon_threadsafe(self._audio_ready.set)
     
     def send_text(self, text: str):
         """
@@ -550,19 +815,54 @@ class RealtimeService:
         self._send_event(event)
         
         # Trigger response
-        self._send_event({"type": "response.create"})
+        self._send_raw(_EVT_RESPONSE_CREATE)
+    
+    def add_history(self, messages: list):
+        """
+        Replay earlier conversation messages without triggering a response.
+        
+        Args:
+            messages: {"role", "content"} dicts in their original order
+        """
+        for message in messages:
+            role = message["role"]
+            self._send_event({
+                "type": "conversation.item.create",
+                "item": {
+                    "type": "message",
+                    "role": role,
+                    "content": [
+                        {
+                            "type": "input_text" if role == "user" else "output_text",
+                            "text": message["content"]
+                        }
+                    ]
+                }
+            })
     
     def commit_audio(self):
         """Commit the current audio buffer (manual turn detection)."""
-        self._send_event({"type": "input_audio_buffer.commit"})
+        self._send_raw(_EVT_AUDIO_COMMIT)
     
     def cancel_response(self):
         """Cancel the current response."""
-        self._send_event({"type": "response.cancel"})
+        with self._interrupt_lock:
+            self._send_raw(_EVT_RESPONSE_CANCEL)
+            self._drain_audio_output()
     
     def disconnect(self):
         """Disconnect from the Realtime API."""
         self._stop_event.set()
-        if self.ws:
-            self.ws.close()
+        loop = self._loop
+        if self.ws and loop:
+            future = asyncio.run_coroutine_threadsafe(self.ws.close(), loop)
+            try:
+                future.result(timeout=5)
+            except Exception:
+                pass
         self.connected = False
+        self._connected_event.clear()
+        # Swap in a fresh executor for a later connect() (threads start lazily, so it's free).
+        # Don't wait - disconnect may be called from a callback running on the old one.
+        callback_executor, self._callback_executor = self._callback_executor, ThreadPoolExecutor(max_workers=1)
+        callback_executor.shutdown(wait=False)
@@ -0,0 +1,347 @@
+"""Response cache for repeated Responses API calls."""
+import copy
+import hashlib
+import re
+import secrets
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from openai.types.responses import Response
+
+from utils import fast_json
+from .cache_manager import CacheManager
+
+# Output item types that mean the model wants a tool to run - never cached as answers
+TOOL_CALL_TYPES = {"function_call", "web_search_call"}
+
+# Read-only tools whose call plans can be re-templated with new slot values.
+# fetch_webpage is left out: what a page says changes, the plan to fetch it is cheap.
+TEMPLATABLE_TOOLS = {"analyze_image"}
+
+# Maximum number of similarity entries kept per request context
+MAX_SEMANTIC_ENTRIES = 200
+
+_PUNCTUATION_PATTERN = re.compile(r"[^\w\s]")
+_WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# Variable slots factored out of prompts, tried in this order
+_SLOT_PATTERN = re.compile(
+    r"(?P<URL>https?://[^\s\"'`<>]+)"
+    r"|(?P<STR>\"[^\"\n]+\"|`[^`\n]+`)"
+    r"|(?P<PATH>(?:~|\.{1,2})?/[^\s\"'`]+)"
+    r"|(?P<FILE>\b[\w-]+(?:\.[\w-]+)*\.[A-Za-z][A-Za-z0-9]{0,4}\b)"
+    r"|(?P<NUM>\b\d+(?:\.\d+)?\b)"
+)
+
+
+def normalize_text(text: str) -> str:
+    """Lowercase text, drop punctuation and collapse whitespace for similarity matching."""
+    return _WHITESPACE_PATTERN.sub(" ", _PUNCTUATION_PATTERN.sub("", text.lower())).strip()
+
+
+def extract_template(text: str) -> Tuple[str, List[str]]:
+    """
+    Factor a prompt into a skeleton and its variable slot values.
+    
+    URLs, quoted strings, paths, file names and numbers become numbered
+    placeholders, e.g. 'analyze ~/cat.png' -> ('analyze <PATH0>', ['~/cat.png']).
+    
+    Args:
+        text: Prompt text
+    
+    Returns:
+        Tuple of (normalized skeleton, slot values in order)
+    """
+    values: List[str] = []
+    
+    def replace(match: "re.Match") -> str:
+        kind, value = match.lastgroup, match.group(0)
+        if kind == "STR":
+            # Keep the quotes in the skeleton, the slot is what they enclose
+            values.append(value[1:-1])
+            return f"{value[0]}<{kind}{len(values) - 1}>{value[-1]}"
+        values.append(value)
+        return f"<{kind}{len(values) - 1}>"
+    
+    skeleton = _SLOT_PATTERN.sub(replace, text)
+    return _WHITESPACE_PATTERN.sub(" ", skeleton.lower()).strip(), values
+
+
+def _replace_in_strings(obj: Any, replacements: List[Tuple[str, str]]) -> Any:
+    """Apply (old, new) substring replacements to every string inside obj."""
+    if isinstance(obj, str):
+        for old, new in replacements:
+            obj = obj.replace(old, new)
+        return obj
+    if isinstance(obj, list):
+        return [_replace_in_strings(value, replacements) for value in obj]
+    if isinstance(obj, dict):
+        return {key: _replace_in_strings(value, replacements) for key, value in obj.items()}
+    return obj
+
+
+def _fresh_call_ids(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Give every function call in replayed response data a new call_id."""
+    for item in data.get("output") or []:
+        if item.get("type") == "function_call":
+            item["call_id"] = f"call_{secrets.token_hex(12)}"
+            # The item ID names the call in the response it was cached from
+            item.pop("id", None)
+    return data
+
+
+def _rewrite_call_arguments(data: Dict[str, Any], replacements: List[Tuple[str, str]]) -> Dict[str, Any]:
+    """Apply replacements to the parsed arguments of every function call in response data."""
+    for item in data.get("output") or []:
+        if item.get("type") == "function_call":
+            args = fast_json.loads(item["arguments"])
+            item["arguments"] = fast_json.dumps(_replace_in_strings(args, replacements))
+    return data
+
+
+class ResponseCache:
+    """
+    Two-tier cache in front of the Responses API.
+    
+    1. Exact: SHA256 over the full request (model, tools, input, settings).
+    2. Similarity (only with an embedder and a threshold calibrated for it):
+       embedding of the recent user turns, compared by cosine similarity
+       against earlier requests made with the same model, tools and settings.
+    3. Template: the user message with paths, URLs, numbers and quoted
+       strings factored out. Requests with the same skeleton reuse the
+       stored tool-call plan with the new slot values filled in.
+    
+    Only final answers are cached as answers. Tool calls are only reused
+    as plans for read-only tools, and the tools still run, so side effects
+    are never skipped.
+    """
+    
+    def __init__(
+        self,
+        store: CacheManager,
+        threshold: Optional[float] = None,
+        embed: Optional[Callable[[str], List[float]]] = None
+    ):
+        """
+        Initialize the response cache.
+        
+        Args:
+            store: CacheManager used to persist entries
+            threshold: Minimum cosine similarity for a similarity hit, calibrated for embed
+            embed: Function mapping normalized text to a unit vector. If it also
+                has an embed_batch(texts) method, uncached texts are embedded in one batch.
+                Without both embed and threshold only exact repeats (and tool plans) match.
+        """
+        self.store = store
+        self.threshold = threshold
+        self.embed = embed
+        
+        # Surface similarity can't tell "in French" from "in German", so matching
+        # by similarity needs a real sentence embedding and a threshold tuned for it
+        self.semantic_enabled = embed is not None and threshold is not None
+        
+        # Embeddings of stored texts, computed once per process
+        self._embeddings: Dict[str, List[float]] = {}
+    
+    def _exact_key(self, kwargs: Dict[str, Any]) -> str:
+        """Hash the full request."""
+        payload = fast_json.dumps(kwargs, sort_keys=True, default=fast_json.sdk_default)
+        return "exact:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _context_key(self, kwargs: Dict[str, Any]) -> str:
+        """Hash everything except the input, so similarity only matches like requests."""
+        context = {key: value for key, value in kwargs.items() if key != "input"}
+        payload = fast_json.dumps(context, sort_keys=True, default=fast_json.sdk_default)
+        return "semantic:" + hashlib.sha256(payload.encode("utf-8")).hexdigest()
+    
+    def _template_key(self, kwargs: Dict[str, Any], skeleton: str) -> str:
+        """Hash the request context together with a prompt skeleton."""
+        context_key = self._context_key(kwargs)
+        return "template:" + hashlib.sha256(f"{context_key}\n{skeleton}".encode("utf-8")).hexdigest()
+    
+    def _last_user_message(self, kwargs: Dict[str, Any]) -> Optional[str]:
+        """
+        Get the final user message of a request.
+        
+        Returns None unless the request ends with a plain user message (the
+        start of a turn) - later steps depend on tool output, not the prompt.
+        """
+        input_list = kwargs.get("input") or []
+        if not input_list:
+            return None
+        
+        last = input_list[-1]
+        if not isinstance(last, dict) or last.get("role") != "user" or not isinstance(last.get("content"), str):
+            return None
+        return last["content"]
+    
+    def _semantic_text(self, kwargs: Dict[str, Any]) -> Optional[str]:
+        """
+        Get the text used for similarity matching.
+        
+        The previous user turn is included so follow-up questions are
+        matched together with what they follow up on.
+        """
+        if self._last_user_message(kwargs) is None:
+            return None
+        
+        input_list = kwargs["input"]
+        user_turns = [
+            item["content"] for item in input_list
+            if isinstance(item, dict) and item.get("role") == "user" and isinstance(item.get("content"), str)
+        ]
+        return normalize_text("\n".join(user_turns[-2:]))
+    
+    def _embedding(self, text: str) -> List[float]:
+        """Get the embedding for a normalized text, computing it on first use."""
+        vector = self._embeddings.get(text)
+        if vector is None:
+            vector = self.embed(text)
+            self._embeddings[text] = vector
+        return vector
+    
+    def _embed_missing(self, texts: List[str]):
+        """Compute embeddings for texts not seen yet, in one batch when the embedder supports it."""
+        missing = list(dict.fromkeys(text for text in texts if text not in self._embeddings))
+        if not missing:
+            return
+        
+        embed_batch = getattr(self.embed, "embed_batch", None)
+        vectors = embed_batch(missing) if embed_batch else [self.embed(text) for text in missing]
+        self._embeddings.update(zip(missing, vectors))
+    
+    def get(self, kwargs: Dict[str, Any]) -> Optional[Response]:
+        """
+        Look up a cached response for a request.
+        
+        Args:
+            kwargs: Keyword arguments of the Responses API call
+        
+        Returns:
+            Cached response or None on a miss. Usage is cleared on hits
+            since no tokens were spent.
+        """
+        if kwargs.get("tool_choice") == "required":
+            return None
+        
+        data = self._lookup(kwargs)
+        if data is None:
+            return None
+        return Response.model_validate({**data, "usage": None})
+    
+    def _lookup(self, kwargs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Find cached response data, trying the exact tier first."""
+        cached = self.store.get(self._exact_key(kwargs))
+        if cached is not None:
+            return cached
+        
+        if self.semantic_enabled:
+            cached = self._lookup_semantic(kwargs)
+            if cached is not None:
+                return cached
+        
+        return self._lookup_template(kwargs)
+    
+    def _lookup_semantic(self, kwargs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Find the stored answer whose user turns are most similar to the request."""
+        text = self._semantic_text(kwargs)
+        if text is None:
+            return None
+        
+        entries = self.store.get(self._context_key(kwargs)) or []
+        if not entries:
+            return None
+        
+        self._embed_missing([text] + [entry["text"] for entry in entries])
+        query = self._embedding(text)
+        best_score, best_key = 0.0, None
+        for entry in entries:
+            vector = self._embedding(entry["text"])
+            score = sum(a * b for a, b in zip(query, vector))
+            if score > best_score:
+                best_score, best_key = score, entry["response_key"]
+        
+        if best_key is not None and best_score >= self.threshold:
+            return self.store.get(best_key)
+        return None
+    
+    def _lookup_template(self, kwargs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Find a stored tool-call plan with the same skeleton and fill in the slots."""
+        message = self._last_user_message(kwargs)
+        if message is None:
+            return None
+        
+        skeleton, values = extract_template(message)
+        if not values:
+            return None
+        
+        template = self.store.get(self._template_key(kwargs, skeleton))
+        if template is None or template["slots"] != len(values):
+            return None
+        
+        placeholders = [(f"<<slot{i}>>", value) for i, value in enumerate(values)]
+        data = _rewrite_call_arguments(copy.deepcopy(template["response"]), placeholders)
+        return _fresh_call_ids(data)
+    
+    def set(self, kwargs: Dict[str, Any], response: Any):
+        """
+        Store a response if it is a cacheable final answer.
+        
+        Args:
+            kwargs: Keyword arguments of the Responses API call
+            response: Response object returned by the API
+        """
+        if kwargs.get("tool_choice") == "required":
+            return
+        
+        output = getattr(response, "output", None)
+        if not output:
+            return
+        
+        if any(getattr(item, "type", None) in TOOL_CALL_TYPES for item in output):
+            self._set_template(kwargs, response)
+            return
+        
+        exact_key = self._exact_key(kwargs)
+        self.store.set(exact_key, response.model_dump(mode="json"))
+        
+        text = self._semantic_text(kwargs) if self.semantic_enabled else None
+        if text is None:
+            return
+        
+        context_key = self._context_key(kwargs)
+        entries = [entry for entry in (self.store.get(context_key) or []) if entry["text"] != text]
+        entries.append({"text": text, "response_key": exact_key})
+        self.store.set(context_key, entries[-MAX_SEMANTIC_ENTRIES:])
+    
+    def _set_template(self, kwargs: Dict[str, Any], response: Any):
+        """
+        Store a tool-call plan with its slot values replaced by placeholders.
+        
+        Only plans calling read-only tools are stored, and only when every
+        slot value shows up in the call arguments - otherwise the plan does
+        not depend on the slots the way the template assumes.
+        """
+        message = self._last_user_message(kwargs)
+        if message is None:
+            return
+        
+        skeleton, values = extract_template(message)
+        if not values:
+            return
+        
+        calls = [item for item in response.output if getattr(item, "type", None) in TOOL_CALL_TYPES]
+        if any(getattr(call, "name", None) not in TEMPLATABLE_TOOLS for call in calls):
+            return
+        
+        arguments = "\n".join(fast_json.dumps(fast_json.loads(call.arguments)) for call in calls)
+        if any(fast_json.dumps(value)[1:-1] not in arguments for value in values):
+            return
+        
+        # Replace longer values first so a value contained in another stays intact
+        placeholders = sorted(
+            ((value, f"<<slot{i}>>") for i, value in enumerate(values)),
+            key=lambda pair: len(pair[0]),
+            reverse=True
+        )
+        data = _rewrite_call_arguments(response.model_dump(mode="json"), placeholders)
+        self.store.set(self._template_key(kwargs, skeleton), {"slots": len(values), "response": data})
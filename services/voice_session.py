@@ -1,9 +1,14 @@
 """Voice session manager combining Realtime API with audio handling."""
+import bisect
+import queue
+import re
 import sys
 import signal
 import threading
+import time
+from collections import deque
 from datetime import datetime
-from typing import Optional
+from typing import Deque, Dict, List, Optional
 from rich.console import Console
 from rich.panel import Panel
 from rich.live import Live
@@ -17,6 +22,60 @@ from config.settings import COST_WARNING_THRESHOLD, MAX_COST_PER_REQUEST
 
 console = Console()
 
+# Messages kept for the turn in progress before older ones are dropped
+MAX_OPEN_TURN_MESSAGES = 512
+
+# Most recent messages saved to memory for resuming a session, bounded by count and
+# by total characters so memory.json and the replayed prompt stay small
+MAX_RESUME_MESSAGES = 40
+MAX_RESUME_CHARS = 20000
+
+# Usage line color by cost: below the warning threshold, from it, and from the hard limit
+_COST_THRESHOLDS = (COST_WARNING_THRESHOLD, MAX_COST_PER_REQUEST)
+_COST_COLORS = ("dim", "yellow", "red")
+
+# Words that end the session when the user says them
+EXIT_WORDS = frozenset(("goodbye", "exit", "quit", "bye"))
+# One case-insensitive pass that stops at the first whole-word exit word
+_EXIT_PATTERN = re.compile(r"\b(?:" + "|".join(sorted(EXIT_WORDS)) + r")\b", re.IGNORECASE)
+
+
+def resume_tail(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
+    """
+    Keep the most recent messages that fit the resume bounds.
+    
+    Args:
+        messages: {"role", "content"} dicts in their original order
+    
+    Returns:
+        The newest messages (at most MAX_RESUME_MESSAGES, MAX_RESUME_CHARS of content)
+    """
+    tail = []
+    chars = 0
+    for message in reversed(messages[-MAX_RESUME_MESSAGES:]):
+        chars += len(message["content"])
+        if chars > MAX_RESUME_CHARS:
+            break
+        tail.append({"role": message["role"], "content": message["content"]})
+    tail.reverse()
+    return tail
+
+
+def last_voice_messages(memory: Dict) -> List[Dict[str, str]]:
+    """
+    Get the messages saved by the most recent voice session.
+    
+    Args:
+        memory: Dictionary loaded by MemoryManager.load_memory()
+    
+    Returns:
+        Its {"role", "content"} messages, or an empty list if there is none
+    """
+    for conversation in reversed(memory.get("conversations", [])):
+        if conversation.get("mode", "").startswith("voice") and conversation.get("messages"):
+            return resume_tail(conversation["messages"])
+    return []
+
 
 class VoiceSession:
     """Manages a complete voice interaction session."""
@@ -26,7 +85,8 @@ class VoiceSession:
         ask_mode: bool = False,
         voice: str = "alloy",
         model: str = "gpt-realtime",
-        push_to_talk: bool = False
+        push_to_talk: bool = False,
+        resume_messages: Optional[List[Dict[str, str]]] = None
     ):
         """
         Initialize the voice session.
@@ -36,6 +96,7 @@ class VoiceSession:
             voice: Voice for audio output
             model: Realtime model to use
             push_to_talk: If True, only record while spacebar is held
+            resume_messages: "messages" saved by an earlier voice session to continue from
         """
         self.ask_mode = ask_mode
         self.voice = voice
@@ -49,16 +110,27 @@ class VoiceSession:
         
         # Session state
         self.running = False
-        self.conversation_history = []
+        # Messages of the turn in progress; moved to _committed when the response completes
+        self.conversation_history: Deque[dict] = deque(maxlen=MAX_OPEN_TURN_MESSAGES)
+        self._committed: List[dict] = []  # Closed turns, append-only (stable prefix)
+        self._resume_messages = resume_messages or []
         self.current_user_text = ""
         self.current_assistant_text = ""
-        self.session_start_time: Optional[datetime] = None
+        self.session_start_time: Optional[datetime] = None  # Wall clock, for the memory timestamp
+        self._monotonic_start: Optional[float] = None  # For the session duration
         self.last_usage: Optional[UsageStats] = None
         self.cost_limit_reached = False
         self.cost_warning_shown = False
+        self._exit_requested = False  # Set when the user says an exit word
+        self._stop_event = threading.Event()  # Wakes run() when the session should end
         
         # Display state
         self._display_lock = threading.Lock()
+        
+        # Mid-session output is rendered by one printer thread, so callbacks on the
+        # audio/event threads never wait on terminal I/O
+        self._print_queue: queue.SimpleQueue = queue.SimpleQueue()
+        self._printer: Optional[threading.Thread] = None
     
     def _setup_signal_handlers(self):
         """Setup signal handlers for graceful shutdown."""
@@ -70,6 +142,25 @@ class VoiceSession:
         signal.signal(signal.SIGINT, signal_handler)
         signal.signal(signal.SIGTERM, signal_handler)
     
+    def _print(self, *renderables):
+        """Queue output for the printer thread (same arguments as console.print)."""
+        self._print_queue.put(renderables)
+    
+    def _print_loop(self):
+        """Render queued output until the None sentinel arrives."""
+        while True:
+            renderables = self._print_queue.get()
+            if renderables is None:
+                break
+            console.print(*renderables)
+    
+    def _stop_printer(self):
+        """Flush queued output and stop the printer thread."""
+        printer, self._printer = self._printer, None
+        if printer:
+            self._print_queue.put(None)
+            printer.join(timeout=2.0)
+    
     def _on_transcript(self, role: str, text: str):
         """Handle transcript updates."""
         with self._display_lock:
@@ -80,7 +171,11 @@ class VoiceSession:
                     "content": text,
                     "timestamp": datetime.now().isoformat()
                 })
-                console.print(f"\n[bold cyan]You:[/bold cyan] {text}")
+                # Check for exit words once, when the message arrives
+                if _EXIT_PATTERN.search(text):
+                    self._exit_requested = True
+                    self._stop_event.set()
+                self._print(f"\n[bold cyan]You:[/bold cyan] {text}")
             else:
                 self.current_assistant_text = text
                 self.conversation_history.append({
@@ -88,7 +183,7 @@ class VoiceSession:
                     "content": text,
                     "timestamp": datetime.now().isoformat()
                 })
-                console.print(f"\n[bold green]Lolo:[/bold green] {text}")
+                self._print(f"\n[bold green]Lolo:[/bold green] {text}")
     
     def _on_audio_delta(self, audio_data: bytes):
         """Handle audio output from the model."""
@@ -97,16 +192,22 @@ class VoiceSession:
     
     def _on_error(self, error: str):
         """Handle errors."""
-        console.print(f"[red]Error: {error}[/red]")
+        self._print(f"[red]Error: {error}[/red]")
     
     def _on_session_created(self, event: dict):
         """Handle session creation."""
         session_id = event.get("session", {}).get("id", "unknown")
-        console.print(f"[dim]Session ID: {session_id}[/dim]")
+        self._print(f"[dim]Session ID: {session_id}[/dim]")
     
     def _on_response_done(self, event: dict, usage: UsageStats):
         """Handle response completion and display usage."""
         self.last_usage = usage
+        
+        # The turn is closed, commit its messages to the stable prefix
+        with self._display_lock:
+            self._committed.extend(self.conversation_history)
+            self.conversation_history.clear()
+        
         self._display_usage(usage)
         self._check_cost_limits(usage)
     
@@ -124,15 +225,10 @@ class VoiceSession:
         text_out = usage.output_tokens
         cost = usage.total_cost
         
-        # Color based on cost level
-        if cost >= MAX_COST_PER_REQUEST:
-            cost_color = "red"
-        elif cost >= COST_WARNING_THRESHOLD:
-            cost_color = "yellow"
-        else:
-            cost_color = "dim"
+        # Color based on cost level (bisect_right so reaching a threshold counts)
+        cost_color = _COST_COLORS[bisect.bisect_right(_COST_THRESHOLDS, cost)]
         
-        console.print(
+        self._print(
             f"[{cost_color}]💰 Audio: {audio_in:,}→{audio_out:,} | "
             f"Text: {text_in:,}→{text_out:,} | "
             f"Total: ${cost:.4f}[/{cost_color}]"
@@ -145,21 +241,22 @@ class VoiceSession:
         # Hard limit - stop session
         if cost >= MAX_COST_PER_REQUEST:
             self.cost_limit_reached = True
-            console.print()
-            console.print(Panel(
+            self._print()
+            self._print(Panel(
                 f"[red]Cost limit reached: ${cost:.4f} >= ${MAX_COST_PER_REQUEST:.2f}[/red]\n\n"
                 "Session will end to prevent excessive costs.",
                 title="[bold red]❌ Cost Limit Exceeded[/bold red]",
                 border_style="red"
             ))
             self.running = False
+            self._stop_event.set()
             return
         
         # Warning threshold
         if cost >= COST_WARNING_THRESHOLD and not self.cost_warning_shown:
             self.cost_warning_shown = True
-            console.print()
-            console.print(Panel(
+            self._print()
+            self._print(Panel(
                 f"[yellow]High cost detected: ${cost:.4f}[/yellow]\n\n"
                 f"Approaching limit of ${MAX_COST_PER_REQUEST:.2f}. "
                 "Consider ending the session soon.",
@@ -205,21 +302,26 @@ Model: [cyan]{self.model}[/cyan]
         console.print(panel)
         console.print()
     
+    @property
+    def message_count(self) -> int:
+        """Number of messages in the session so far."""
+        return len(self._committed) + len(self.conversation_history)
+    
     def _display_session_summary(self):
         """Display session summary on exit."""
-        if not self.conversation_history and not self.last_usage:
+        if not self.message_count and not self.last_usage:
             return
         
-        duration = datetime.now() - self.session_start_time if self.session_start_time else None
+        duration = time.monotonic() - self._monotonic_start if self._monotonic_start is not None else None
         
         table = Table(title="[bold]Session Summary[/bold]", show_header=False, box=None)
         table.add_column("Metric", style="cyan", justify="right")
         table.add_column("Value", style="white")
         
-        table.add_row("Messages", str(len(self.conversation_history)))
-        if duration:
-            minutes = int(duration.total_seconds() // 60)
-            seconds = int(duration.total_seconds() % 60)
+        table.add_row("Messages", str(self.message_count))
+        if duration is not None:
+            minutes = int(duration // 60)
+            seconds = int(duration % 60)
             table.add_row("Duration", f"{minutes}m {seconds}s")
         table.add_row("Mode", "Ask-Only" if self.ask_mode else "Normal")
         
@@ -246,12 +348,17 @@ Model: [cyan]{self.model}[/cyan]
         """
         self._setup_signal_handlers()
         self.session_start_time = datetime.now()
+        self._monotonic_start = time.monotonic()
+        
+        self._printer = threading.Thread(target=self._print_loop, daemon=True)
+        self._printer.start()
         
         # Initialize audio handler
         console.print("[cyan]Initializing audio...[/cyan]")
         self.audio = AudioHandler(push_to_talk=self.push_to_talk)
         if not self.audio.start():
             console.print("[red]Failed to initialize audio[/red]")
+            self._stop_printer()
             return False
         
         # Initialize realtime service
@@ -269,6 +376,7 @@ Model: [cyan]{self.model}[/cyan]
         self.realtime.on_session_created = self._on_session_created
         self.realtime.on_response_done = self._on_response_done
         self.realtime.on_interrupted = self._on_interrupted
+        self.realtime.on_disconnected = self._stop_event.set
         
         # Connect audio input to realtime service
         self.audio.on_audio_input = self.realtime.send_audio
@@ -277,8 +385,18 @@ Model: [cyan]{self.model}[/cyan]
         if not self.realtime.connect():
             console.print("[red]Failed to connect to Realtime API[/red]")
             self.audio.stop()
+            self._stop_printer()
             return False
         
+        # Replay a resumed conversation first, byte-for-byte and in order, so it forms
+        # the same prompt prefix as before. Those messages stay at the head of _committed.
+        if self._resume_messages:
+            self.realtime.add_history(self._resume_messages)
+            self._committed.extend(
+                {"role": message["role"], "content": message["content"]}
+                for message in self._resume_messages
+            )
+        
         self.running = True
         self._display_welcome()
         
@@ -290,28 +408,16 @@ Model: [cyan]{self.model}[/cyan]
             return
         
         try:
-            # Main loop - just keep running until stopped
-            while self.running and self.realtime and self.realtime.connected:
-                # Check for cost limit
-                if self.cost_limit_reached:
-                    console.print("\n[red]Session ended due to cost limit.[/red]")
-                    break
-                
-                # Check for exit commands in conversation
-                if self.conversation_history:
-                    last_user_msg = None
-                    for msg in reversed(self.conversation_history):
-                        if msg["role"] == "user":
-                            last_user_msg = msg["content"].lower()
-                            break
-                    
-                    if last_user_msg and any(word in last_user_msg for word in ["goodbye", "exit", "quit", "bye"]):
-                        console.print("\n[yellow]Ending session...[/yellow]")
-                        break
-                
-                # Small sleep to prevent busy loop
-                import time
-                time.sleep(0.1)
+            # Sleep until something ends the session: cost limit, exit word, disconnect or stop()
+            self._stop_event.wait()
+            
+            # Let queued output (e.g. the last reply) land before the closing message
+            self._stop_printer()
+            
+            if self.cost_limit_reached:
+                console.print("\n[red]Session ended due to cost limit.[/red]")
+            elif self._exit_requested:
+                console.print("\n[yellow]Ending session...[/yellow]")
                 
         except KeyboardInterrupt:
             console.print("\n[yellow]Session interrupted[/yellow]")
@@ -321,6 +427,7 @@ Model: [cyan]{self.model}[/cyan]
     def stop(self):
         """Stop the voice session."""
         self.running = False
+        self._stop_event.set()
         
         if self.realtime:
             self.realtime.disconnect()
@@ -330,35 +437,45 @@ Model: [cyan]{self.model}[/cyan]
             self.audio.stop()
             self.audio = None
         
+        self._stop_printer()
         self._display_session_summary()
         
-        # Save conversation to memory
-        if self.conversation_history or self.last_usage:
-            memory = self.memory_manager.load_memory()
-            
-            # Get usage stats
-            usage = self.last_usage or UsageStats()
-            
-            conversation_data = {
-                "timestamp": self.session_start_time.isoformat() if self.session_start_time else datetime.now().isoformat(),
-                "question": "[Voice Session]",
-                "response": f"Voice conversation with {len(self.conversation_history)} messages",
-                "tools_used": [],
-                "tokens": {
-                    "input": usage.input_tokens + usage.input_audio_tokens,
-                    "output": usage.output_tokens + usage.output_audio_tokens,
-                    "cached": usage.cached_tokens,
-                    "reasoning": 0
-                },
-                "cost": usage.total_cost,
-                "model": self.model,
-                "reasoning_effort": "none",
-                "mode": "voice-ask" if self.ask_mode else "voice"
-            }
-            self.memory_manager.add_conversation(memory, conversation_data)
+        # Save conversation to memory (nothing to save if nothing happened)
+        if not self.message_count and not self.last_usage:
+            return
+        
+        # A turn still open at shutdown is saved too
+        with self._display_lock:
+            self._committed.extend(self.conversation_history)
+            self.conversation_history.clear()
+        
+        usage = self.last_usage or UsageStats()
+        input_total = usage.input_tokens + usage.input_audio_tokens
+        output_total = usage.output_tokens + usage.output_audio_tokens
+        
+        conversation_data = {
+            "timestamp": self.session_start_time.isoformat() if self.session_start_time else datetime.now().isoformat(),
+            "question": "[Voice Session]",
+            "response": f"Voice conversation with {self.message_count} messages",
+            "tools_used": [],
+            "tokens": {
+                "input": input_total,
+                "output": output_total,
+                "cached": usage.cached_tokens,
+                "reasoning": 0
+            },
+            "cost": usage.total_cost,
+            "model": self.model,
+            "reasoning_effort": "none",
+            "mode": "voice-ask" if self.ask_mode else "voice",
+            # Only what resuming needs: the newest role/content pairs, bounded
+            "messages": resume_tail(self._committed)
+        }
+        memory = self.memory_manager.load_memory()
+        self.memory_manager.add_conversation(memory, conversation_data)
 
 
-def run_voice_mode(ask_mode: bool = False, voice: str = "alloy", push_to_talk: bool = False):
+def run_voice_mode(ask_mode: bool = False, voice: str = "alloy", push_to_talk: bool = False, resume: bool = False):
     """
     Run the voice mode session.
     
@@ -366,6 +483,20 @@ def run_voice_mode(ask_mode: bool = False, voice: str = "alloy", push_to_talk: b
         ask_mode: If True, disable command execution
         voice: Voice for audio output
         push_to_talk: If True, only record while spacebar is held
+        resume: If True, continue the conversation of the last voice session
     """
-    session = VoiceSession(ask_mode=ask_mode, voice=voice, push_to_talk=push_to_talk)
+    resume_messages = None
+    if resume:
+        resume_messages = last_voice_messages(MemoryManager().load_memory())
+        if resume_messages:
+            console.print(f"[dim]Resuming the last voice session ({len(resume_messages)} messages)[/dim]")
+        else:
+            console.print("[dim]No earlier voice session to resume, starting a new one[/dim]")
+    
+    session = VoiceSession(
+        ask_mode=ask_mode,
+        voice=voice,
+        push_to_talk=push_to_talk,
+        resume_messages=resume_messages
+    )
     session.run()
@@ -68,6 +68,19 @@ uv pip install -r requirements.txt
 echo "✓ Dependencies installed"
 echo ""
 
+# Optional accelerators, each skipped if it can't be installed (e.g. no wheel)
+echo "Installing optional accelerators..."
+grep -v '^#' requirements-optional.txt | while read -r package; do
+    if [ -n "$package" ]; then
+        if uv pip install "$package" > /dev/null 2>&1; then
+            echo "✓ $package"
+        else
+            echo "⚠ Skipped $package (optional)"
+        fi
+    fi
+done
+echo ""
+
 # Create .lolo directory for memory storage
 LOLO_DIR="$HOME/.lolo"
 if [ ! -d "$LOLO_DIR" ]; then
@@ -0,0 +1,95 @@
+"""Tests for the Python executor."""
+import importlib
+import time
+import unittest
+
+from tools.python_executor import _STAR_IMPORT_MODULES, _blocked_attribute, execute_python, validate_code_safety
+
+# Code that reaches the shell, files or the module table around the import checks
+BYPASSES = {
+    "built import": '__import__("o" + "s").system("id")',
+    "getattr lookup": 'import sys\ngetattr(sys.modules["o" + "s"], "sys" + "tem")("id")',
+    "module table": 'import sys\nsys.modules["o" + "s"].system("id")',
+    "imported module table": 'from sys import modules\nmodules["os"].system("id")',
+    "module via another module": 'import random\nrandom._os.system("echo pwned")',
+    "file via another module": 'import io\nprint(io.open("/etc/hostname").read())',
+    "aliased module": 'import os as o\no.system("id")',
+    "imported function": 'from os import popen as p\np("id")',
+    "exec family": 'import os\nos.execv("/bin/sh", ["sh"])',
+    "attrgetter": 'import operator\noperator.attrgetter("system")',
+    "frame globals": 'import sys\nsys._getframe().f_globals',
+    "format string dunder": 'print("{0.__class__.__base__}".format(1))',
+    "star import": 'from os import *\nsystem("echo hi")',
+    "star import of a submodule": 'from os.path import *',
+    "module name lookup": 'import sys\nprint(hasattr(sys, "subprocess"))',
+    "code string": 'stmt = "import os; os.system(\'id\')"',
+    "string runner": 'import timeit\ntimeit.timeit("o" + "s.system(\'id\')", "import os", number=1)',
+}
+
+# Ordinary code that mentions blocked names without using them
+ALLOWED = {
+    "platform": "import platform\nprint(platform.system())",
+    "prose": 'print("I use requests to open the file")',
+    "data keys": 'bar = {"open": 1.0, "close": 2.0, "type": "daily", "system": "linux"}\nprint(bar["open"])',
+    "math": "import math\nprint(math.sqrt(2))",
+    "os path": "import os\nprint(os.path.join('a', 'b'))",
+    "status code key": 'resp = {"code": 200}\nprint(resp["code"])',
+    "module names as data": 'mode = "trace"\nx = "profile"\nname = "subprocess"',
+    "compute star import": "from math import *\nprint(sqrt(16))",
+}
+
+
+class ValidateCodeSafetyTest(unittest.TestCase):
+    def test_bypasses_are_blocked(self):
+        for label, code in BYPASSES.items():
+            with self.subTest(label):
+                is_safe, error = validate_code_safety(code)
+                self.assertFalse(is_safe)
+                self.assertIn("Dangerous operation blocked", error)
+    
+    def test_ordinary_code_is_allowed(self):
+        for label, code in ALLOWED.items():
+            with self.subTest(label):
+                self.assertEqual(validate_code_safety(code), (True, None))
+    
+    def test_star_import_modules_have_no_blocked_names(self):
+        for name in _STAR_IMPORT_MODULES:
+            module = importlib.import_module(name)
+            public = getattr(module, "__all__", [n for n in dir(module) if not n.startswith("_")])
+            with self.subTest(name):
+                self.assertEqual([n for n in public if _blocked_attribute(name, n)], [])
+    
+    def test_blocked_code_does_not_run(self):
+        result = execute_python(BYPASSES["module via another module"])
+        
+        self.assertIn("Dangerous operation blocked", result)
+        self.assertNotIn("pwned", result)
+    
+    def test_allowed_code_runs(self):
+        self.assertIn("1.414", execute_python(ALLOWED["math"]))
+
+
+class ExecutePythonTest(unittest.TestCase):
+    def test_fd_writes_are_captured(self):
+        result = execute_python('import os\nos.write(1, b"written to fd 1\\n")\nos.write(2, b"written to fd 2\\n")')
+        
+        self.assertIn("OUTPUT:\nwritten to fd 1", result)
+        self.assertIn("ERRORS/WARNINGS:\nwritten to fd 2", result)
+    
+    def test_timeout_covers_threads(self):
+        code = "import threading, time\nthreading.Thread(target=time.sleep, args=(8,)).start()"
+        
+        start = time.monotonic()
+        result = execute_python(code, timeout=1)
+        
+        self.assertIn("timed out", result)
+        self.assertLess(time.monotonic() - start, 3)
+    
+    def test_thread_output_is_kept(self):
+        code = "import threading\nthreading.Thread(target=print, args=('from a thread',)).start()"
+        
+        self.assertIn("from a thread", execute_python(code))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,150 @@
+"""Tests for the response cache."""
+import tempfile
+import unittest
+
+from openai.types.responses import Response
+
+from services.cache_manager import CacheManager
+from services.response_cache import ResponseCache
+
+# Earlier user turn the follow-ups below are asked after
+PREVIOUS_QUESTION = (
+    "Summarize the article at the top of the page you fetched earlier about the history "
+    "of the Eiffel Tower, who designed it and how it was built for the 1889 World Fair"
+)
+
+# Follow-up questions one word apart, which must never share an answer
+NEAR_MISSES = [
+    ("explain it in French", "explain it in German"),
+    ("is it true?", "is it false?"),
+    ("what is 12 times 14", "what is 12 times 15"),
+]
+
+
+def request(question: str) -> dict:
+    """Build Responses API kwargs for a follow-up question."""
+    return {
+        "model": "gpt-5.1",
+        "tools": [],
+        "tool_choice": "auto",
+        "reasoning": {"effort": "none"},
+        "text": {"verbosity": "medium"},
+        "input": [
+            {"role": "system", "content": "You are Lolo."},
+            {"role": "user", "content": PREVIOUS_QUESTION},
+            {"role": "assistant", "content": "The Eiffel Tower was designed by Gustave Eiffel's company."},
+            {"role": "user", "content": question},
+        ],
+    }
+
+
+def answer(text: str) -> Response:
+    """Build a final-answer response."""
+    return Response.model_validate({
+        "id": "resp_1",
+        "object": "response",
+        "created_at": 0,
+        "model": "gpt-5.1",
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+        "output": [{
+            "type": "message",
+            "id": "msg_1",
+            "role": "assistant",
+            "status": "completed",
+            "content": [{"type": "output_text", "text": text, "annotations": []}],
+        }],
+    })
+
+
+def tool_call(name: str, arguments: str, call_id: str = "call_1") -> Response:
+    """Build a response that asks for one function call."""
+    return Response.model_validate({
+        "id": "resp_1",
+        "object": "response",
+        "created_at": 0,
+        "model": "gpt-5.1",
+        "parallel_tool_calls": True,
+        "tool_choice": "auto",
+        "tools": [],
+        "output": [{
+            "type": "function_call",
+            "id": "fc_1",
+            "call_id": call_id,
+            "name": name,
+            "arguments": arguments,
+            "status": "completed",
+        }],
+    })
+
+
+class ResponseCacheTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self.store = CacheManager(cache_dir=self._tmp.name, ttl=900)
+    
+    def tearDown(self):
+        self._tmp.cleanup()
+    
+    def test_exact_repeat_hits(self):
+        cache = ResponseCache(self.store)
+        cache.set(request("explain it in French"), answer("En français"))
+        
+        cached = cache.get(request("explain it in French"))
+        self.assertIsNotNone(cached)
+        self.assertEqual(cached.output_text, "En français")
+        self.assertIsNone(cached.usage)
+    
+    def test_near_misses_do_not_hit(self):
+        cache = ResponseCache(self.store)
+        for cached_question, question in NEAR_MISSES:
+            with self.subTest(question=question):
+                cache.set(request(cached_question), answer(cached_question))
+                self.assertIsNone(cache.get(request(question)))
+    
+    def test_near_misses_do_not_hit_after_reload(self):
+        # Entries persist on disk, a new process must not match them either
+        ResponseCache(self.store).set(request("is it true?"), answer("Yes"))
+        
+        cache = ResponseCache(CacheManager(cache_dir=self._tmp.name, ttl=900))
+        self.assertIsNone(cache.get(request("is it false?")))
+    
+    def test_similarity_needs_a_calibrated_threshold(self):
+        # An embedder without a threshold calibrated for it does not enable matching
+        cache = ResponseCache(self.store, embed=lambda text: [1.0])
+        self.assertFalse(cache.semantic_enabled)
+        
+        cache.set(request("explain it in French"), answer("En français"))
+        self.assertIsNone(cache.get(request("explain it in German")))
+    
+    def test_similarity_with_embedder_and_threshold(self):
+        cache = ResponseCache(self.store, threshold=0.99, embed=lambda text: [1.0])
+        self.assertTrue(cache.semantic_enabled)
+        
+        cache.set(request("explain it in French"), answer("En français"))
+        self.assertIsNotNone(cache.get(request("explain it again in French")))
+    
+    def test_template_replay_uses_new_call_ids(self):
+        cache = ResponseCache(self.store)
+        cache.set(request("describe ~/cat.png"), tool_call("analyze_image", '{"image_source": "~/cat.png"}'))
+        
+        replayed = cache.get(request("describe ~/dog.png"))
+        self.assertIsNotNone(replayed)
+        call = replayed.output[0]
+        self.assertEqual(call.arguments, '{"image_source":"~/dog.png"}')
+        self.assertNotEqual(call.call_id, "call_1")
+        self.assertIsNone(call.id)
+        
+        again = cache.get(request("describe ~/dog.png"))
+        self.assertNotEqual(again.output[0].call_id, call.call_id)
+    
+    def test_fetch_webpage_plans_are_not_templated(self):
+        cache = ResponseCache(self.store)
+        cache.set(request("read https://example.com/a"), tool_call("fetch_webpage", '{"url": "https://example.com/a"}'))
+        
+        self.assertIsNone(cache.get(request("read https://example.com/b")))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+"""Tests for voice session resume state."""
+import unittest
+
+from services.voice_session import MAX_RESUME_CHARS, MAX_RESUME_MESSAGES, last_voice_messages, resume_tail
+
+
+def messages(count: int, length: int = 10) -> list:
+    """Alternating user/assistant messages numbered from 0."""
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"{i:<{length}}", "timestamp": "2026-01-01T00:00:00"}
+        for i in range(count)
+    ]
+
+
+class ResumeTailTest(unittest.TestCase):
+    def test_keeps_newest_messages_by_count(self):
+        tail = resume_tail(messages(MAX_RESUME_MESSAGES + 10))
+        
+        self.assertEqual(len(tail), MAX_RESUME_MESSAGES)
+        self.assertEqual(tail[-1]["content"].strip(), str(MAX_RESUME_MESSAGES + 9))
+    
+    def test_keeps_newest_messages_by_size(self):
+        tail = resume_tail(messages(10, length=MAX_RESUME_CHARS // 4))
+        
+        self.assertEqual(len(tail), 4)
+        self.assertLessEqual(sum(len(message["content"]) for message in tail), MAX_RESUME_CHARS)
+        self.assertEqual(tail[-1]["content"].strip(), "9")
+    
+    def test_saves_role_and_content_only(self):
+        self.assertEqual(set(resume_tail(messages(2))[0]), {"role", "content"})
+
+
+class LastVoiceMessagesTest(unittest.TestCase):
+    def test_uses_the_latest_voice_session(self):
+        memory = {"conversations": [
+            {"mode": "voice", "messages": messages(2)},
+            {"mode": "voice-ask", "messages": messages(4)},
+            {"mode": "normal", "question": "hi", "response": "hello"},
+        ]}
+        
+        self.assertEqual(len(last_voice_messages(memory)), 4)
+    
+    def test_without_a_voice_session(self):
+        self.assertEqual(last_voice_messages({"conversations": [{"mode": "normal"}]}), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,42 @@
+"""Tests for webpage text extraction."""
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from tools import web_fetch
+from tools.web_fetch import extract_text_from_html
+
+PAGE = (Path(__file__).parent / "fixtures" / "page.html").read_text(encoding="utf-8")
+
+
+def extract_with(backend: str) -> str:
+    """Extract the fixture page with one parser, disabling the faster ones."""
+    faster = {"selectolax": [], "lxml": ["LexborHTMLParser"], "bs4": ["LexborHTMLParser", "lxml_html"]}[backend]
+    if not faster:
+        return extract_text_from_html(PAGE)
+    with mock.patch.multiple(web_fetch, **dict.fromkeys(faster)):
+        return extract_text_from_html(PAGE)
+
+
+class ExtractTextParityTest(unittest.TestCase):
+    def test_bs4_extracts_page_text(self):
+        text = extract_with("bs4")
+        
+        self.assertIn("Eiffel Tower – History", text)
+        self.assertIn("Text after a script stays.", text)
+        self.assertIn("330\xa0m tall & weighs", text)
+        self.assertIn("Café menus at the top — crêpes, « macarons ».", text)
+        for hidden in ("analytics", "font-family", "injected", "enable JavaScript", "navigation"):
+            self.assertNotIn(hidden, text)
+    
+    @unittest.skipUnless(web_fetch.lxml_html, "lxml is not installed")
+    def test_lxml_matches_bs4(self):
+        self.assertEqual(extract_with("lxml"), extract_with("bs4"))
+    
+    @unittest.skipUnless(web_fetch.LexborHTMLParser, "selectolax is not installed")
+    def test_selectolax_matches_bs4(self):
+        self.assertEqual(extract_with("selectolax"), extract_with("bs4"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,31 +1,43 @@
 """Tools package for function calling."""
+import importlib
+
 from .web_search import web_search_tool_definition
-from .web_search_function import web_search, web_search_function_tool_definition
-from .web_fetch import fetch_webpage, web_fetch_tool_definition
-from .image_analysis import analyze_image, analyze_image_tool_definition
-from .image_generation import (
-    generate_image,
-    generate_image_tool_definition,
-    edit_image,
-    edit_image_tool_definition
-)
-from .terminal import execute_command, execute_command_tool_definition
-from .python_executor import execute_python, python_executor_tool_definition
-
-__all__ = [
-    "web_search_tool_definition",
-    "web_search",
-    "web_search_function_tool_definition",
-    "fetch_webpage",
-    "web_fetch_tool_definition",
-    "analyze_image",
-    "analyze_image_tool_definition",
-    "generate_image",
-    "generate_image_tool_definition",
-    "edit_image",
-    "edit_image_tool_definition",
-    "execute_command",
-    "execute_command_tool_definition",
-    "execute_python",
-    "python_executor_tool_definition",
-]
+
+# Importing the submodule above binds it as `web_search`, shadowing the web_search
+# function export. Unbind it so the name resolves lazily to the function.
+del web_search
+
+# Exported name -> submodule defining it. Submodules (and their heavy dependencies
+# like PIL or requests) are imported on first attribute access, not at package import.
+_LAZY = {
+    "web_search": "web_search_function",
+    "web_search_function_tool_definition": "web_search_function",
+    "fetch_webpage": "web_fetch",
+    "web_fetch_tool_definition": "web_fetch",
+    "analyze_image": "image_analysis",
+    "analyze_image_tool_definition": "image_analysis",
+    "generate_image": "image_generation",
+    "generate_image_tool_definition": "image_generation",
+    "edit_image": "image_generation",
+    "edit_image_tool_definition": "image_generation",
+    "execute_command": "terminal",
+    "execute_command_tool_definition": "terminal",
+    "execute_python": "python_executor",
+    "python_executor_tool_definition": "python_executor",
+}
+
+__all__ = ["web_search_tool_definition", *_LAZY]
+
+
+def __getattr__(name):
+    module_name = _LAZY.get(name)
+    if module_name is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(f".{module_name}", __name__), name)
+    # Cache on the package so later lookups skip __getattr__
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
@@ -1,12 +1,38 @@
 """Image analysis tool definition and implementation."""
 import base64
+import functools
+import mmap
 import os
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Any, Dict, Optional, Tuple, Union
 from PIL import Image
 import io
 import math
 
+try:
+    import pybase64
+except ImportError:  # pybase64 is optional (SIMD base64), stdlib base64 works everywhere
+    pybase64 = None
+
+# Image sources starting with these are passed to the API as URLs
+_URL_PREFIXES = ("http://", "https://")
+
+# Supported file extensions and their MIME types
+_MIME_TYPES = {
+    '.png': 'image/png',
+    '.jpg': 'image/jpeg',
+    '.jpeg': 'image/jpeg',
+    '.webp': 'image/webp',
+    '.gif': 'image/gif'
+}
+_SUPPORTED_EXTS = frozenset(_MIME_TYPES)
+
+# Decoded (width, height, animated, error) per (path, mtime_ns, size), so follow-up
+# questions about an unchanged file skip the PIL header parse
+_HEADER_CACHE: Dict[tuple, Tuple[int, int, bool, Optional[str]]] = {}
+_HEADER_CACHE_SIZE = 128
+
 # Tool definition for OpenAI function calling (with strict mode)
 # Optimized for token efficiency while maintaining clarity
 analyze_image_tool_definition = {
@@ -37,86 +63,187 @@ analyze_image_tool_definition = {
 }
 
 
-def validate_image_format(file_path: Path) -> tuple[bool, Optional[str]]:
+@dataclass
+class ImageMeta:
+    """Everything the tool needs to know about a local image, gathered in one pass."""
+    width: int
+    height: int
+    ext: str
+    size: int
+    data: Union[bytes, mmap.mmap]  # Read-only mapping of the file, paged in on demand
+    animated: bool
+    error: Optional[str] = None  # Set when PIL could not decode the image
+
+
+def _probe(file_path: Path) -> ImageMeta:
     """
-    Validate that the image is in a supported format.
+    Map an image file once and decode its header once.
+    
+    The file is memory-mapped rather than read, so checking its size and
+    decoding its header only touch the pages they need, and a file rejected
+    by those checks is never read whole. The caller closes the mapping.
     
     Args:
         file_path: Path to the image file
     
     Returns:
-        Tuple of (is_valid, error_message)
+        ImageMeta with dimensions, extension, size and raw bytes
+    """
+    with open(file_path, "rb") as image_file:
+        stat = os.fstat(image_file.fileno())
+        try:
+            data = mmap.mmap(image_file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # Empty files cannot be mapped
+            data = b""
+    
+    ext = file_path.suffix.lower()
+    
+    # A modified file gets a new key, so stale entries are never returned
+    key = (str(file_path), stat.st_mtime_ns, stat.st_size)
+    header = _HEADER_CACHE.get(key)
+    if header is None:
+        header = _decode_header(data, ext)
+        if len(_HEADER_CACHE) >= _HEADER_CACHE_SIZE:
+            _HEADER_CACHE.pop(next(iter(_HEADER_CACHE)), None)
+        _HEADER_CACHE[key] = header
+    
+    width, height, animated, error = header
+    return ImageMeta(
+        width=width,
+        height=height,
+        ext=ext,
+        size=len(data),
+        data=data,
+        animated=animated,
+        error=error
+    )
+
+
+def _decode_header(data: Union[bytes, mmap.mmap], ext: str) -> Tuple[int, int, bool, Optional[str]]:
     """
-    supported_formats = {'.png', '.jpg', '.jpeg', '.webp', '.gif'}
+    Decode an image header with PIL.
     
-    # Check file extension
-    extension = file_path.suffix.lower()
-    if extension not in supported_formats:
-        return False, f"Unsupported format: {extension}. Supported formats: PNG, JPEG, WEBP, GIF"
+    Args:
+        data: Raw image bytes or mapping
+        ext: Lowercase file extension
     
+    Returns:
+        Tuple of (width, height, animated, error_message)
+    """
+    width = height = 0
+    animated = False
     try:
-        # Open and validate with PIL
-        with Image.open(file_path) as img:
-            # Check if GIF is animated
-            if extension == '.gif':
-                try:
-                    img.seek(1)  # Try to seek to second frame
-                    return False, "Animated GIFs are not supported. Only non-animated GIFs are allowed."
-                except EOFError:
-                    # Only one frame, so it's not animated
-                    pass
+        # mmap supports read/seek/tell, so PIL parses the header in place
+        with Image.open(data if isinstance(data, mmap.mmap) else io.BytesIO(data)) as img:
+            width, height = img.size
             
-            # Verify it's a valid image
-            img.verify()
-        
-        return True, None
-        
+            # Check if GIF is animated (reads up to the second frame only, unlike n_frames).
+            # No verify() pass: the API validates the full image data itself.
+            animated = ext == '.gif' and getattr(img, "is_animated", False)
     except Exception as e:
-        return False, f"Invalid or corrupted image file: {str(e)}"
+        return width, height, animated, str(e)
+    
+    return width, height, animated, None
 
 
-def validate_file_size(file_path: Path, max_size_mb: int = 50) -> tuple[bool, Optional[str]]:
+def validate_image_format(meta: ImageMeta) -> tuple[bool, Optional[str]]:
+    """
+    Validate that the image is in a supported format.
+    
+    Args:
+        meta: Probed image metadata
+    
+    Returns:
+        Tuple of (is_valid, error_message)
+    """
+    # Check file extension
+    if meta.ext not in _SUPPORTED_EXTS:
+        return False, f"Unsupported format: {meta.ext}. Supported formats: PNG, JPEG, WEBP, GIF"
+    
+    if meta.error is not None:
+        return False, f"Invalid or corrupted image file: {meta.error}"
+    
+    if meta.animated:
+        return False, "Animated GIFs are not supported. Only non-animated GIFs are allowed."
+    
+    return True, None
+
+
+def validate_file_size(meta: ImageMeta, max_size_mb: int = 50) -> tuple[bool, Optional[str]]:
     """
     Validate that the file size is within limits.
     
     Args:
-        file_path: Path to the image file
+        meta: Probed image metadata
         max_size_mb: Maximum file size in megabytes
     
     Returns:
         Tuple of (is_valid, error_message)
     """
-    file_size = file_path.stat().st_size
     max_size_bytes = max_size_mb * 1024 * 1024
     
-    if file_size > max_size_bytes:
-        size_mb = file_size / (1024 * 1024)
+    if meta.size > max_size_bytes:
+        size_mb = meta.size / (1024 * 1024)
         return False, f"File too large: {size_mb:.2f}MB (max: {max_size_mb}MB)"
     
     return True, None
 
 
-def encode_image_to_base64(file_path: Path) -> str:
+def encode_image_to_base64(meta: ImageMeta) -> str:
     """
-    Encode an image file to base64 string.
+    Encode an image to base64 string.
     
     Args:
-        file_path: Path to the image file
+        meta: Probed image metadata
     
     Returns:
         Base64-encoded string of the image
     """
-    with open(file_path, "rb") as image_file:
-        return base64.b64encode(image_file.read()).decode("utf-8")
+    return b64encode_string(meta.data)
+
+
+def b64encode_string(data: bytes) -> str:
+    """
+    Base64-encode bytes straight to a str, using pybase64 when available.
+    
+    Args:
+        data: Raw bytes to encode
+    
+    Returns:
+        Base64-encoded string
+    """
+    if pybase64:
+        return pybase64.b64encode_as_string(data)
+    return base64.b64encode(data).decode("ascii")
+
+
+def image_url_for(image_data: Dict) -> Optional[str]:
+    """
+    Get the API image URL for formatted image data.
+    
+    Local files carry their raw bytes until here, so the base64 data URL is
+    built exactly once, when the API message is assembled.
+    
+    Args:
+        image_data: Dictionary returned by format_image_for_api
+    
+    Returns:
+        Remote URL or base64 data URL
+    """
+    image_bytes = image_data.get("image_bytes")
+    if image_bytes is None:
+        return image_data.get("image_url")
+    return f"data:{image_data['mime_type']};base64,{b64encode_string(image_bytes)}"
 
 
-def calculate_image_tokens(file_path: Path, detail: str = "auto") -> int:
+def calculate_image_tokens(meta: ImageMeta, detail: str = "auto") -> int:
     """
     Calculate the token cost for an image based on its dimensions.
     Uses the formula from docs/image_usage.md for gpt-5.1 (same as gpt-5-mini).
     
     Args:
-        file_path: Path to the image file
+        meta: Probed image metadata
         detail: Detail level ('low', 'high', 'auto')
     
     Returns:
@@ -127,34 +254,22 @@ def calculate_image_tokens(file_path: Path, detail: str = "auto") -> int:
         return 85
     
     try:
-        with Image.open(file_path) as img:
-            width, height = img.size
+        width, height = meta.width, meta.height
         
         # Calculate patches needed (32px x 32px patches)
-        raw_patches = math.ceil(width / 32) * math.ceil(height / 32)
+        patches = math.ceil(width / 32) * math.ceil(height / 32)
         
-        # If patches exceed 1536, scale down
-        if raw_patches > 1536:
-            # Calculate shrink factor
+        # If patches exceed 1536, scale down so the width fits whole patches.
+        # Scaling by r and then by width_patches / (width * r / 32) leaves the width at
+        # exactly width_patches patches and the height at height * width_patches / width.
+        if patches > 1536:
             r = math.sqrt(32 * 32 * 1536 / (width * height))
-            
-            # Adjust to fit whole patches
-            resized_width = width * r
-            resized_height = height * r
-            
-            width_patches = math.floor(resized_width / 32)
-            height_patches = math.floor(resized_height / 32)
-            
-            # Scale again to fit width
+            width_patches = math.floor(width * r / 32)
             if width_patches > 0:
-                scale_factor = width_patches / (resized_width / 32)
-                resized_width = resized_width * scale_factor
-                resized_height = resized_height * scale_factor
-            
-            # Calculate final patches
-            patches = math.ceil(resized_width / 32) * math.ceil(resized_height / 32)
-        else:
-            patches = raw_patches
+                patches = width_patches * math.ceil(height * width_patches / width)
+            else:
+                # Narrower than one patch even after scaling
+                patches = math.ceil(height * r / 32)
         
         # Cap at 1536 patches
         patches = min(patches, 1536)
@@ -169,6 +284,33 @@ def calculate_image_tokens(file_path: Path, detail: str = "auto") -> int:
         return 1000
 
 
+@functools.lru_cache(maxsize=1)
+def _base_cwd() -> Path:
+    """Directory relative image paths resolve against, looked up once per process."""
+    # Use ORIGINAL_CWD if set by alias, otherwise use current directory
+    return Path(os.environ.get('ORIGINAL_CWD') or os.getcwd())
+
+
+def _resolve_path(image_source: str) -> Path:
+    """
+    Resolve a user-supplied image path to an absolute path.
+    
+    Args:
+        image_source: File path, possibly relative or starting with ~
+    
+    Returns:
+        Absolute path to the image
+    """
+    # Expand user home directory
+    file_path = Path(image_source).expanduser()
+    
+    # Make absolute if relative
+    if not file_path.is_absolute():
+        file_path = _base_cwd() / file_path
+    
+    return file_path
+
+
 def format_image_for_api(image_source: str, detail: str = "auto") -> Dict:
     """
     Format image for OpenAI API input.
@@ -179,10 +321,13 @@ def format_image_for_api(image_source: str, detail: str = "auto") -> Dict:
         detail: Detail level for analysis
     
     Returns:
-        Dictionary formatted for API input with image data
+        Dictionary formatted for API input with image data. Local files carry
+        raw "image_bytes" and "mime_type" instead of an "image_url"; use
+        image_url_for() to get the data URL. For local files "auto" detail is
+        resolved to "low" or "high" by smart_detail_selection().
     """
     # Check if it's a URL
-    if image_source.startswith(("http://", "https://")):
+    if image_source.startswith(_URL_PREFIXES):
         # For URLs, return the URL directly
         return {
             "type": "input_image",
@@ -191,65 +336,58 @@ def format_image_for_api(image_source: str, detail: str = "auto") -> Dict:
         }
     
     # Handle file path
-    # Expand user home directory
-    file_path = Path(image_source).expanduser()
-    
-    # Make absolute if relative
-    if not file_path.is_absolute():
-        # Use ORIGINAL_CWD if set by alias, otherwise use current directory
-        cwd = Path(os.environ.get('ORIGINAL_CWD', os.getcwd()))
-        file_path = cwd / file_path
+    file_path = _resolve_path(image_source)
     
     # Check if file exists
     if not file_path.exists():
         raise FileNotFoundError(f"Image file not found: {file_path}")
     
-    # Validate format
-    is_valid, error = validate_image_format(file_path)
-    if not is_valid:
-        raise ValueError(error)
-    
-    # Validate size
-    is_valid, error = validate_file_size(file_path)
-    if not is_valid:
-        raise ValueError(error)
+    # Read and decode the header once, everything below works from this
+    meta = _probe(file_path)
+    try:
+        # Validate format
+        is_valid, error = validate_image_format(meta)
+        if not is_valid:
+            raise ValueError(error)
+        
+        # Validate size
+        is_valid, error = validate_file_size(meta)
+        if not is_valid:
+            raise ValueError(error)
+        
+        # Callers keep the result around, so they get a copy of the bytes rather
+        # than a live mapping of the user's file
+        image_bytes = bytes(meta.data)
+    finally:
+        if isinstance(meta.data, mmap.mmap):
+            meta.data.close()
     
-    # Encode to base64
-    base64_image = encode_image_to_base64(file_path)
+    # Smart detail selection for auto mode
+    detail = smart_detail_selection(meta, detail)
     
     # Determine MIME type from extension
-    extension = file_path.suffix.lower()
-    mime_types = {
-        '.png': 'image/png',
-        '.jpg': 'image/jpeg',
-        '.jpeg': 'image/jpeg',
-        '.webp': 'image/webp',
-        '.gif': 'image/gif'
-    }
-    mime_type = mime_types.get(extension, 'image/jpeg')
-    
-    # Format as data URL
-    data_url = f"data:{mime_type};base64,{base64_image}"
+    mime_type = _MIME_TYPES.get(meta.ext, 'image/jpeg')
     
     # Calculate token cost
-    token_cost = calculate_image_tokens(file_path, detail)
+    token_cost = calculate_image_tokens(meta, detail)
     
     return {
         "type": "input_image",
-        "image_url": data_url,
-        "detail": detail if detail != "auto" else None,
+        "image_bytes": image_bytes,
+        "mime_type": mime_type,
+        "detail": detail,
         "token_cost": token_cost,
         "file_path": str(file_path)
     }
 
 
-def smart_detail_selection(file_path: Path, detail: str = "auto") -> str:
+def smart_detail_selection(meta: ImageMeta, detail: str = "auto") -> str:
     """
     Intelligently select detail level based on image characteristics.
     Optimizes token usage while maintaining quality.
     
     Args:
-        file_path: Path to the image file
+        meta: Probed image metadata
         detail: Requested detail level
     
     Returns:
@@ -258,32 +396,30 @@ def smart_detail_selection(file_path: Path, detail: str = "auto") -> str:
     if detail != "auto":
         return detail
     
-    try:
-        with Image.open(file_path) as img:
-            width, height = img.size
-            
-            # Use low detail for small images (< 512x512)
-            if width < 512 and height < 512:
-                return "low"
-            
-            # Use low detail for very large images to save tokens
-            # (they'll be downscaled anyway)
-            if width > 2048 or height > 2048:
-                return "low"
-            
-            # Use high detail for medium-sized images where detail matters
-            return "high"
-    except:
-        # Default to low if we can't determine
+    # Default to low if we couldn't determine the dimensions
+    if meta.error is not None:
         return "low"
+    
+    # Use low detail for small images (< 512x512)
+    if meta.width < 512 and meta.height < 512:
+        return "low"
+    
+    # Use low detail for very large images to save tokens
+    # (they'll be downscaled anyway)
+    if meta.width > 2048 or meta.height > 2048:
+        return "low"
+    
+    # Use high detail for medium-sized images where detail matters
+    return "high"
 
 
-def analyze_image(image_source: str, detail: str = "auto", question: Optional[str] = None) -> str:
+def analyze_image(image_source: str, detail: str = "auto", question: Optional[str] = None) -> Dict[str, Any]:
     """
     Analyze an image from a file path or URL.
     
     This function prepares the image for analysis by the OpenAI API.
-    Returns a JSON string that will be parsed by the service layer.
+    Returns a dict that the service layer reads directly (no JSON round trip
+    for the base64 image data).
     
     Args:
         image_source: File path or URL to the image
@@ -291,23 +427,12 @@ def analyze_image(image_source: str, detail: str = "auto", question: Optional[st
         question: Optional specific question about the image
     
     Returns:
-        JSON string with image data formatted for API and metadata
+        Dict with image data formatted for API and metadata
     """
     try:
-        # For file paths, apply smart detail selection
-        if not image_source.startswith(("http://", "https://")):
-            file_path = Path(image_source).expanduser()
-            if not file_path.is_absolute():
-                # Use ORIGINAL_CWD if set by alias, otherwise use current directory
-                cwd = Path(os.environ.get('ORIGINAL_CWD', os.getcwd()))
-                file_path = cwd / file_path
-            
-            # Smart detail selection for auto mode
-            if detail == "auto" and file_path.exists():
-                detail = smart_detail_selection(file_path, detail)
-        
-        # Format image for API
+        # Format image for API (local files get smart detail selection here)
         image_data = format_image_for_api(image_source, detail)
+        detail = image_data["detail"] or detail
         
         # Build response
         result = {
@@ -327,30 +452,25 @@ def analyze_image(image_source: str, detail: str = "auto", question: Optional[st
             result["source"] = image_source
             result["token_cost"] = 85 if detail == "low" else 1000  # Estimate for URLs
         
-        # Return as JSON string for the service layer
-        import json
-        return json.dumps(result)
+        return result
         
     except FileNotFoundError as e:
-        import json
-        return json.dumps({
+        return {
             "status": "error",
             "error": str(e),
             "suggestion": "Check that the file path is correct and the file exists."
-        })
+        }
     
     except ValueError as e:
-        import json
-        return json.dumps({
+        return {
             "status": "error",
             "error": str(e),
             "suggestion": "Ensure the image is in a supported format (PNG, JPEG, WEBP, non-animated GIF) and under 50MB."
-        })
+        }
     
     except Exception as e:
-        import json
-        return json.dumps({
+        return {
             "status": "error",
             "error": f"Failed to process image: {str(e)}",
             "suggestion": "Verify the image file is valid and accessible."
-        })
+        }
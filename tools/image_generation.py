@@ -1,12 +1,411 @@
 """Image generation and editing tools using FLUX.2 API."""
+import functools
+import hashlib
 import os
+import random
+import re
+import shutil
+import threading
 import time
-import base64
 import requests
-from typing import Optional, Dict, Any, List
+from collections import OrderedDict
+from datetime import datetime
+from requests.adapters import HTTPAdapter
+from typing import Optional, Dict, Any, List, Tuple
+from urllib3.util.retry import Retry
 from PIL import Image
 from io import BytesIO
 
+from config.settings import FLUX_MAX_EDGE
+from utils import background_executor, fast_json
+from .image_analysis import _base_cwd, b64encode_string
+
+try:
+    import h2  # noqa: F401 - only needed so httpx can negotiate HTTP/2
+    import httpx
+except ImportError:  # httpx[http2] is optional, polls then go over the requests session
+    httpx = None
+
+# Shared HTTP session: submit, polls and download reuse pooled keep-alive connections
+# instead of a new TCP+TLS handshake per request. Only idempotent requests (polls,
+# downloads) are retried on gateway errors, never the billed POST.
+API_RETRIES = 3
+API_RETRY_BACKOFF = 0.3  # Seconds, doubled after each retry
+API_RETRY_STATUSES = (502, 503, 504)
+API_MAX_CONNECTIONS = 16
+
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=API_MAX_CONNECTIONS,
+    max_retries=Retry(
+        total=API_RETRIES,
+        backoff_factor=API_RETRY_BACKOFF,
+        status_forcelist=list(API_RETRY_STATUSES),
+        raise_on_status=False  # Hand the last response back so the status check reports it
+    )
+)
+_SESSION.mount('https://', _ADAPTER)
+_SESSION.mount('http://', _ADAPTER)
+
+# Submits and polls from concurrent generate/edit calls all hit the API host; over HTTP/2
+# they share one multiplexed TLS connection instead of one pooled HTTP/1.1 connection each.
+# Result downloads (CDN host, streamed to disk) stay on the requests session.
+if httpx:
+    class _RetryingTransport(httpx.HTTPTransport):
+        """HTTP/2 transport with the retry policy of _ADAPTER."""
+        
+        def handle_request(self, request: "httpx.Request") -> "httpx.Response":
+            """Send a request, retrying idempotent ones on gateway errors (never the POST)."""
+            response = super().handle_request(request)
+            if request.method not in ("GET", "HEAD"):
+                return response
+            for attempt in range(API_RETRIES):
+                if response.status_code not in API_RETRY_STATUSES:
+                    break
+                response.close()
+                time.sleep(API_RETRY_BACKOFF * 2 ** attempt)
+                response = super().handle_request(request)
+            return response
+    
+    # Connection failures are retried for every method (the request was never sent),
+    # gateway errors only for polls. Callers pass their timeouts per request.
+    _API_CLIENT = httpx.Client(
+        transport=_RetryingTransport(
+            http2=True,
+            retries=API_RETRIES,
+            limits=httpx.Limits(max_connections=API_MAX_CONNECTIONS)
+        ),
+        timeout=10.0
+    )
+else:
+    _API_CLIENT = _SESSION
+
+# Failures reported to the model as an error message: network and HTTP errors, file
+# and image decoding errors (OSError, oversized images) and malformed responses
+# (ValueError). Anything else is a bug and propagates.
+_TOOL_ERRORS = (
+    requests.RequestException, OSError, ValueError, Image.DecompressionBombError,
+) + ((httpx.HTTPError,) if httpx else ())
+_TIMEOUT_ERRORS = (requests.exceptions.Timeout,) + ((httpx.TimeoutException,) if httpx else ())
+
+# Read once at import; the functions fall back to the environment if it is set later
+_BFL_API_KEY = os.environ.get("BFL_API_KEY")
+
+# FLUX.2 submit endpoint per model
+_ENDPOINTS = {
+    "pro": "https://api.bfl.ai/v1/flux-2-pro",
+    "flex": "https://api.bfl.ai/v1/flux-2-flex",
+}
+
+
+@functools.lru_cache(maxsize=1)
+def _api_headers(api_key: str) -> Tuple[Dict[str, str], Dict[str, str]]:
+    """
+    Build the request headers once per API key.
+    
+    Args:
+        api_key: BFL API key
+    
+    Returns:
+        Tuple of (submit headers, poll headers). Shared, do not modify.
+    """
+    poll_headers = {'accept': 'application/json', 'x-key': api_key}
+    return {**poll_headers, 'Content-Type': 'application/json'}, poll_headers
+
+
+# Prompt sanitization for output filenames: drop punctuation, then join words with _
+_FILENAME_UNSAFE = re.compile(r'[^\w\s-]')
+_FILENAME_SEPARATORS = re.compile(r'[-\s]+')
+
+# Seeded generations saved this session: request hash -> (file path, result message).
+# Same seed and parameters give the same image, so a repeat reuses the saved file.
+_GENERATION_CACHE: "OrderedDict[str, Tuple[str, str]]" = OrderedDict()
+_GENERATION_CACHE_SIZE = 128
+
+# Encoded input images: (path, mtime_ns, size) -> base64 data, least recently used first.
+# A changed file gets a new key. Bounded by total size rather than count, so iterating on
+# an edit with the same inputs re-encodes nothing but a few large photos cannot pin tens
+# of MB; an image whose encoding alone exceeds a quarter of the budget is not cached.
+_ENCODED_IMAGES: "OrderedDict[Tuple[str, int, int], str]" = OrderedDict()
+_ENCODED_IMAGES_MAX_CHARS = 32 * 1024 * 1024
+_ENCODED_IMAGES_MAX_ENTRY_CHARS = _ENCODED_IMAGES_MAX_CHARS // 4
+_encoded_images_chars = 0
+_encoded_images_lock = threading.Lock()
+
+# Leading bytes of formats the API accepts as-is (JPEG, PNG): these skip the PIL re-encode.
+# output_format only selects the format of the returned image; the API decodes either input
+# format itself, so inputs are never transcoded to match it.
+_PASSTHROUGH_SIGNATURES = (b'\xff\xd8\xff', b'\x89PNG\r\n\x1a\n')
+
+# Result polling: first wait, growth factor and ceiling of the delay between polls
+POLL_INITIAL_DELAY = 0.2
+POLL_BACKOFF_FACTOR = 1.6
+POLL_MAX_DELAY = 2.0
+POLL_TIMEOUT = 60.0  # Seconds before giving up on a request
+
+# Statuses after which a request will not become Ready
+POLL_FAILED_STATUSES = ('Error', 'Failed')
+
+# Gateway errors on a poll are transient, polling continues until the deadline
+POLL_RETRY_HTTP_STATUSES = (502, 503, 504)
+
+# Whether polling_url streams status updates as Server-Sent Events. None until the
+# first request probes it; once False the probe is skipped for the rest of the process.
+_SSE_SUPPORTED: Optional[bool] = None
+
+
+def _subscribe_until_ready(
+    polling_url: str,
+    headers: Dict[str, str],
+    deadline: float
+) -> Optional[Dict[str, Any]]:
+    """
+    Wait for a FLUX.2 request on a single streamed Server-Sent Events connection.
+    
+    Args:
+        polling_url: URL returned by the submit request
+        headers: Request headers (API key)
+        deadline: time.monotonic() value after which to give up
+    
+    Returns:
+        Final result (status 'Ready' or one of POLL_FAILED_STATUSES), or None when
+        the endpoint does not stream events and the caller should short-poll instead
+    """
+    global _SSE_SUPPORTED
+    
+    try:
+        response = _SESSION.get(
+            polling_url,
+            headers={**headers, 'Accept': 'text/event-stream'},
+            stream=True,
+            timeout=(10, max(deadline - time.monotonic(), 1))
+        )
+    except requests.RequestException:
+        return None
+    
+    with response:
+        if response.status_code in POLL_RETRY_HTTP_STATUSES:
+            return None
+        if not response.headers.get('Content-Type', '').startswith('text/event-stream'):
+            # 406 or a plain JSON snapshot: only short polling is supported
+            _SSE_SUPPORTED = False
+            return None
+        _SSE_SUPPORTED = True
+        
+        try:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data:'):
+                    continue
+                try:
+                    event = fast_json.loads(line[5:].strip())
+                except fast_json.JSONDecodeError:
+                    continue
+                if event.get('status') == 'Ready' or event.get('status') in POLL_FAILED_STATUSES:
+                    return event
+                if time.monotonic() >= deadline:
+                    break
+        except requests.RequestException:
+            pass
+    return None
+
+
+def _poll_until_ready(
+    polling_url: str,
+    headers: Dict[str, str],
+    deadline_s: float = POLL_TIMEOUT
+) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Poll a FLUX.2 request until it is ready, failed, or the deadline passes.
+    
+    If the endpoint streams Server-Sent Events, the result is read from a single
+    connection as soon as it is ready. Otherwise the delay between polls starts
+    short and grows geometrically (with a little jitter), so fast jobs are picked
+    up quickly and slow ones are polled rarely.
+    
+    Args:
+        polling_url: URL returned by the submit request
+        headers: Request headers (API key)
+        deadline_s: Seconds to wait in total
+    
+    Returns:
+        Tuple of (final result, error_message). The result has status 'Ready' or
+        one of POLL_FAILED_STATUSES; both are None on timeout.
+    """
+    deadline = time.monotonic() + deadline_s
+    
+    if _SSE_SUPPORTED is not False:
+        result = _subscribe_until_ready(polling_url, headers, deadline)
+        if result is not None:
+            return result, None
+    
+    delay = POLL_INITIAL_DELAY
+    # Conditional polls: an unchanged status is answered with a bodiless 304 if the API sends ETags
+    request_headers = headers
+    
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None, None
+        time.sleep(min(delay + random.uniform(0, delay * 0.1), remaining))
+        delay = min(delay * POLL_BACKOFF_FACTOR, POLL_MAX_DELAY)
+        
+        poll_response = _API_CLIENT.get(polling_url, headers=request_headers, timeout=10)
+        
+        if poll_response.status_code == 304 or poll_response.status_code in POLL_RETRY_HTTP_STATUSES:
+            continue
+        if poll_response.status_code != 200:
+            return None, f"❌ Error: Polling failed with status {poll_response.status_code}"
+        
+        result = fast_json.loads(poll_response.content)
+        status = result.get('status')
+        if status == 'Ready' or status in POLL_FAILED_STATUSES:
+            return result, None
+        
+        etag = poll_response.headers.get('ETag')
+        if etag:
+            request_headers = {**headers, 'If-None-Match': etag}
+
+
+def _submit(endpoint: str, headers: Dict[str, str], request_data: Dict[str, Any]):
+    """
+    POST a FLUX.2 request. Submits are billed, so they are never retried.
+    
+    Args:
+        endpoint: Model endpoint URL
+        headers: Submit headers (API key, JSON content type)
+        request_data: Request body
+    
+    Returns:
+        The HTTP response
+    """
+    body = fast_json.dumpb(request_data)
+    if httpx:
+        return _API_CLIENT.post(endpoint, headers=headers, content=body, timeout=30)
+    return _SESSION.post(endpoint, headers=headers, data=body, timeout=30)
+
+
+def _sanitize_prompt(prompt: str, max_length: int) -> str:
+    """
+    Turn a prompt into a filename fragment.
+    
+    Args:
+        prompt: Image prompt
+        max_length: Maximum length of the fragment
+    
+    Returns:
+        Lowercase words joined by underscores, without punctuation
+    """
+    safe_prompt = _FILENAME_SEPARATORS.sub('_', _FILENAME_UNSAFE.sub('', prompt.lower()))
+    return safe_prompt[:max_length].strip('_')
+
+
+def _prepare_input_image(image_path_or_url: str) -> str:
+    """
+    Load an input image from a path or URL and encode it for the API.
+    
+    Images whose longest edge exceeds FLUX_MAX_EDGE are downscaled first: the
+    model works at around 1-2 MP anyway, and the base64 payload of a large photo
+    would dominate the upload time. The trade-off is that very fine detail of a
+    huge source is lost; set FLUX_MAX_EDGE=0 to always send the original.
+    
+    Args:
+        image_path_or_url: File path or URL of the image
+    
+    Returns:
+        The URL unchanged (the API fetches URLs itself) or base64 image data
+    """
+    if image_path_or_url.startswith(('http://', 'https://')):
+        # Use URL directly (API supports URLs)
+        return image_path_or_url
+    
+    # Load from file path and encode (cached until the file changes)
+    try:
+        stat = os.stat(image_path_or_url)
+    except FileNotFoundError:
+        raise FileNotFoundError(f"Image file not found: {image_path_or_url}") from None
+    return _encode_local_image(image_path_or_url, stat.st_mtime_ns, stat.st_size)
+
+
+def _encode_local_image(file_path: str, mtime_ns: int, size: int) -> str:
+    """
+    Base64-encode a local input image, reusing the encoding of an unchanged file.
+    
+    Args:
+        file_path: Path of the image file
+        mtime_ns: Modification time of the file (part of the cache key)
+        size: Size of the file in bytes (part of the cache key)
+    
+    Returns:
+        Base64 image data
+    """
+    global _encoded_images_chars
+    key = (file_path, mtime_ns, size)
+    with _encoded_images_lock:
+        encoded = _ENCODED_IMAGES.get(key)
+        if encoded is not None:
+            _ENCODED_IMAGES.move_to_end(key)
+            return encoded
+    
+    encoded = _encode_image_file(file_path)
+    if len(encoded) > _ENCODED_IMAGES_MAX_ENTRY_CHARS:
+        return encoded
+    
+    with _encoded_images_lock:
+        if key not in _ENCODED_IMAGES:
+            _ENCODED_IMAGES[key] = encoded
+            _encoded_images_chars += len(encoded)
+            while _encoded_images_chars > _ENCODED_IMAGES_MAX_CHARS:
+                _, evicted = _ENCODED_IMAGES.popitem(last=False)
+                _encoded_images_chars -= len(evicted)
+    return encoded
+
+
+def _encode_image_file(file_path: str) -> str:
+    """
+    Read, downscale if needed, and base64-encode a local input image.
+    
+    Args:
+        file_path: Path of the image file
+    
+    Returns:
+        Base64 image data
+    """
+    with open(file_path, 'rb') as image_file:
+        data = image_file.read()
+    
+    with Image.open(BytesIO(data)) as img:
+        # Opening only parses the header, pixels are decoded if the image is re-encoded
+        scale = FLUX_MAX_EDGE / max(img.size) if FLUX_MAX_EDGE else 1.0
+        
+        # JPEG and PNG files within the size limit are sent as they are, no decode/encode round trip
+        if scale >= 1.0 and data.startswith(_PASSTHROUGH_SIGNATURES):
+            return b64encode_string(data)
+        
+        # Other formats (GIF, WEBP, BMP, ...) are converted to JPEG
+        img_format = img.format if img.format else 'JPEG'
+        if img_format not in ['JPEG', 'PNG']:
+            img_format = 'JPEG'
+        
+        # JPEG has no palette or alpha channel (GIF, WEBP sources)
+        if img_format == 'JPEG' and img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        
+        if scale < 1.0:
+            img = img.resize(
+                (max(1, int(img.width * scale)), max(1, int(img.height * scale))),
+                Image.LANCZOS
+            )
+        
+        # Closing the image frees its decoded pixels before encoding
+        with BytesIO() as buffered:
+            with img:
+                img.save(buffered, format=img_format)
+            
+            # Encode straight from the buffer instead of a getvalue() copy
+            with buffered.getbuffer() as view:
+                return b64encode_string(view)
+
 
 def generate_image(
     prompt: str,
@@ -37,7 +436,7 @@ def generate_image(
     Returns:
         str: Result message with saved filename or error
     """
-    api_key = os.environ.get("BFL_API_KEY")
+    api_key = _BFL_API_KEY or os.environ.get("BFL_API_KEY")
     if not api_key:
         return "❌ Error: BFL_API_KEY not found in environment variables"
     
@@ -50,9 +449,39 @@ def generate_image(
     if megapixels > 4:
         return f"❌ Error: Maximum resolution is 4MP. Got {megapixels:.2f}MP ({width}x{height})"
     
+    # Reuse an identical seeded generation from this session (unseeded ones are random)
+    cache_key = None
+    if seed is not None:
+        request_key = (prompt, width, height, seed, output_format, model, safety_tolerance, steps, guidance)
+        cache_key = hashlib.sha1(repr(request_key).encode()).hexdigest()
+        cached = _GENERATION_CACHE.get(cache_key)
+        if cached and os.path.exists(cached[0]):
+            _GENERATION_CACHE.move_to_end(cache_key)
+            return f"{cached[1]}\n\n(Reused the identical image generated earlier this session, no new request)"
+    
     try:
+        # Build the output path up front, so the completion path only writes the file.
+        # The timestamp is the submission time, the moment the user asked for the image.
+        
+        # Generate filename from prompt (first 50 chars, sanitized)
+        safe_prompt = _sanitize_prompt(prompt, 50)
+        
+        # Add timestamp to ensure uniqueness
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        
+        # Current working directory (ORIGINAL_CWD if set by alias), looked up once per process
+        cwd = str(_base_cwd())
+        
+        # Create filename
+        extension = output_format if output_format in ['jpeg', 'png'] else 'jpeg'
+        if extension == 'jpeg':
+            extension = 'jpg'
+        filename = f"generated_{safe_prompt}_{timestamp}.{extension}"
+        filepath = os.path.join(cwd, filename)
+        
         # Select endpoint based on model
-        endpoint = f'https://api.bfl.ai/v1/flux-2-{model}'
+        endpoint = _ENDPOINTS.get(model) or f'https://api.bfl.ai/v1/flux-2-{model}'
+        post_headers, poll_headers = _api_headers(api_key)
         
         # Create request
         request_data = {
@@ -73,21 +502,12 @@ def generate_image(
             if guidance is not None:
                 request_data["guidance"] = max(1.5, min(guidance, 10.0))
         
-        response = requests.post(
-            endpoint,
-            headers={
-                'accept': 'application/json',
-                'x-key': api_key,
-                'Content-Type': 'application/json',
-            },
-            json=request_data,
-            timeout=30
-        )
+        response = _submit(endpoint, post_headers, request_data)
         
         if response.status_code != 200:
             return f"❌ Error: API request failed with status {response.status_code}: {response.text}"
         
-        request_result = response.json()
+        request_result = fast_json.loads(response.content)
         request_id = request_result.get("id")
         polling_url = request_result.get("polling_url")
         
@@ -95,78 +515,45 @@ def generate_image(
             return f"❌ Error: No polling URL returned: {request_result}"
         
         # Poll for result (max 60 seconds)
-        max_attempts = 120
-        attempt = 0
+        result, error = _poll_until_ready(polling_url, poll_headers)
+        if error:
+            return error
+        if result is None:
+            return "❌ Error: Timeout waiting for image generation (60 seconds)"
+        if result.get('status') in POLL_FAILED_STATUSES:
+            error_msg = result.get('error', 'Unknown error')
+            return f"❌ Generation failed: {error_msg}"
         
-        while attempt < max_attempts:
-            time.sleep(0.5)
-            attempt += 1
-            
-            poll_response = requests.get(
-                polling_url,
-                headers={
-                    'accept': 'application/json',
-                    'x-key': api_key,
-                },
-                timeout=10
-            )
-            
-            if poll_response.status_code != 200:
-                return f"❌ Error: Polling failed with status {poll_response.status_code}"
-            
-            result = poll_response.json()
-            status = result.get('status')
-            
-            if status == 'Ready':
-                image_url = result.get('result', {}).get('sample')
-                if not image_url:
-                    return f"❌ Error: No image URL in result: {result}"
-                
-                # Download the image
-                img_response = requests.get(image_url, timeout=30)
-                if img_response.status_code != 200:
-                    return f"❌ Error: Failed to download image from URL"
-                
-                # Generate filename from prompt (first 50 chars, sanitized)
-                import re
-                from datetime import datetime
-                
-                # Sanitize prompt for filename
-                safe_prompt = re.sub(r'[^\w\s-]', '', prompt.lower())
-                safe_prompt = re.sub(r'[-\s]+', '_', safe_prompt)
-                safe_prompt = safe_prompt[:50].strip('_')
-                
-                # Add timestamp to ensure uniqueness
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                
-                # Get current working directory (use ORIGINAL_CWD if set by alias)
-                cwd = os.environ.get('ORIGINAL_CWD', os.getcwd())
-                
-                # Create filename
-                extension = output_format if output_format in ['jpeg', 'png'] else 'jpeg'
-                if extension == 'jpeg':
-                    extension = 'jpg'
-                filename = f"generated_{safe_prompt}_{timestamp}.{extension}"
-                filepath = os.path.join(cwd, filename)
-                
-                # Save the image
-                with open(filepath, 'wb') as f:
-                    f.write(img_response.content)
-                
-                file_size = len(img_response.content) / 1024  # KB
-                cost = request_result.get("cost", "N/A")
-                
-                return f"✓ Image generated and saved!\n\nFile: {filename}\nLocation: {cwd}\nSize: {file_size:.1f} KB\nCost: {cost} credits\nModel: FLUX.2 [{model}]\n\nPrompt: {prompt[:100]}{'...' if len(prompt) > 100 else ''}"
-            
-            elif status in ['Error', 'Failed']:
-                error_msg = result.get('error', 'Unknown error')
-                return f"❌ Generation failed: {error_msg}"
+        image_url = result.get('result', {}).get('sample')
+        if not image_url:
+            return f"❌ Error: No image URL in result: {result}"
+        
+        # Download the image (streamed: the body is copied to disk below, not buffered in memory)
+        img_response = _SESSION.get(image_url, timeout=30, stream=True)
+        if img_response.status_code != 200:
+            img_response.close()
+            return f"❌ Error: Failed to download image from URL"
+        
+        # Save the image, undoing any transfer encoding (gzip) while copying
+        img_response.raw.decode_content = True
+        with img_response, open(filepath, 'wb') as f:
+            shutil.copyfileobj(img_response.raw, f, length=1 << 16)
+        
+        file_size = os.path.getsize(filepath) / 1024  # KB
+        cost = request_result.get("cost", "N/A")
         
-        return "❌ Error: Timeout waiting for image generation (60 seconds)"
+        message = f"✓ Image generated and saved!\n\nFile: {filename}\nLocation: {cwd}\nSize: {file_size:.1f} KB\nCost: {cost} credits\nModel: FLUX.2 [{model}]\n\nPrompt: {prompt[:100]}{'...' if len(prompt) > 100 else ''}"
         
-    except requests.exceptions.Timeout:
+        if cache_key:
+            _GENERATION_CACHE[cache_key] = (filepath, message)
+            if len(_GENERATION_CACHE) > _GENERATION_CACHE_SIZE:
+                _GENERATION_CACHE.popitem(last=False)
+        
+        return message
+        
+    except _TIMEOUT_ERRORS:
         return "❌ Error: Request timeout. Please try again."
-    except Exception as e:
+    except _TOOL_ERRORS as e:
         return f"❌ Error generating image: {str(e)}"
 
 
@@ -203,7 +590,7 @@ def edit_image(
     Returns:
         str: Result message with edited image filename or error
     """
-    api_key = os.environ.get("BFL_API_KEY")
+    api_key = _BFL_API_KEY or os.environ.get("BFL_API_KEY")
     if not api_key:
         return "❌ Error: BFL_API_KEY not found in environment variables"
     
@@ -219,35 +606,49 @@ def edit_image(
         return f"❌ Error: Height must be a multiple of 16. Got {height}"
     
     try:
-        def load_and_encode_image(image_path_or_url: str) -> str:
-            """Load image from path or URL and encode to base64."""
-            if image_path_or_url.startswith(('http://', 'https://')):
-                # Use URL directly (API supports URLs)
-                return image_path_or_url
-            else:
-                # Load from file path and encode
-                if not os.path.exists(image_path_or_url):
-                    raise FileNotFoundError(f"Image file not found: {image_path_or_url}")
-                
-                img = Image.open(image_path_or_url)
-                buffered = BytesIO()
-                img_format = img.format if img.format else 'JPEG'
-                if img_format not in ['JPEG', 'PNG']:
-                    img_format = 'JPEG'
-                
-                img.save(buffered, format=img_format)
-                return base64.b64encode(buffered.getvalue()).decode()
+        # Load and encode the main and reference images in the background
+        input_img_future = background_executor.submit(_prepare_input_image, input_image)
+        ref_futures = [background_executor.submit(_prepare_input_image, ref_img) for ref_img in reference_images or []]
+        
+        # Meanwhile open the API connection so the POST skips the TCP+TLS handshake
+        try:
+            _API_CLIENT.head('https://api.bfl.ai/', timeout=5)
+        except _TOOL_ERRORS:
+            pass
         
-        # Load and encode main input image
-        input_img_data = load_and_encode_image(input_image)
+        # Build the output path up front, so the completion path only writes the file.
+        # The timestamp is the submission time, the moment the user asked for the edit.
+        
+        # Get base name from input image
+        if input_image.startswith(('http://', 'https://')):
+            base_name = "edited_image"
+        else:
+            base_name = os.path.splitext(os.path.basename(input_image))[0]
+        
+        # Sanitize prompt for filename (first 30 chars)
+        safe_prompt = _sanitize_prompt(prompt, 30)
+        
+        # Add timestamp
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        
+        # Current working directory (ORIGINAL_CWD if set by alias), looked up once per process
+        cwd = str(_base_cwd())
+        
+        # Create filename
+        extension = output_format if output_format in ['jpeg', 'png'] else 'jpeg'
+        if extension == 'jpeg':
+            extension = 'jpg'
+        filename = f"{base_name}_edited_{safe_prompt}_{timestamp}.{extension}"
+        filepath = os.path.join(cwd, filename)
         
         # Select endpoint based on model
-        endpoint = f'https://api.bfl.ai/v1/flux-2-{model}'
+        endpoint = _ENDPOINTS.get(model) or f'https://api.bfl.ai/v1/flux-2-{model}'
+        post_headers, poll_headers = _api_headers(api_key)
         
         # Create request
         request_data = {
             "prompt": prompt,
-            "input_image": input_img_data,
+            "input_image": input_img_future.result(),
             "output_format": output_format,
             "safety_tolerance": safety_tolerance
         }
@@ -268,111 +669,54 @@ def edit_image(
                 request_data["guidance"] = max(1.5, min(guidance, 10.0))
         
         # Add reference images
-        if reference_images:
-            for idx, ref_img in enumerate(reference_images, start=2):
-                ref_data = load_and_encode_image(ref_img)
-                request_data[f"input_image_{idx}"] = ref_data
-        
-        response = requests.post(
-            endpoint,
-            headers={
-                'accept': 'application/json',
-                'x-key': api_key,
-                'Content-Type': 'application/json',
-            },
-            json=request_data,
-            timeout=30
-        )
+        for idx, ref_future in enumerate(ref_futures, start=2):
+            request_data[f"input_image_{idx}"] = ref_future.result()
+        
+        response = _submit(endpoint, post_headers, request_data)
         
         if response.status_code != 200:
             return f"❌ Error: API request failed with status {response.status_code}: {response.text}"
         
-        request_result = response.json()
+        request_result = fast_json.loads(response.content)
         polling_url = request_result.get("polling_url")
         
         if not polling_url:
             return f"❌ Error: No polling URL returned: {request_result}"
         
         # Poll for result (max 60 seconds)
-        max_attempts = 120
-        attempt = 0
+        result, error = _poll_until_ready(polling_url, poll_headers)
+        if error:
+            return error
+        if result is None:
+            return "❌ Error: Timeout waiting for image editing (60 seconds)"
+        if result.get('status') in POLL_FAILED_STATUSES:
+            error_msg = result.get('error', 'Unknown error')
+            return f"❌ Edit failed: {error_msg}"
         
-        while attempt < max_attempts:
-            time.sleep(0.5)
-            attempt += 1
-            
-            poll_response = requests.get(
-                polling_url,
-                headers={
-                    'accept': 'application/json',
-                    'x-key': api_key,
-                },
-                timeout=10
-            )
-            
-            if poll_response.status_code != 200:
-                return f"❌ Error: Polling failed with status {poll_response.status_code}"
-            
-            result = poll_response.json()
-            status = result.get('status')
-            
-            if status == 'Ready':
-                image_url = result.get('result', {}).get('sample')
-                if not image_url:
-                    return f"❌ Error: No image URL in result: {result}"
-                
-                # Download the edited image
-                img_response = requests.get(image_url, timeout=30)
-                if img_response.status_code != 200:
-                    return f"❌ Error: Failed to download edited image from URL"
-                
-                # Generate filename from original image and prompt
-                import re
-                from datetime import datetime
-                
-                # Get base name from input image
-                if input_image.startswith(('http://', 'https://')):
-                    base_name = "edited_image"
-                else:
-                    base_name = os.path.splitext(os.path.basename(input_image))[0]
-                
-                # Sanitize prompt for filename (first 30 chars)
-                safe_prompt = re.sub(r'[^\w\s-]', '', prompt.lower())
-                safe_prompt = re.sub(r'[-\s]+', '_', safe_prompt)
-                safe_prompt = safe_prompt[:30].strip('_')
-                
-                # Add timestamp
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                
-                # Get current working directory (use ORIGINAL_CWD if set by alias)
-                cwd = os.environ.get('ORIGINAL_CWD', os.getcwd())
-                
-                # Create filename
-                extension = output_format if output_format in ['jpeg', 'png'] else 'jpeg'
-                if extension == 'jpeg':
-                    extension = 'jpg'
-                filename = f"{base_name}_edited_{safe_prompt}_{timestamp}.{extension}"
-                filepath = os.path.join(cwd, filename)
-                
-                # Save the image
-                with open(filepath, 'wb') as f:
-                    f.write(img_response.content)
-                
-                file_size = len(img_response.content) / 1024  # KB
-                cost = request_result.get("cost", "N/A")
-                ref_count = len(reference_images) if reference_images else 0
-                
-                return f"✓ Image edited and saved!\n\nFile: {filename}\nLocation: {cwd}\nSize: {file_size:.1f} KB\nCost: {cost} credits\nModel: FLUX.2 [{model}]\nReferences: {ref_count + 1} image(s)\n\nEdit: {prompt[:100]}{'...' if len(prompt) > 100 else ''}"
-            
-            elif status in ['Error', 'Failed']:
-                error_msg = result.get('error', 'Unknown error')
-                return f"❌ Edit failed: {error_msg}"
+        image_url = result.get('result', {}).get('sample')
+        if not image_url:
+            return f"❌ Error: No image URL in result: {result}"
+        
+        # Download the edited image (streamed: the body is copied to disk below, not buffered in memory)
+        img_response = _SESSION.get(image_url, timeout=30, stream=True)
+        if img_response.status_code != 200:
+            img_response.close()
+            return f"❌ Error: Failed to download edited image from URL"
+        
+        # Save the image, undoing any transfer encoding (gzip) while copying
+        img_response.raw.decode_content = True
+        with img_response, open(filepath, 'wb') as f:
+            shutil.copyfileobj(img_response.raw, f, length=1 << 16)
+        
+        file_size = os.path.getsize(filepath) / 1024  # KB
+        cost = request_result.get("cost", "N/A")
+        ref_count = len(reference_images) if reference_images else 0
         
-        return "❌ Error: Timeout waiting for image editing (60 seconds)"
+        return f"✓ Image edited and saved!\n\nFile: {filename}\nLocation: {cwd}\nSize: {file_size:.1f} KB\nCost: {cost} credits\nModel: FLUX.2 [{model}]\nReferences: {ref_count + 1} image(s)\n\nEdit: {prompt[:100]}{'...' if len(prompt) > 100 else ''}"
         
-    except requests.exceptions.Timeout:
+    except _TIMEOUT_ERRORS:
         return "❌ Error: Request timeout. Please try again."
-    except Exception as e:
+    except _TOOL_ERRORS as e:
         return f"❌ Error editing image: {str(e)}"
 
 
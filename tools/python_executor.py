@@ -1,11 +1,31 @@
 """Python code execution tool for calculations and data processing."""
-import subprocess
-import tempfile
+import ast
 import os
-from typing import Optional
+import signal
+import socket
+import subprocess
+import threading
+from pathlib import Path
+from typing import Optional, Tuple
 import sys
 import time
 
+from utils import background_executor, drain_pipe
+
+# Jobs run in children forked from a pre-warmed worker server (tools/python_worker.py)
+# instead of a freshly started interpreter. Platforms without fork or fd passing
+# (Windows) fall back to a subprocess per call.
+_WORKER_SCRIPT = Path(__file__).with_name("python_worker.py")
+_USE_WORKER_SERVER = hasattr(os, "fork") and hasattr(socket, "send_fds")
+
+_server: Optional[subprocess.Popen] = None
+_server_control: Optional[socket.socket] = None  # Jobs are sent here
+_server_lock = threading.Lock()
+
+# Characters of stdout/stderr returned to the model. Only one character more than this
+# is kept while the code runs (to detect truncation), whatever the code prints.
+MAX_OUTPUT_LENGTH = 10000
+
 # Tool definition for OpenAI function calling (with strict mode)
 python_executor_tool_definition = {
     "type": "function",
@@ -30,63 +50,343 @@ python_executor_tool_definition = {
 }
 
 
+# Modules that cannot be imported (a dotted name is blocked if any prefix is listed)
+_BLOCKED_MODULES = frozenset({
+    "subprocess", "importlib", "pkgutil", "inspect", "ctypes", "builtins",
+    "socket", "urllib", "requests", "http.client", "ftplib", "telnetlib", "ssl",
+    "pickle", "marshal", "shelve", "dbm", "sqlite3", "psycopg2", "pymongo", "redis",
+    # Run source code given as a string, which may be built at runtime
+    "code", "codeop", "runpy", "timeit", "doctest", "pdb", "profile", "cProfile", "trace",
+})
+
+# Builtins that give access to code execution, files, or arbitrary attributes
+_BLOCKED_NAMES = frozenset({
+    "exec", "eval", "compile", "__import__", "open", "globals", "locals", "vars",
+    "dir", "getattr", "setattr", "delattr", "type", "__builtins__", "breakpoint",
+})
+
+# Attributes that cannot be accessed on any object (or imported from any module):
+# climbing to arbitrary classes, frames and globals, the module table, lookups by a
+# name built at runtime, and shell/file access however the module was reached
+# (e.g. random._os.system, io.open)
+_BLOCKED_ATTRIBUTES = frozenset({
+    "__subclasses__", "__bases__", "__base__", "__mro__", "__globals__",
+    "__builtins__", "__code__", "__import__", "__dict__", "__getattribute__",
+    "__loader__", "__spec__",
+    "modules", "_getframe", "f_globals", "f_locals", "f_builtins", "gi_frame", "tb_frame",
+    "attrgetter", "methodcaller",
+    "system", "popen", "open", "fork", "forkpty",
+})
+
+# Attribute prefixes blocked the same way (os.execv, os.spawnl, os.posix_spawn, ...)
+_BLOCKED_ATTRIBUTE_PREFIXES = ("exec", "spawn", "posix_spawn")
+
+# (module, attribute) pairs exempt from the attribute checks
+_ALLOWED_MODULE_ATTRIBUTES = frozenset({("platform", "system")})
+
+# Calls that look a module or attribute up by a name given as a string; a string
+# argument naming a blocked module is rejected ("sub" + "process" is caught by the
+# calls themselves being blocked)
+_LOOKUP_CALLS = frozenset({
+    "__import__", "import_module", "find_spec", "getattr", "hasattr", "setattr", "delattr",
+    "attrgetter", "methodcaller",
+})
+
+# Modules that "from module import *" is allowed for: pure-compute modules whose
+# public names include no blocked attribute. A star import from any other module
+# could bind a name like system or popen without it appearing in the code.
+_STAR_IMPORT_MODULES = frozenset({
+    "math", "cmath", "statistics", "decimal", "fractions", "random", "itertools",
+    "functools", "collections", "datetime", "json", "re", "string",
+})
+
+# Dunder names that may not appear even inside strings ("{0.__class__.__base__}".format)
+_BLOCKED_DUNDERS = frozenset(name for name in _BLOCKED_ATTRIBUTES | _BLOCKED_NAMES if name.startswith("__"))
+
+
+def _blocked_module(name: str) -> Optional[str]:
+    """Return the blocked prefix of a dotted module name, or None if it may be imported."""
+    parts = name.split(".")
+    for end in range(1, len(parts) + 1):
+        prefix = ".".join(parts[:end])
+        if prefix in _BLOCKED_MODULES:
+            return prefix
+    return None
+
+
+def _blocked_attribute(owner: Optional[str], attribute: str) -> bool:
+    """Check whether an attribute may not be accessed (owner: module name if known)."""
+    if (owner, attribute) in _ALLOWED_MODULE_ATTRIBUTES:
+        return False
+    return attribute in _BLOCKED_ATTRIBUTES or attribute.startswith(_BLOCKED_ATTRIBUTE_PREFIXES)
+
+
+def _call_name(func: ast.expr) -> Optional[str]:
+    """Name of the function a call invokes (f(...) or obj.f(...)), or None."""
+    if isinstance(func, ast.Name):
+        return func.id
+    if isinstance(func, ast.Attribute):
+        return func.attr
+    return None
+
+
+def _blocked_string(value: str, depth: int) -> Optional[str]:
+    """
+    Return what is blocked in a string constant, or None.
+    
+    A string containing a blocked dunder is rejected, and a string that is itself
+    code (for an exec-like call) is validated as code. Other strings, such as
+    {"code": 200}, are data.
+    """
+    name = value.strip()
+    blocked = next((dunder for dunder in _BLOCKED_DUNDERS if dunder in name), None)
+    if blocked or depth >= 2 or not name:
+        return blocked
+    try:
+        tree = ast.parse(name)
+    except (SyntaxError, ValueError, RecursionError):
+        return None
+    # Plain words and literals parse too; only statements that do something count as code
+    if any(isinstance(node, (ast.Call, ast.Import, ast.ImportFrom, ast.Attribute)) for node in ast.walk(tree)):
+        return _find_blocked(tree, depth + 1)
+    return None
+
+
+def _find_blocked(tree: ast.AST, depth: int = 0) -> Optional[str]:
+    """
+    Find the first blocked import, builtin, attribute or string in a syntax tree.
+    
+    Args:
+        tree: Parsed code
+        depth: Nesting level of code found inside string constants
+    
+    Returns:
+        The blocked name, or None if the code is allowed
+    """
+    # Local name -> module it was imported as, so aliases are checked like the module
+    modules = {}
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if alias.asname:
+                    modules[alias.asname] = alias.name
+                else:
+                    top_level = alias.name.split(".")[0]
+                    modules[top_level] = top_level
+    
+    for node in ast.walk(tree):
+        blocked = None
+        if isinstance(node, ast.Import):
+            blocked = next(filter(None, (_blocked_module(alias.name) for alias in node.names)), None)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            star = any(alias.name == "*" for alias in node.names)
+            blocked = _blocked_module(node.module) or (
+                f"from {node.module} import *" if star and node.module not in _STAR_IMPORT_MODULES else None
+            ) or next(
+                filter(None, (_blocked_module(f"{node.module}.{alias.name}") for alias in node.names)), None
+            ) or next((
+                f"{node.module}.{alias.name}" for alias in node.names
+                if _blocked_attribute(node.module, alias.name)
+            ), None)
+        elif isinstance(node, ast.Name) and node.id in _BLOCKED_NAMES:
+            blocked = node.id
+        elif isinstance(node, ast.Attribute):
+            owner = modules.get(node.value.id) if isinstance(node.value, ast.Name) else None
+            if _blocked_attribute(owner, node.attr):
+                blocked = node.attr
+        elif isinstance(node, ast.Call) and _call_name(node.func) in _LOOKUP_CALLS:
+            blocked = next(filter(None, (
+                _blocked_module(arg.value.strip()) for arg in node.args
+                if isinstance(arg, ast.Constant) and isinstance(arg.value, str)
+            )), None)
+        elif isinstance(node, ast.Constant) and isinstance(node.value, str):
+            blocked = _blocked_string(node.value, depth)
+        
+        if blocked:
+            return blocked
+    return None
+
+
 def validate_code_safety(code: str) -> tuple[bool, Optional[str]]:
     """
     Validate that code doesn't contain dangerous operations.
     
+    The code is parsed and its syntax tree checked for blocked imports, builtins and
+    attributes. Strings are checked for blocked dunder names, as arguments of lookup
+    calls for blocked module names and, when they are code themselves, validated
+    like the code; prose or data that merely mentions a blocked name is not rejected.
+    
     Args:
         code: Python code to validate
     
     Returns:
         Tuple of (is_safe, error_message)
     """
-    # Dangerous patterns to block
-    dangerous_patterns = [
-        "os.system",
-        "subprocess",
-        "exec(",
-        "eval(",
-        "__import__",
-        "open(",
-        "compile(",
-        "globals()",
-        "locals()",
-        "vars(",
-        "dir(",
-        "__builtins__",
-        "getattr(",
-        "setattr(",
-        "delattr(",
-        "type(",
-        "object.__subclasses__",
-        "importlib",
-        "pkgutil",
-        "inspect",
-        "ctypes",
-        "socket",
-        "urllib",
-        "requests",
-        "http.client",
-        "ftplib",
-        "telnetlib",
-        "ssl",
-        "pickle",
-        "marshal",
-        "shelve",
-        "dbm",
-        "sqlite3",
-        "psycopg2",
-        "pymongo",
-        "redis",
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError, RecursionError):
+        # Code that cannot be parsed cannot run either; compiling it reports the error
+        return True, None
+    
+    blocked = _find_blocked(tree)
+    if blocked:
+        return False, f"Dangerous operation blocked: '{blocked}' is not allowed"
+    return True, None
+
+
+def _start_server() -> None:
+    """Start the worker server (called with _server_lock held)."""
+    global _server, _server_control
+    if _server_control:
+        _server_control.close()
+    control, server_end = socket.socketpair()
+    with server_end:
+        # -I isolates the interpreter (and so every job) from PYTHON* environment
+        # variables, user site-packages and the current and script directories
+        _server = subprocess.Popen(
+            [sys.executable, '-I', str(_WORKER_SCRIPT)],
+            stdin=server_end,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+        )
+    _server_control = control
+
+
+def _submit_job(fds: list) -> None:
+    """Hand a job's file descriptors to the worker server, starting it if needed."""
+    with _server_lock:
+        if _server is None or _server.poll() is not None:
+            _start_server()
+        try:
+            socket.send_fds(_server_control, [b"job"], fds)
+        except OSError:
+            # The server died since it was last used
+            _start_server()
+            socket.send_fds(_server_control, [b"job"], fds)
+
+
+def _drain_output(stdout, stderr) -> Tuple[list, list, list]:
+    """
+    Read a child's stdout and stderr pipes on the background pool.
+    
+    Both are drained concurrently into bounded buffers, so the code can print any
+    amount without the output being held in memory.
+    
+    Returns:
+        Tuple of (readers, stdout_parts, stderr_parts)
+    """
+    stdout_parts, stderr_parts = [], []
+    readers = [
+        background_executor.submit(drain_pipe, stdout, stdout_parts, MAX_OUTPUT_LENGTH + 1),
+        background_executor.submit(drain_pipe, stderr, stderr_parts, MAX_OUTPUT_LENGTH + 1),
     ]
+    return readers, stdout_parts, stderr_parts
+
+
+def _run_in_worker(code: str, timeout: int) -> Tuple[str, str, int]:
+    """
+    Execute code in a child of the worker server.
     
-    code_lower = code.lower()
+    Args:
+        code: Python code to execute
+        timeout: Timeout in seconds
     
-    for pattern in dangerous_patterns:
-        if pattern in code_lower:
-            return False, f"Dangerous operation blocked: '{pattern}' is not allowed"
+    Returns:
+        Tuple of (stdout, stderr, exit_code)
     
-    return True, None
+    Raises:
+        subprocess.TimeoutExpired: If the code (or a thread it started) runs longer than timeout
+    """
+    deadline = time.monotonic() + timeout
+    job, job_end = socket.socketpair()
+    stdout_r, stdout_w = os.pipe()
+    stderr_r, stderr_w = os.pipe()
+    try:
+        _submit_job([job_end.fileno(), stdout_w, stderr_w])
+    finally:
+        job_end.close()
+        os.close(stdout_w)
+        os.close(stderr_w)
+    readers, stdout_parts, stderr_parts = _drain_output(
+        open(stdout_r, encoding="utf-8", errors="replace"),
+        open(stderr_r, encoding="utf-8", errors="replace"),
+    )
+    
+    # Reply: the child's pid, then its exit code once the code and its threads are done
+    reply = b""
+    with job:
+        try:
+            job.sendall(code.encode("utf-8"))
+            job.shutdown(socket.SHUT_WR)
+            while reply.count(b"\n") < 2:
+                job.settimeout(max(deadline - time.monotonic(), 0.001))
+                chunk = job.recv(64)
+                if not chunk:
+                    break
+                reply += chunk
+        except socket.timeout:
+            pid = reply.split(b"\n")[0]
+            if pid.isdigit():
+                try:
+                    os.kill(int(pid), signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                # The pipes close when the child is gone
+                for reader in readers:
+                    reader.result()
+            raise subprocess.TimeoutExpired(code, timeout)
+    
+    for reader in readers:
+        reader.result()
+    lines = reply.split(b"\n")
+    # Without an exit code the child died before finishing (e.g. killed by a signal)
+    exit_code = int(lines[1]) if len(lines) > 2 else -1
+    return "".join(stdout_parts), "".join(stderr_parts), exit_code
+
+
+def _run_in_subprocess(code: str, timeout: int) -> Tuple[str, str, int]:
+    """
+    Execute code in a new interpreter process.
+    
+    Args:
+        code: Python code to execute
+        timeout: Timeout in seconds
+    
+    Returns:
+        Tuple of (stdout, stderr, exit_code)
+    
+    Raises:
+        subprocess.TimeoutExpired: If the code runs longer than timeout
+    """
+    # The code is piped to the interpreter's stdin ("python -"), so no temporary
+    # file is created, written, and deleted per call. -I isolates the interpreter,
+    # as it does the worker server.
+    process = subprocess.Popen(
+        [sys.executable, '-I', '-'],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True
+    )
+    
+    readers, stdout_parts, stderr_parts = _drain_output(process.stdout, process.stderr)
+    
+    try:
+        with process.stdin:
+            process.stdin.write(code)
+    except BrokenPipeError:
+        pass
+    
+    try:
+        process.wait(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+        raise
+    finally:
+        for reader in readers:
+            reader.result()
+    return "".join(stdout_parts), "".join(stderr_parts), process.returncode
 
 
 def execute_python(code: str, timeout: Optional[int] = None) -> str:
@@ -111,31 +411,17 @@ def execute_python(code: str, timeout: Optional[int] = None) -> str:
     if not is_safe:
         return f"❌ Error: Code validation failed\n\nReason: {error_msg}\n\n💡 For security reasons, certain operations are not allowed in the Python executor."
     
-    # Create temporary file for code
-    temp_file = None
     try:
-        with tempfile.NamedTemporaryFile(mode='w', suffix='.py', delete=False) as f:
-            f.write(code)
-            temp_file = f.name
-        
         # Execute code
         start_time = time.time()
         
         try:
-            process = subprocess.Popen(
-                [sys.executable, temp_file],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True
-            )
-            
-            stdout, stderr = process.communicate(timeout=timeout)
-            exit_code = process.returncode
+            if _USE_WORKER_SERVER:
+                stdout, stderr, exit_code = _run_in_worker(code, timeout)
+            else:
+                stdout, stderr, exit_code = _run_in_subprocess(code, timeout)
             
         except subprocess.TimeoutExpired:
-            process.kill()
-            stdout, stderr = process.communicate()
-            exit_code = -1
             duration = time.time() - start_time
             
             return f"❌ Error: Code execution timed out\n\nTimeout: {timeout}s\nDuration: {duration:.2f}s\n\n💡 Suggestion: Optimize your code or increase the timeout value."
@@ -143,16 +429,15 @@ def execute_python(code: str, timeout: Optional[int] = None) -> str:
         duration = time.time() - start_time
         
         # Truncate output if too long (10,000 chars max)
-        max_output_length = 10000
         stdout_truncated = False
         stderr_truncated = False
         
-        if len(stdout) > max_output_length:
-            stdout = stdout[:max_output_length]
+        if len(stdout) > MAX_OUTPUT_LENGTH:
+            stdout = stdout[:MAX_OUTPUT_LENGTH]
             stdout_truncated = True
         
-        if len(stderr) > max_output_length:
-            stderr = stderr[:max_output_length]
+        if len(stderr) > MAX_OUTPUT_LENGTH:
+            stderr = stderr[:MAX_OUTPUT_LENGTH]
             stderr_truncated = True
         
         # Format output
@@ -187,11 +472,3 @@ def execute_python(code: str, timeout: Optional[int] = None) -> str:
         
     except Exception as e:
         return f"❌ Error: Code execution failed\n\nError: {str(e)}\n\n💡 Suggestion: Check your code syntax and try again."
-    
-    finally:
-        # Clean up temporary file
-        if temp_file and os.path.exists(temp_file):
-            try:
-                os.unlink(temp_file)
-            except:
-                pass
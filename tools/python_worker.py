@@ -0,0 +1,118 @@
+"""
+Pre-warmed server that runs execute_python jobs, started by tools/python_executor.py.
+
+Run as a script with a Unix socket as stdin. Each job arrives on that socket as
+three file descriptors (a job socket and the write ends of the stdout and stderr
+pipes); the server forks a child that runs the job with those pipes as its fds 1
+and 2. Only the standard library is imported here, so a job never starts with the
+CLI's modules (OpenAI client, rich, services) loaded.
+
+Job protocol on the job socket: the child sends its pid and a newline, reads the
+code until EOF, and sends the exit code and a newline once the code and all its
+non-daemon threads have finished.
+"""
+import builtins
+import io
+import os
+import signal
+import socket
+import sys
+import threading
+import traceback
+
+# Modules imported once by the server, so jobs start with them already loaded
+PRELOAD = [
+    "math", "statistics", "random", "datetime", "json", "csv", "re",
+    "itertools", "functools", "collections", "decimal", "fractions",
+]
+
+
+def run_code(code: str) -> int:
+    """
+    Run code like "python -" would, with output going to fds 1 and 2.
+    
+    Args:
+        code: Python code to execute
+    
+    Returns:
+        Exit code
+    """
+    exit_code = 0
+    try:
+        exec(compile(code, "<stdin>", "exec"), {"__name__": "__main__", "__builtins__": builtins})
+    except SystemExit as e:
+        if e.code is None or isinstance(e.code, int):
+            exit_code = e.code or 0
+        else:
+            print(e.code, file=sys.stderr)
+            exit_code = 1
+    except BaseException as e:
+        # Drop this function's frame so the traceback starts in the user's code
+        traceback.print_exception(type(e), e, e.__traceback__.tb_next, file=sys.stderr)
+        exit_code = 1
+    
+    # The interpreter waits for non-daemon threads before exiting, and so does a job
+    current = threading.current_thread()
+    for thread in threading.enumerate():
+        if thread is not current and not thread.daemon:
+            thread.join()
+    return exit_code
+
+
+def run_job(job_fd: int, stdout_fd: int, stderr_fd: int) -> None:
+    """
+    Run one job in a forked child and exit.
+    
+    Args:
+        job_fd: Job socket (pid and exit code out, code in)
+        stdout_fd: Write end of the stdout pipe
+        stderr_fd: Write end of the stderr pipe
+    """
+    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+    # Everything written to fds 1 and 2, by print() or os.write(), ends up in the pipes
+    os.dup2(os.open(os.devnull, os.O_RDONLY), 0)
+    os.dup2(stdout_fd, 1)
+    os.dup2(stderr_fd, 2)
+    os.close(stdout_fd)
+    os.close(stderr_fd)
+    sys.stdin = open(0, encoding="utf-8", closefd=False)
+    sys.stdout = open(1, "w", encoding="utf-8", errors="backslashreplace", closefd=False)
+    sys.stderr = open(2, "w", encoding="utf-8", errors="backslashreplace", closefd=False)
+    
+    with socket.socket(fileno=job_fd) as job:
+        job.sendall(f"{os.getpid()}\n".encode())
+        code = b"".join(iter(lambda: job.recv(65536), b"")).decode("utf-8")
+        exit_code = run_code(code)
+        sys.stdout.flush()
+        sys.stderr.flush()
+        job.sendall(f"{exit_code}\n".encode())
+    os._exit(0)
+
+
+def serve(control: socket.socket) -> None:
+    """
+    Fork a child per job received on the control socket until it is closed.
+    
+    Args:
+        control: Unix socket shared with the CLI
+    """
+    # Children are reaped automatically; their exit codes are reported on the job socket
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+    while True:
+        message, fds, _, _ = socket.recv_fds(control, 16, 3)
+        if not message:
+            return  # The CLI exited
+        if os.fork() == 0:
+            control.close()
+            try:
+                run_job(*fds)
+            finally:
+                os._exit(1)
+        for fd in fds:
+            os.close(fd)
+
+
+if __name__ == "__main__":
+    for module in PRELOAD:
+        __import__(module)
+    serve(socket.socket(fileno=0))
@@ -1,18 +1,35 @@
 """Terminal command execution tool definition and implementation."""
+import atexit
+import functools
 import subprocess
 import os
 import re
+import shutil
 import signal
+import sys
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
 from typing import Dict, Optional, List, Tuple
-from datetime import datetime
 from pathlib import Path
 from rich.console import Console
 from rich.panel import Panel
 from rich.prompt import Confirm
+from rich.text import Text
+
+from utils import background_executor, drain_pipe
+
+try:
+    import re2
+except ImportError:  # google-re2 is optional, the stdlib patterns below are linear-time too
+    re2 = None
 
 # Initialize Rich console for user prompts
 console = Console()
 
+# Title of the risky-command confirmation panel, built once
+_CONFIRMATION_TITLE = Text("⚠️  CONFIRMATION REQUIRED", style="bold red")
+
 # Tool definition for OpenAI function calling (with strict mode)
 # Optimized for token efficiency while maintaining clarity
 execute_command_tool_definition = {
@@ -42,38 +59,124 @@ execute_command_tool_definition = {
 }
 
 
-# Dangerous command patterns that require user confirmation
+# Dangerous command patterns that require user confirmation.
+# They run on model-written commands, so each must match in linear time: no "\s+.*\s+"
+# pairs, which backtrack over every split of a whitespace run. Patterns of the form
+# "X ... later Y" start at a line start and skip to the first X with (?:(?!X).)*; if Y
+# does not follow the first X it follows no later one, so each line is scanned once
+# instead of once per occurrence of X.
 DANGEROUS_PATTERNS = [
     r"rm\s+(-[rf]+|--recursive|--force)\s+",  # rm -rf, rm -fr, etc.
-    r"rm\s+.*\s+(-[rf]+|--recursive|--force)",  # rm with -rf anywhere
+    r"(?m:^)(?:(?!rm\s).)*rm\s.*\s(-[rf]+|--recursive|--force)",  # rm with -rf anywhere
     r"dd\s+(if=|of=)",  # dd commands
     r"chmod\s+(-R|--recursive)\s+777",  # chmod -R 777
     r"chown\s+(-R|--recursive)",  # chown -R
     r"mkfs\.",  # filesystem creation
     r"fdisk|parted",  # disk partitioning
     r":\(\)\{\s*:\|:&\s*\};:",  # fork bomb
-    r"curl\s+.*\|\s*(sh|bash|zsh)",  # curl | sh
-    r"wget\s+.*\|\s*(sh|bash|zsh)",  # wget | sh
+    r"(?m:^)(?:(?!curl\s).)*curl\s.*\|\s*(sh|bash|zsh)",  # curl | sh
+    r"(?m:^)(?:(?!wget\s).)*wget\s.*\|\s*(sh|bash|zsh)",  # wget | sh
     r"sudo\s+rm\s+",  # sudo rm
     r">\s*/dev/(sd[a-z]|nvme)",  # writing to disk devices
 ]
 
-# Interactive commands that should be avoided
-INTERACTIVE_COMMANDS = [
-    "vim", "vi", "nvim",  # Text editors
-    "nano", "emacs", "pico",  # Text editors
-    "less", "more",  # Pagers
-    "top", "htop", "btop",  # Interactive monitors
-    "man",  # Manual pages
-    "python", "python3", "ipython",  # Interactive Python (without -c)
-    "node",  # Interactive Node.js (without -e)
-    "irb", "pry",  # Interactive Ruby
-    "mysql", "psql", "sqlite3",  # Interactive database shells (without -c)
+# All dangerous patterns as one alternation, each wrapped in a named group (_0, _1, ...)
+# so a single search finds a match and m.lastgroup tells which pattern it was
+_DANGEROUS_ALTERNATION = "|".join(f"(?P<_{i}>{pattern})" for i, pattern in enumerate(DANGEROUS_PATTERNS))
+
+if re2:
+    # RE2 matches in linear time by construction and runs the alternation several times
+    # faster. It has no lookaround, and needs none: drop the line-start-and-skip prefix
+    # so "X ... later Y" patterns search for X directly.
+    _DANGEROUS_RE = re2.compile(
+        "(?i)" + re.sub(r"\(\?m:\^\)\(\?:\(\?!.*?\)\.\)\*", "", _DANGEROUS_ALTERNATION)
+    )
+else:
+    _DANGEROUS_RE = re.compile(_DANGEROUS_ALTERNATION, re.IGNORECASE)
+
+# Command separators, and package manager operations that prompt without --noconfirm
+_COMMAND_SEPARATOR_RE = re.compile(r'[|;&]')
+_PACKAGE_MANAGER_RE = re.compile(r"(pacman|yay)\s+(-S|-Syu|-R)", re.IGNORECASE)
+
+# Dangerous command pattern -> safer alternative shown in the confirmation prompt
+_SAFER_ALTERNATIVES = [
+    (re.compile(r"rm\s+(-[rf]+|--recursive|--force)"),
+     "Consider using 'trash' or 'gio trash' to move files to trash instead of permanent deletion. Or use 'rm' without -rf for safer deletion."),
+    (re.compile(r"chmod\s+(-R|--recursive)\s+777"),
+     "Avoid 777 permissions. Use more restrictive permissions like 755 (rwxr-xr-x) or 644 (rw-r--r--)."),
+    (re.compile(r"(?m:^)(?:(?!curl\s).)*curl\s.*\|\s*(sh|bash|zsh)"),
+     "Download the script first, review it, then execute: curl -O <url> && cat script.sh && bash script.sh"),
+    (re.compile(r"dd\s+(if=|of=)"),
+     "Double-check the if= and of= parameters. A mistake can destroy data. Consider using 'rsync' or 'cp' for file copying."),
 ]
 
+# Interactive commands that should be avoided, grouped by the advice given for them
+EDITORS = frozenset({"vim", "vi", "nvim", "nano", "emacs", "pico"})
+PAGERS = frozenset({"less", "more"})
+MONITORS = frozenset({"top", "htop", "btop"})
+MANUALS = frozenset({"man"})
+REPLS = frozenset({"python", "python3", "ipython", "node"})  # Interactive without -c / -e
+DB_SHELLS = frozenset({"mysql", "psql", "sqlite3"})  # Interactive without -c / -e
+RUBY_REPLS = frozenset({"irb", "pry"})
+INTERACTIVE_COMMANDS = EDITORS | PAGERS | MONITORS | MANUALS | REPLS | DB_SHELLS | RUBY_REPLS
+
+# Commands that cannot run other programs or write files. A command made of just one of
+# these and its arguments, with none of the shell characters below (chaining, redirection,
+# substitution, subshells, zsh glob qualifiers), is safe without running the checks.
+SAFE_COMMANDS = frozenset({
+    "ls", "cat", "pwd", "echo", "grep", "head", "tail", "wc", "date", "whoami",
+    "which", "stat", "file", "du", "df", "uname", "id", "uptime",
+})
+_SHELL_METACHARACTERS = frozenset("|&;<>$`()\n\\")
+
+# External programs that may run without zsh. Shell builtins (echo, pwd, which, kill,
+# printf, ...) are left out: zsh runs its own version of them, not the one on PATH.
+DIRECT_COMMANDS = frozenset({
+    "ls", "cat", "grep", "head", "tail", "wc", "date", "whoami", "stat", "file", "du",
+    "df", "uname", "id", "uptime", "find", "sort", "uniq", "cut", "diff", "tree", "ps",
+    "free", "hostname", "git", "make",
+})
+
+# Startup files a non-interactive zsh reads; they can define functions or change PATH
+_ZSHENV_FILES = (
+    "/etc/zshenv",
+    "/etc/zsh/zshenv",
+    os.path.join(os.environ.get("ZDOTDIR", str(Path.home())), ".zshenv"),
+)
+
+# One of DIRECT_COMMANDS followed by plain words: nothing zsh would expand, quote,
+# glob or redirect, no VAR=value prefix and no =cmd expansion. Such commands are run
+# directly instead of through a zsh process that only splits words.
+_PLAIN_COMMAND_RE = re.compile(r"[\w.+-]+(?:[ \t]+(?!=)[\w./:@+,=-]+)*")
+
+# Characters of stdout/stderr kept per command
+MAX_OUTPUT_LENGTH = 10000
+
 # Command log file
 COMMAND_LOG_FILE = Path.home() / ".lolo" / "command_log.txt"
 
+# The log stays open for the whole session. Entries are flushed in batches (every
+# LOG_FLUSH_ENTRIES entries or LOG_FLUSH_INTERVAL seconds, checked on write) and at exit.
+LOG_FLUSH_ENTRIES = 32
+LOG_FLUSH_INTERVAL = 1.0
+_log_file = None
+_log_pending = 0
+_log_last_flush = 0.0
+_log_lock = threading.Lock()
+
+
+def _flush_command_log():
+    """Write buffered log entries to disk."""
+    global _log_pending, _log_last_flush
+    with _log_lock:
+        if _log_file and _log_pending:
+            _log_file.flush()
+        _log_pending = 0
+        _log_last_flush = time.monotonic()
+
+
+atexit.register(_flush_command_log)
+
 
 def get_safer_alternative(command: str) -> Optional[str]:
     """
@@ -86,21 +189,16 @@ def get_safer_alternative(command: str) -> Optional[str]:
         Suggested safer alternative or None
     """
     # Check for common dangerous patterns and suggest alternatives
-    if re.search(r"rm\s+(-[rf]+|--recursive|--force)", command):
-        return "Consider using 'trash' or 'gio trash' to move files to trash instead of permanent deletion. Or use 'rm' without -rf for safer deletion."
-    
-    if re.search(r"chmod\s+(-R|--recursive)\s+777", command):
-        return "Avoid 777 permissions. Use more restrictive permissions like 755 (rwxr-xr-x) or 644 (rw-r--r--)."
-    
-    if re.search(r"curl\s+.*\|\s*(sh|bash|zsh)", command):
-        return "Download the script first, review it, then execute: curl -O <url> && cat script.sh && bash script.sh"
-    
-    if re.search(r"dd\s+(if=|of=)", command):
-        return "Double-check the if= and of= parameters. A mistake can destroy data. Consider using 'rsync' or 'cp' for file copying."
+    for pattern, alternative in _SAFER_ALTERNATIVES:
+        if pattern.search(command):
+            return alternative
     
     return None
 
 
+# The result depends only on the command string, so repeats (agent retries, the
+# pre-confirmation in main.py followed by execute_command) are classified once
+@functools.lru_cache(maxsize=512)
 def classify_command_risk(command: str) -> Tuple[str, Optional[str]]:
     """
     Classify the risk level of a command.
@@ -111,49 +209,79 @@ def classify_command_risk(command: str) -> Tuple[str, Optional[str]]:
     Returns:
         Tuple of (risk_level, reason) where risk_level is "safe", "risky", or "interactive"
     """
-    # Check for dangerous patterns
-    for pattern in DANGEROUS_PATTERNS:
-        if re.search(pattern, command, re.IGNORECASE):
-            return "risky", f"Matches dangerous pattern: {pattern}"
+    # Fast path: a plain read-only command
+    words = command.split(None, 1)
+    if words and words[0] in SAFE_COMMANDS and _SHELL_METACHARACTERS.isdisjoint(command):
+        return "safe", None
+    
+    # Check for dangerous patterns (one pass over the command for all of them)
+    match = _DANGEROUS_RE.search(command)
+    if match:
+        pattern = DANGEROUS_PATTERNS[int(match.lastgroup[1:])]
+        return "risky", f"Matches dangerous pattern: {pattern}"
     
     # Check for interactive commands
     # Split command by pipes and semicolons to check each part
-    command_parts = re.split(r'[|;&]', command)
+    command_parts = _COMMAND_SEPARATOR_RE.split(command)
     for part in command_parts:
-        # Get the first word (the actual command)
-        cmd_word = part.strip().split()[0] if part.strip() else ""
+        # Get the first word (the actual command), skipping sudo if present
+        words = part.split()
+        cmd_word = words[1] if len(words) > 1 and words[0] == "sudo" else (words[0] if words else "")
         
-        # Remove sudo if present
-        if cmd_word == "sudo" and len(part.strip().split()) > 1:
-            cmd_word = part.strip().split()[1]
+        # Check if it's an interactive command (one set lookup for the common, safe case)
+        if cmd_word not in INTERACTIVE_COMMANDS:
+            continue
         
-        # Check if it's an interactive command
-        if cmd_word in INTERACTIVE_COMMANDS:
-            # Check if it has non-interactive flags
-            if cmd_word in ["vim", "vi", "nvim", "nano", "emacs", "pico"]:
-                # These should never be used - suggest alternatives
-                return "interactive", f"Interactive editor '{cmd_word}' detected. Use 'sed', 'echo >>', or 'cat >' instead."
-            elif cmd_word in ["less", "more"]:
-                return "interactive", f"Interactive pager '{cmd_word}' detected. Use 'cat', 'head', or 'tail' instead."
-            elif cmd_word in ["top", "htop", "btop"]:
-                return "interactive", f"Interactive monitor '{cmd_word}' detected. Use 'ps aux', 'pgrep', or 'systemctl status' instead."
-            elif cmd_word in ["man"]:
-                return "interactive", f"Interactive manual '{cmd_word}' detected. Use online documentation or 'man {cmd_word} | cat' for non-interactive viewing."
-            elif cmd_word in ["python", "python3", "node"] and "-c" not in part and "-e" not in part:
-                return "interactive", f"Interactive interpreter '{cmd_word}' detected. Use '-c' flag for non-interactive execution."
-            elif cmd_word in ["mysql", "psql", "sqlite3"] and "-c" not in part and "-e" not in part:
-                return "interactive", f"Interactive database shell '{cmd_word}' detected. Use '-c' or '-e' flag for non-interactive execution."
-            elif cmd_word in ["irb", "pry"]:
-                return "interactive", f"Interactive Ruby shell '{cmd_word}' detected. Use 'ruby -e' for non-interactive execution."
+        # Check if it has non-interactive flags
+        if cmd_word in EDITORS:
+            # These should never be used - suggest alternatives
+            return "interactive", f"Interactive editor '{cmd_word}' detected. Use 'sed', 'echo >>', or 'cat >' instead."
+        elif cmd_word in PAGERS:
+            return "interactive", f"Interactive pager '{cmd_word}' detected. Use 'cat', 'head', or 'tail' instead."
+        elif cmd_word in MONITORS:
+            return "interactive", f"Interactive monitor '{cmd_word}' detected. Use 'ps aux', 'pgrep', or 'systemctl status' instead."
+        elif cmd_word in MANUALS:
+            return "interactive", f"Interactive manual '{cmd_word}' detected. Use online documentation or 'man {cmd_word} | cat' for non-interactive viewing."
+        elif cmd_word in REPLS and "-c" not in part and "-e" not in part:
+            return "interactive", f"Interactive interpreter '{cmd_word}' detected. Use '-c' flag for non-interactive execution."
+        elif cmd_word in DB_SHELLS and "-c" not in part and "-e" not in part:
+            return "interactive", f"Interactive database shell '{cmd_word}' detected. Use '-c' or '-e' flag for non-interactive execution."
+        elif cmd_word in RUBY_REPLS:
+            return "interactive", f"Interactive Ruby shell '{cmd_word}' detected. Use 'ruby -e' for non-interactive execution."
     
     # Check for commands that might need --noconfirm
-    if re.search(r"(pacman|yay)\s+(-S|-Syu|-R)", command, re.IGNORECASE):
+    if _PACKAGE_MANAGER_RE.search(command):
         if "--noconfirm" not in command and "--no-confirm" not in command:
             return "interactive", "Package manager command detected without --noconfirm flag. Add --noconfirm for non-interactive execution."
     
     return "safe", None
 
 
+def _plain_argv(command: str, path: Optional[str]) -> Optional[Tuple[str, List[str]]]:
+    """
+    Split a command into argv when it needs no shell to run.
+    
+    Args:
+        command: The shell command
+        path: PATH used to look up the program
+    
+    Returns:
+        Tuple of (program path, argv), or None if the command must go through zsh
+        (shell syntax, a program not in DIRECT_COMMANDS or not on PATH, or a zshenv
+        file that could redefine it)
+    """
+    command = command.strip()
+    if not _PLAIN_COMMAND_RE.fullmatch(command):
+        return None
+    argv = command.split()
+    if argv[0] not in DIRECT_COMMANDS or any(os.path.exists(f) for f in _ZSHENV_FILES):
+        return None
+    program = shutil.which(argv[0], path=path)
+    if program is None:
+        return None
+    return program, argv
+
+
 def log_command(command: str, working_dir: str, exit_code: int, duration: float, confirmed: bool = False):
     """
     Log command execution to file.
@@ -165,59 +293,80 @@ def log_command(command: str, working_dir: str, exit_code: int, duration: float,
         duration: Execution duration in seconds
         confirmed: Whether the command required user confirmation
     """
+    global _log_file, _log_pending
+    
     try:
-        # Ensure log directory exists
-        COMMAND_LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
-        
         # Create log entry
-        timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        timestamp = time.strftime("%Y-%m-%d %H:%M:%S")
         confirmed_flag = " [CONFIRMED]" if confirmed else ""
         log_entry = f"[{timestamp}] CWD: {working_dir} | Exit: {exit_code} | Duration: {duration:.2f}s{confirmed_flag} | Command: {command}\n"
         
-        # Append to log file
-        with open(COMMAND_LOG_FILE, "a") as f:
-            f.write(log_entry)
+        with _log_lock:
+            if _log_file is None:
+                # Ensure log directory exists, then keep the file open for appending
+                COMMAND_LOG_FILE.parent.mkdir(parents=True, exist_ok=True)
+                _log_file = open(COMMAND_LOG_FILE, "a", buffering=8192)
+            _log_file.write(log_entry)
+            _log_pending += 1
+            flush_due = (_log_pending >= LOG_FLUSH_ENTRIES
+                         or time.monotonic() - _log_last_flush >= LOG_FLUSH_INTERVAL)
+        
+        if flush_due:
+            _flush_command_log()
     except Exception:
         # Silently fail if logging doesn't work
         pass
 
 
-def prompt_user_confirmation(command: str, risk_reason: str) -> bool:
+def _confirmation_panel(command: str, risk_reason: str, safer_alternative: Optional[str]) -> Panel:
     """
-    Prompt user for confirmation before executing a risky command.
+    Build the warning panel shown before a risky command runs.
+    
+    The command text is added as plain Text, so brackets in it are shown as typed
+    instead of being parsed as Rich markup.
     
     Args:
         command: The risky command
         risk_reason: Reason why the command is risky
+        safer_alternative: Suggested safer command, if any
     
     Returns:
-        True if user confirms, False otherwise
+        The panel to print
     """
-    import sys
-    import threading
-    
-    # Create warning panel
-    warning_content = f"[bold red]⚠️  DANGEROUS COMMAND DETECTED[/bold red]\n\n"
-    warning_content += f"[yellow]Command:[/yellow] [white]{command}[/white]\n\n"
-    warning_content += f"[yellow]Risk:[/yellow] {risk_reason}\n\n"
+    content = Text.assemble(
+        ("⚠️  DANGEROUS COMMAND DETECTED", "bold red"), "\n\n",
+        ("Command:", "yellow"), " ", (command, "white"), "\n\n",
+        ("Risk:", "yellow"), " ", risk_reason, "\n\n",
+    )
     
     # Add safer alternative if available
-    safer_alternative = get_safer_alternative(command)
     if safer_alternative:
-        warning_content += f"[cyan]💡 Safer alternative:[/cyan]\n{safer_alternative}\n\n"
+        content.append("💡 Safer alternative:", "cyan")
+        content.append(f"\n{safer_alternative}\n\n")
     
-    warning_content += "[bold]This command could cause data loss or system damage.[/bold]"
+    content.append("This command could cause data loss or system damage.", "bold")
     
-    panel = Panel(
-        warning_content,
-        title="[bold red]⚠️  CONFIRMATION REQUIRED[/bold red]",
+    return Panel(
+        content,
+        title=_CONFIRMATION_TITLE,
         border_style="red",
         padding=(1, 2)
     )
+
+
+def prompt_user_confirmation(command: str, risk_reason: str) -> bool:
+    """
+    Prompt user for confirmation before executing a risky command.
+    
+    Args:
+        command: The risky command
+        risk_reason: Reason why the command is risky
     
-    console.print()
-    console.print(panel)
-    console.print()
+    Returns:
+        True if user confirms, False otherwise
+    """
+    panel = _confirmation_panel(command, risk_reason, get_safer_alternative(command))
+    console.print("", panel, "", sep="\n")
     
     # Prompt for confirmation using direct stdin read to work in threaded contexts
     try:
@@ -264,8 +413,6 @@ def execute_command(command: str, working_dir: Optional[str] = None, timeout: Op
     Returns:
         Formatted string with command output, stderr, and exit code
     """
-    import time
-    
     # Set default timeout
     if timeout is None:
         timeout = 30
@@ -315,23 +462,38 @@ def execute_command(command: str, working_dir: Optional[str] = None, timeout: Op
     start_time = time.time()
     
     try:
-        # Run command with zsh
+        # Run plain "program args" commands directly, anything else with zsh
+        plain = _plain_argv(command, env.get("PATH"))
+        if plain:
+            (executable, args), shell = plain, False
+        else:
+            executable, args, shell = "/bin/zsh", command, True
         process = subprocess.Popen(
-            command,
-            shell=True,
-            executable="/bin/zsh",
+            args,
+            shell=shell,
+            executable=executable,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
             cwd=working_dir,
             env=env,
             text=True,
-            preexec_fn=os.setsid  # Create new process group for better signal handling
+            start_new_session=True  # setsid() in the child: own process group for better signal handling
         )
         
+        # Read both pipes in the background keeping only what gets shown, so a
+        # command printing gigabytes cannot fill memory
+        stdout_parts, stderr_parts = [], []
+        readers = [
+            background_executor.submit(drain_pipe, process.stdout, stdout_parts, MAX_OUTPUT_LENGTH + 1),
+            background_executor.submit(drain_pipe, process.stderr, stderr_parts, MAX_OUTPUT_LENGTH + 1),
+        ]
+        
         # Wait for completion with timeout
         try:
-            stdout, stderr = process.communicate(timeout=timeout)
-            exit_code = process.returncode
+            exit_code = process.wait(timeout=timeout)
+            # Background jobs can keep the pipes open after the shell exits
+            for reader in readers:
+                reader.result(timeout=max(0, start_time + timeout - time.time()))
         except KeyboardInterrupt:
             # Handle Ctrl+C gracefully
             console.print("\n[yellow]⚠️  Interrupt received (Ctrl+C), terminating command...[/yellow]")
@@ -349,23 +511,24 @@ def execute_command(command: str, working_dir: Optional[str] = None, timeout: Op
             except:
                 pass
             
-            stdout, stderr = process.communicate()
+            process.wait()
             duration = time.time() - start_time
             log_command(command, working_dir, -2, duration, user_confirmed)
             
             return f"⚠️  Command interrupted by user (Ctrl+C)\n\nCommand: {command}\nDuration: {duration:.2f}s\n\n💡 The command was terminated gracefully."
-        except subprocess.TimeoutExpired:
-            # Kill the process group
-            os.killpg(os.getpgid(process.pid), signal.SIGTERM)
-            time.sleep(0.5)
-            
-            # Force kill if still running
+        except (subprocess.TimeoutExpired, FutureTimeoutError):
+            # Kill the process group (setsid made its id the shell's pid, which
+            # may already have exited while background jobs hold the pipes)
             try:
-                os.killpg(os.getpgid(process.pid), signal.SIGKILL)
-            except:
+                os.killpg(process.pid, signal.SIGTERM)
+                time.sleep(0.5)
+                
+                # Force kill if still running
+                os.killpg(process.pid, signal.SIGKILL)
+            except ProcessLookupError:
                 pass
             
-            stdout, stderr = process.communicate()
+            process.wait()
             exit_code = -1
             
             duration = time.time() - start_time
@@ -379,49 +542,52 @@ def execute_command(command: str, working_dir: Optional[str] = None, timeout: Op
         log_command(command, working_dir, exit_code, duration, user_confirmed)
         
         # Truncate output if too long (10,000 chars max)
-        max_output_length = 10000
+        stdout = "".join(stdout_parts)
+        stderr = "".join(stderr_parts)
         stdout_truncated = False
         stderr_truncated = False
         
-        if len(stdout) > max_output_length:
-            stdout = stdout[:max_output_length]
+        if len(stdout) > MAX_OUTPUT_LENGTH:
+            stdout = stdout[:MAX_OUTPUT_LENGTH]
             stdout_truncated = True
         
-        if len(stderr) > max_output_length:
-            stderr = stderr[:max_output_length]
+        if len(stderr) > MAX_OUTPUT_LENGTH:
+            stderr = stderr[:MAX_OUTPUT_LENGTH]
             stderr_truncated = True
         
-        # Format output
-        output = f"✓ Command executed successfully\n\n"
-        output += f"Command: {command}\n"
-        output += f"Working directory: {working_dir}\n"
-        output += f"Exit code: {exit_code}\n"
-        output += f"Duration: {duration:.2f}s\n"
-        output += f"{'-' * 80}\n\n"
+        # Format output (status line chosen up front so command output is never rewritten)
+        status = "✓ Command executed successfully" if exit_code == 0 else "⚠️  Command completed with errors"
+        parts = [
+            f"{status}\n\n"
+            f"Command: {command}\n"
+            f"Working directory: {working_dir}\n"
+            f"Exit code: {exit_code}\n"
+            f"Duration: {duration:.2f}s\n"
+            f"{'-' * 80}\n\n"
+        ]
         
         if stdout:
-            output += "STDOUT:\n"
-            output += stdout
+            parts.append("STDOUT:\n")
+            parts.append(stdout)
             if stdout_truncated:
-                output += "\n\n[Output truncated at 10,000 characters]"
-            output += "\n\n"
+                parts.append("\n\n[Output truncated at 10,000 characters]")
+            parts.append("\n\n")
         
         if stderr:
-            output += "STDERR:\n"
-            output += stderr
+            parts.append("STDERR:\n")
+            parts.append(stderr)
             if stderr_truncated:
-                output += "\n\n[Output truncated at 10,000 characters]"
-            output += "\n\n"
+                parts.append("\n\n[Output truncated at 10,000 characters]")
+            parts.append("\n\n")
         
         if not stdout and not stderr:
-            output += "(No output)\n\n"
+            parts.append("(No output)\n\n")
         
         # Add warning for non-zero exit codes
         if exit_code != 0:
-            output = output.replace("✓ Command executed successfully", "⚠️  Command completed with errors")
-            output += f"💡 Note: Command exited with code {exit_code}, which typically indicates an error.\n"
+            parts.append(f"💡 Note: Command exited with code {exit_code}, which typically indicates an error.\n")
         
-        return output
+        return "".join(parts)
         
     except FileNotFoundError:
         return f"❌ Error: Command not found\n\nCommand: {command}\n\n💡 Suggestion: Check if the command is installed and available in PATH."
@@ -1,9 +1,96 @@
 """Web fetch tool definition and implementation."""
+import atexit
+import queue
 import requests
 from bs4 import BeautifulSoup
+from concurrent.futures import Future
 import random
+import threading
 import time
-from typing import Dict
+from requests.adapters import HTTPAdapter
+from requests.compat import chardet
+from typing import Any, Dict, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+from urllib3.util.request import ACCEPT_ENCODING
+from urllib3.util.retry import Retry
+
+from utils import background_executor
+
+try:
+    from lxml import etree
+    from lxml import html as lxml_html
+except ImportError:  # lxml is optional, BeautifulSoup's pure-Python parser works everywhere
+    lxml_html = None
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:  # selectolax is optional, lxml/BeautifulSoup are used without it
+    LexborHTMLParser = None
+
+# Elements whose text is not page content
+NON_CONTENT_TAGS = ("script", "style", "noscript", "iframe")
+
+# Parses the already-decoded page (passed as UTF-8 bytes), ignoring any encoding the
+# document itself declares
+_LXML_PARSER = lxml_html.HTMLParser(encoding="utf-8") if lxml_html else None
+
+# Seconds past the cache TTL that a page is still served while it is refetched
+STALE_WHILE_REVALIDATE = 3600
+_refreshing: Dict[str, Future] = {}  # cache key -> running background refresh
+_refresh_lock = threading.Lock()
+
+# services.web_cache, resolved on first use (False until then, None if unavailable).
+# It can't be imported at module load: the services package imports this module.
+_web_cache: Any = False
+
+# HTTP statuses a browser fetch would get too, so the Selenium fallback is skipped
+_NO_BROWSER_RETRY_STATUSES = frozenset({401, 404, 410, 429})
+
+# Longest Retry-After (seconds) a fetch will wait for before retrying anyway
+MAX_RETRY_AFTER = 10
+
+
+class _CappedRetry(Retry):
+    """Retry policy that waits at most MAX_RETRY_AFTER seconds for a server's Retry-After."""
+    
+    def get_retry_after(self, response):
+        retry_after = super().get_retry_after(response)
+        return None if retry_after is None else min(retry_after, MAX_RETRY_AFTER)
+
+
+# Shared HTTP session: repeat fetches reuse pooled keep-alive connections instead of
+# a new TCP+TLS handshake per page. Timeouts, connection errors, rate limits and
+# gateway errors are retried twice by urllib3 with exponential backoff, honoring
+# Retry-After on 429/503.
+_SESSION = requests.Session()
+_ADAPTER = HTTPAdapter(
+    pool_connections=16,
+    pool_maxsize=16,
+    max_retries=_CappedRetry(
+        total=2,
+        backoff_factor=1,
+        status_forcelist=[429, 502, 503, 504],
+        raise_on_status=False  # Hand the last response back so the status check reports it
+    )
+)
+_SESSION.mount('https://', _ADAPTER)
+_SESSION.mount('http://', _ADAPTER)
+_SESSION.headers.update({
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "en-US,en;q=0.5",
+    # Only advertise encodings urllib3 can decode (br/zstd need their optional packages)
+    "Accept-Encoding": ACCEPT_ENCODING,
+    "DNT": "1",
+    "Connection": "keep-alive",
+    "Upgrade-Insecure-Requests": "1",
+    "Sec-Fetch-Dest": "document",
+    "Sec-Fetch-Mode": "navigate",
+    "Sec-Fetch-Site": "none",
+})
+
+# Raw HTML read per page. Bounds download and parse work on huge pages while leaving
+# plenty of markup to yield the 25,000 characters of text fetch_webpage returns.
+MAX_HTML_BYTES = 1_000_000
 
 # Rotating user agents to avoid bot detection
 USER_AGENTS = [
@@ -14,6 +101,9 @@ USER_AGENTS = [
     "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
 ]
 
+# Own generator for picking user agents, unaffected by anything reseeding `random`
+_UA_RNG = random.Random()
+
 # Tool definition for OpenAI function calling (with strict mode)
 # Optimized for token efficiency while maintaining clarity
 web_fetch_tool_definition = {
@@ -45,99 +135,294 @@ def extract_text_from_html(html_content: str) -> str:
     Returns:
         Clean text extracted from HTML
     """
-    soup = BeautifulSoup(html_content, "html.parser")
+    text = None
+    if LexborHTMLParser:
+        # lexbor parses and collects text about twice as fast as lxml on markup-heavy pages
+        tree = LexborHTMLParser(html_content)
+        tree.strip_tags(list(NON_CONTENT_TAGS))
+        text = tree.root.text() if tree.root else ""
+    elif lxml_html and html_content.strip():
+        # Parse in C with lxml, drop non-content elements (keeping the text after them)
+        try:
+            document = lxml_html.document_fromstring(html_content.encode("utf-8"), parser=_LXML_PARSER)
+            etree.strip_elements(document, *NON_CONTENT_TAGS, with_tail=False)
+            text = document.text_content()
+        except (etree.ParserError, ValueError):
+            pass
     
-    # Remove script and style elements
-    for script in soup(["script", "style", "noscript", "iframe"]):
-        script.decompose()
+    if text is None:
+        soup = BeautifulSoup(html_content, "html.parser")
+        
+        # Remove script and style elements
+        for script in soup(list(NON_CONTENT_TAGS)):
+            script.decompose()
+        
+        # Get text
+        text = soup.get_text()
     
-    # Get text
-    text = soup.get_text()
+    return _normalize_whitespace(text)
+
+
+def _normalize_whitespace(text: str) -> str:
+    """
+    Put each phrase of extracted text on its own line, dropping blank ones.
     
-    # Clean up whitespace
-    lines = (line.strip() for line in text.splitlines())
-    chunks = (phrase.strip() for line in lines for phrase in line.split("  "))
-    text = "\n".join(chunk for chunk in chunks if chunk)
+    Args:
+        text: Text with the layout whitespace of the source page
     
-    return text
+    Returns:
+        Text with one stripped phrase per line
+    """
+    # Every line break and double space ends a chunk, so rejoin the lines
+    # on "  " and split once instead of splitting each line in Python
+    chunks = "  ".join(text.splitlines()).split("  ")
+    return "\n".join(filter(None, map(str.strip, chunks)))
 
 
-def fetch_with_requests(url: str, max_retries: int = 3) -> Dict[str, str]:
+def _is_markup_content_type(content_type: str) -> bool:
+    """
+    Check whether a Content-Type header describes a document that needs HTML parsing.
+    
+    Args:
+        content_type: Content-Type header value (empty if the server sent none)
+    
+    Returns:
+        False for plain text, JSON, Markdown and similar bodies, True otherwise
+    """
+    mime = content_type.split(";", 1)[0].strip().lower()
+    if not mime:
+        return True
+    return "html" in mime or "xml" in mime or not (mime.startswith("text/") or mime.endswith("json"))
+
+
+def fetch_with_requests(url: str) -> Dict[str, Any]:
     """
     Fetch webpage using requests library with rotating user agents and retry logic.
     
     Args:
         url: URL to fetch
-        max_retries: Maximum number of retry attempts
     
     Returns:
         Dictionary with status and content or error
     """
-    headers = {
-        "User-Agent": random.choice(USER_AGENTS),
-        "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-        "Accept-Language": "en-US,en;q=0.5",
-        "Accept-Encoding": "gzip, deflate, br",
-        "DNT": "1",
-        "Connection": "keep-alive",
-        "Upgrade-Insecure-Requests": "1",
-        "Sec-Fetch-Dest": "document",
-        "Sec-Fetch-Mode": "navigate",
-        "Sec-Fetch-Site": "none",
-    }
+    # Browser-like defaults live on _SESSION; only the user agent rotates per fetch
+    headers = {"User-Agent": _UA_RNG.choice(USER_AGENTS)}
     
-    for attempt in range(max_retries):
-        try:
-            response = requests.get(url, headers=headers, timeout=15, allow_redirects=True)
+    try:
+        response = _SESSION.get(url, headers=headers, timeout=15, allow_redirects=True, stream=True)
+        with response:
             response.raise_for_status()
             
-            # Check if we got a Cloudflare challenge page
-            if "cloudflare" in response.text.lower() and "challenge" in response.text.lower():
-                return {"status": "cloudflare", "error": "Cloudflare challenge detected"}
+            # Read the body up to MAX_HTML_BYTES, dropping the connection on the rest
+            body = bytearray()
+            truncated = False
+            for chunk in response.iter_content(chunk_size=65536):
+                body += chunk
+                if len(body) >= MAX_HTML_BYTES:
+                    truncated = True
+                    break
+        
+        # Decode like response.text would, detecting the charset on the bytes read
+        encoding = response.encoding or chardet.detect(bytes(body))["encoding"] or "utf-8"
+        content = body.decode(encoding, errors="replace")
+        
+        # Check if we got a Cloudflare challenge page
+        lowered = content.lower()
+        if "cloudflare" in lowered and "challenge" in lowered:
+            return {"status": "cloudflare", "error": "Cloudflare challenge detected"}
+        
+        return {
+            "status": "success",
+            "content": content,
+            "truncated": truncated,
+            "content_type": response.headers.get("Content-Type", ""),
+        }
+        
+    except requests.exceptions.Timeout:
+        return {"status": "error", "error": "Request timed out after multiple attempts"}
+        
+    except requests.exceptions.ConnectionError:
+        return {"status": "error", "error": "Connection failed - unable to reach server"}
+        
+    except requests.exceptions.HTTPError as e:
+        status_code = e.response.status_code
+        if status_code == 403:
+            error = "Access forbidden (403) - site may be blocking automated requests"
+        elif status_code == 404:
+            error = "Page not found (404)"
+        elif status_code == 429:
+            error = "Rate limited (429) - too many requests"
+        elif status_code >= 500:
+            error = f"Server error ({status_code}) - site may be down"
+        else:
+            error = f"HTTP error {status_code}: {str(e)}"
+        return {"status": "error", "error": error, "http_status": status_code}
             
-            return {"status": "success", "content": response.text}
+    except requests.exceptions.RequestException as e:
+        return {"status": "error", "error": f"Request failed: {str(e)}"}
+
+
+# Common cookie consent buttons, tried in order
+COOKIE_BUTTON_SELECTORS = [
+    "button[id*='accept']",
+    "button[class*='accept']",
+    "button[id*='cookie']",
+    "button[class*='cookie']",
+    "button[id*='consent']",
+    "button[class*='consent']",
+    "a[id*='accept']",
+    "a[class*='accept']",
+    ".cookie-accept",
+    "#cookie-accept",
+    ".accept-cookies",
+    "#accept-cookies",
+]
+
+# Clicks the first match of the first selector whose match is visible, inside the page
+# instead of one WebDriver round trip per selector. Returns whether it clicked.
+_CLICK_COOKIE_BUTTON_JS = """
+for (const selector of arguments[0]) {
+    const el = document.querySelector(selector);
+    if (el && (el.offsetWidth || el.offsetHeight || el.getClientRects().length)) {
+        el.click();
+        return true;
+    }
+}
+return false;
+"""
+
+# Lowercased title and start of the visible text, enough to recognize a challenge
+# page without copying and lowercasing the whole rendered DOM in Python
+_CHALLENGE_TEXT_JS = (
+    "return (document.title + ' ' + (document.body ? document.body.innerText.slice(0, 4000) : ''))"
+    ".toLowerCase();"
+)
+
+# Headless browsers shared across fetch_with_selenium calls. Launching Chrome costs a
+# second or more, so up to SELENIUM_POOL_SIZE of them are started on demand and kept
+# idle between fetches. Each is replaced after SELENIUM_MAX_REUSES pages to bound the
+# memory a long-lived browser accumulates.
+SELENIUM_POOL_SIZE = 2
+SELENIUM_MAX_REUSES = 50
+_IDLE_DRIVERS = queue.LifoQueue()  # (driver, pages fetched) ready for the next fetch
+_DRIVER_SLOTS = threading.BoundedSemaphore(SELENIUM_POOL_SIZE)
+
+
+def _create_driver(use_undetected: bool):
+    """
+    Start a headless Chrome driver.
+    
+    Args:
+        use_undetected: Whether to use undetected-chromedriver (better for bot protection)
+    
+    Returns:
+        The WebDriver instance
+    """
+    # Try to use undetected-chromedriver first (better for Cloudflare)
+    if use_undetected:
+        try:
+            import undetected_chromedriver as uc
             
-        except requests.exceptions.Timeout:
-            if attempt < max_retries - 1:
-                wait_time = (2 ** attempt) + random.uniform(0, 1)  # Exponential backoff
-                time.sleep(wait_time)
-                continue
-            return {"status": "error", "error": "Request timed out after multiple attempts"}
+            options = uc.ChromeOptions()
+            options.add_argument("--headless=new")  # New headless mode
+            options.add_argument("--no-sandbox")
+            options.add_argument("--disable-dev-shm-usage")
+            options.add_argument("--disable-blink-features=AutomationControlled")
+            options.add_argument(f"--user-agent={_UA_RNG.choice(USER_AGENTS)}")
             
-        except requests.exceptions.ConnectionError:
-            if attempt < max_retries - 1:
-                wait_time = (2 ** attempt) + random.uniform(0, 1)
-                time.sleep(wait_time)
-                continue
-            return {"status": "error", "error": "Connection failed - unable to reach server"}
+            # Create undetected Chrome driver
+            return uc.Chrome(options=options, version_main=None)
             
-        except requests.exceptions.HTTPError as e:
-            status_code = e.response.status_code
-            if status_code == 403:
-                return {"status": "error", "error": "Access forbidden (403) - site may be blocking automated requests"}
-            elif status_code == 404:
-                return {"status": "error", "error": "Page not found (404)"}
-            elif status_code == 429:
-                if attempt < max_retries - 1:
-                    wait_time = (2 ** attempt) * 2 + random.uniform(0, 1)  # Longer backoff for rate limits
-                    time.sleep(wait_time)
-                    continue
-                return {"status": "error", "error": "Rate limited (429) - too many requests"}
-            elif status_code >= 500:
-                return {"status": "error", "error": f"Server error ({status_code}) - site may be down"}
-            else:
-                return {"status": "error", "error": f"HTTP error {status_code}: {str(e)}"}
-                
-        except requests.exceptions.RequestException as e:
-            return {"status": "error", "error": f"Request failed: {str(e)}"}
+        except ImportError:
+            # Fall back to regular Selenium if undetected-chromedriver not available
+            pass
+    
+    # Fall back to regular Selenium
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    
+    chrome_options = Options()
+    chrome_options.add_argument("--headless=new")
+    chrome_options.add_argument("--no-sandbox")
+    chrome_options.add_argument("--disable-dev-shm-usage")
+    chrome_options.add_argument("--disable-blink-features=AutomationControlled")
+    chrome_options.add_argument(f"user-agent={_UA_RNG.choice(USER_AGENTS)}")
+    chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
+    chrome_options.add_experimental_option("useAutomationExtension", False)
+    
+    return webdriver.Chrome(options=chrome_options)
+
+
+def _wait_for_render(driver, timeout: float, interval: float = 0.25) -> None:
+    """
+    Wait until the page text stops changing, for at most `timeout` seconds.
+    
+    Args:
+        driver: WebDriver with a loaded page
+        timeout: Maximum seconds to wait
+        interval: Seconds between checks
+    """
+    deadline = time.monotonic() + timeout
+    last_length = None
+    while time.monotonic() < deadline:
+        length = driver.execute_script("return document.body ? document.body.innerText.length : 0")
+        if length and length == last_length:
+            return
+        last_length = length
+        time.sleep(interval)
+
+
+def _quit_driver(driver) -> None:
+    """
+    Shut down a browser, ignoring errors from one that already died.
+    
+    Args:
+        driver: The WebDriver instance
+    """
+    try:
+        driver.quit()
+    except Exception:
+        pass
+
+
+def _quit_idle_drivers() -> None:
+    """Shut down every browser waiting in the pool."""
+    while True:
+        try:
+            driver, _ = _IDLE_DRIVERS.get_nowait()
+        except queue.Empty:
+            return
+        _quit_driver(driver)
+
+
+def _reset_driver_state(driver) -> None:
+    """
+    Clear cookies and storage and leave the page so the next fetch starts from a clean session.
     
-    return {"status": "error", "error": "Max retries exceeded"}
+    Args:
+        driver: The pooled WebDriver instance
+    """
+    try:
+        driver.delete_all_cookies()
+        driver.execute_script("window.localStorage.clear(); window.sessionStorage.clear();")
+    except Exception:
+        # Error pages have no storage to clear
+        pass
+    try:
+        # Stops the page's scripts and timers while the browser sits idle
+        driver.get("about:blank")
+    except Exception:
+        pass
+
+
+atexit.register(_quit_idle_drivers)
 
 
 def fetch_with_selenium(url: str, use_undetected: bool = True) -> Dict[str, str]:
     """
     Fetch webpage using Selenium with undetected-chromedriver for JavaScript-rendered content.
     Handles Cloudflare challenges and cookie dialogs automatically.
+    Browsers come from a small pool, so they are started once and reused by later calls.
     
     Args:
         url: URL to fetch
@@ -146,48 +431,46 @@ def fetch_with_selenium(url: str, use_undetected: bool = True) -> Dict[str, str]
     Returns:
         Dictionary with status and content or error
     """
-    driver = None
+    with _DRIVER_SLOTS:
+        try:
+            driver, uses = _IDLE_DRIVERS.get_nowait()
+        except queue.Empty:
+            driver, uses = None, 0
+        
+        result, driver = _fetch_with_driver(url, use_undetected, driver)
+        
+        # Return a working browser to the pool, or retire it once it has served enough pages
+        if driver is not None:
+            uses += 1
+            if uses >= SELENIUM_MAX_REUSES:
+                _quit_driver(driver)
+            else:
+                _reset_driver_state(driver)
+                _IDLE_DRIVERS.put((driver, uses))
+        return result
+
+
+def _fetch_with_driver(url: str, use_undetected: bool, driver) -> Tuple[Dict[str, str], Any]:
+    """
+    Load a page in a pooled browser, starting one if needed.
+    
+    Args:
+        url: URL to fetch
+        use_undetected: Whether to use undetected-chromedriver if a browser must be started
+        driver: Idle WebDriver from the pool, or None to start a new one
     
+    Returns:
+        Tuple of (dictionary with status and content or error, the WebDriver to keep
+        or None if none was started or it failed)
+    """
     try:
         from selenium.webdriver.common.by import By
         from selenium.webdriver.support.ui import WebDriverWait
         from selenium.webdriver.support import expected_conditions as EC
-        from selenium.common.exceptions import TimeoutException, NoSuchElementException
+        from selenium.common.exceptions import TimeoutException
         
-        # Try to use undetected-chromedriver first (better for Cloudflare)
-        if use_undetected:
-            try:
-                import undetected_chromedriver as uc
-                
-                options = uc.ChromeOptions()
-                options.add_argument("--headless=new")  # New headless mode
-                options.add_argument("--no-sandbox")
-                options.add_argument("--disable-dev-shm-usage")
-                options.add_argument("--disable-blink-features=AutomationControlled")
-                options.add_argument(f"--user-agent={random.choice(USER_AGENTS)}")
-                
-                # Create undetected Chrome driver
-                driver = uc.Chrome(options=options, version_main=None)
-                
-            except ImportError:
-                # Fall back to regular Selenium if undetected-chromedriver not available
-                use_undetected = False
-        
-        # Fall back to regular Selenium
-        if not use_undetected:
-            from selenium import webdriver
-            from selenium.webdriver.chrome.options import Options
-            
-            chrome_options = Options()
-            chrome_options.add_argument("--headless=new")
-            chrome_options.add_argument("--no-sandbox")
-            chrome_options.add_argument("--disable-dev-shm-usage")
-            chrome_options.add_argument("--disable-blink-features=AutomationControlled")
-            chrome_options.add_argument(f"user-agent={random.choice(USER_AGENTS)}")
-            chrome_options.add_experimental_option("excludeSwitches", ["enable-automation"])
-            chrome_options.add_experimental_option("useAutomationExtension", False)
-            
-            driver = webdriver.Chrome(options=chrome_options)
+        if driver is None:
+            driver = _create_driver(use_undetected)
         
         # Navigate to URL
         driver.get(url)
@@ -197,76 +480,127 @@ def fetch_with_selenium(url: str, use_undetected: bool = True) -> Dict[str, str]
             EC.presence_of_element_located((By.TAG_NAME, "body"))
         )
         
-        # Wait a bit for JavaScript to execute
-        time.sleep(2)
+        # Give JavaScript up to 2 seconds to render the page
+        _wait_for_render(driver, timeout=2.0)
         
-        # Try to handle common cookie consent dialogs
-        cookie_button_selectors = [
-            "button[id*='accept']",
-            "button[class*='accept']",
-            "button[id*='cookie']",
-            "button[class*='cookie']",
-            "button[id*='consent']",
-            "button[class*='consent']",
-            "a[id*='accept']",
-            "a[class*='accept']",
-            ".cookie-accept",
-            "#cookie-accept",
-            ".accept-cookies",
-            "#accept-cookies",
-        ]
-        
-        for selector in cookie_button_selectors:
-            try:
-                button = driver.find_element(By.CSS_SELECTOR, selector)
-                if button.is_displayed():
-                    button.click()
-                    time.sleep(1)
-                    break
-            except (NoSuchElementException, Exception):
-                continue
+        # Try to handle common cookie consent dialogs (one script call for all selectors)
+        try:
+            if driver.execute_script(_CLICK_COOKIE_BUTTON_JS, COOKIE_BUTTON_SELECTORS):
+                time.sleep(1)
+        except Exception:
+            pass
         
         # Check for Cloudflare challenge
-        page_text = driver.page_source.lower()
+        page_text = driver.execute_script(_CHALLENGE_TEXT_JS)
         if "cloudflare" in page_text and "checking your browser" in page_text:
             # Wait longer for Cloudflare to resolve (up to 10 seconds)
             time.sleep(10)
-            page_text = driver.page_source.lower()
+            page_text = driver.execute_script(_CHALLENGE_TEXT_JS)
             
             # If still showing challenge, return error
             if "checking your browser" in page_text:
-                return {"status": "error", "error": "Cloudflare challenge could not be bypassed"}
+                return {"status": "error", "error": "Cloudflare challenge could not be bypassed"}, driver
         
         # Get final page content
         content = driver.page_source
-        return {"status": "success", "content": content}
+        return {"status": "success", "content": content}, driver
         
     except ImportError as e:
         missing_lib = "undetected-chromedriver" if "undetected" in str(e) else "selenium"
-        return {"status": "error", "error": f"{missing_lib} not installed. Install with: uv pip install {missing_lib}"}
+        return {"status": "error", "error": f"{missing_lib} not installed. Install with: uv pip install {missing_lib}"}, driver
         
     except TimeoutException:
-        return {"status": "error", "error": "Page load timeout - site took too long to respond"}
+        return {"status": "error", "error": "Page load timeout - site took too long to respond"}, driver
         
     except Exception as e:
+        # The browser may have crashed or hung; start a fresh one next time
+        if driver is not None:
+            _quit_driver(driver)
         error_msg = str(e)
         if "chrome" in error_msg.lower() or "chromedriver" in error_msg.lower():
-            return {"status": "error", "error": "ChromeDriver error - ensure Chrome/Chromium is installed"}
-        return {"status": "error", "error": f"Browser automation error: {error_msg}"}
-        
-    finally:
-        if driver:
-            try:
-                driver.quit()
-            except:
-                pass
+            return {"status": "error", "error": "ChromeDriver error - ensure Chrome/Chromium is installed"}, None
+        return {"status": "error", "error": f"Browser automation error: {error_msg}"}, None
+
+
+def _page_cache():
+    """
+    Get the shared page cache, importing it on the first call only.
+    
+    Returns:
+        The web cache, or None if the services package is not available
+    """
+    global _web_cache
+    if _web_cache is False:
+        try:
+            from services.cache_manager import web_cache
+            _web_cache = web_cache
+        except ImportError:
+            # If cache not available, continue without caching
+            _web_cache = None
+    return _web_cache
+
+
+def _cache_key(url: str) -> str:
+    """
+    Canonical form of a URL for the page cache.
+    
+    Spellings of the same request share one entry: scheme and host are lowercased,
+    default ports and the fragment (never sent to the server) are dropped, and query
+    parameters are sorted by name. The path is kept as is.
+    
+    Args:
+        url: URL as requested
+    
+    Returns:
+        The cache key
+    """
+    try:
+        parts = urlsplit(url)
+        host = (parts.hostname or "").rstrip(".")
+        port = parts.port
+    except ValueError:
+        # Malformed netloc or port; cache it under the URL as given
+        return url
+    
+    scheme = parts.scheme.lower()
+    netloc = f"[{host}]" if ":" in host else host
+    if port is not None and (scheme, port) not in (("http", 80), ("https", 443)):
+        netloc += f":{port}"
+    if parts.username or parts.password:
+        netloc = parts.netloc.rsplit("@", 1)[0] + "@" + netloc
+    
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True), key=lambda item: item[0]))
+    return urlunsplit((scheme, netloc, parts.path or "/", query, ""))
+
+
+def _format_page(clean_text: str, truncated: bool) -> str:
+    """
+    Add the metadata header (and truncation notice) to extracted page text.
+    
+    Args:
+        clean_text: Extracted text, at most 25,000 characters
+        truncated: Whether the page had more content than was kept
+    
+    Returns:
+        Page text as shown to the model
+    """
+    output = f"Content length: {len(clean_text):,} characters"
+    if truncated:
+        output += " (truncated)"
+    output += f"\n{'-' * 80}\n\n"
+    output += clean_text
+    
+    if truncated:
+        output += "\n\n[Content truncated at 25,000 characters]"
+    
+    return output
 
 
 def fetch_webpage(url: str) -> str:
     """
     Fetch and extract clean text content from a webpage.
     Automatically handles bot protection, Cloudflare challenges, and cookie dialogs.
-    Uses caching to avoid repeated fetches (1 hour TTL).
+    Uses caching to avoid repeated fetches (1 hour TTL, then served stale while refreshed).
     
     Args:
         url: The URL of the webpage to fetch
@@ -278,26 +612,100 @@ def fetch_webpage(url: str) -> str:
     if not url.startswith(("http://", "https://")):
         return "❌ Error: Invalid URL format\n\nURL must start with http:// or https://\nExample: https://example.com"
     
-    # Check cache first
-    try:
-        from services.cache_manager import web_cache
-        cached_content = web_cache.get(url)
-        if cached_content:
-            return f"✓ Successfully fetched (cached): {url}\n{cached_content}"
-    except ImportError:
-        # If cache not available, continue without caching
-        pass
+    # Check cache first. A page past its TTL is still served (for up to
+    # STALE_WHILE_REVALIDATE seconds) while a background fetch refreshes it.
+    web_cache = _page_cache()
+    hit = web_cache.get_stale(_cache_key(url), STALE_WHILE_REVALIDATE) if web_cache else None
+    if hit:
+        cached, age = hit
+        if age >= web_cache.ttl:
+            _refresh_in_background(url)
+        if isinstance(cached, dict):
+            return f"✓ Successfully fetched (cached): {url}\n{_format_page(cached['text'], cached['truncated'])}"
+        if cached:
+            # Entry cached as formatted output by an older version
+            return f"✓ Successfully fetched (cached): {url}\n{cached}"
     
+    return _fetch_page(url)
+
+
+def _should_try_selenium(result: Dict[str, Any]) -> bool:
+    """
+    Decide whether a failed requests fetch is worth retrying in a browser.
+    
+    A browser helps against bot protection (challenge pages, 403s, some 5xx) and
+    JS-only sites, but not when the server answered definitively: a missing page,
+    required authentication or rate limiting look the same to it.
+    
+    Args:
+        result: Result dictionary from fetch_with_requests
+    
+    Returns:
+        True if fetch_with_selenium should be tried
+    """
+    return result.get("http_status") not in _NO_BROWSER_RETRY_STATUSES
+
+
+def _refresh_in_background(url: str) -> None:
+    """
+    Refetch a stale page on the background pool, unless a refresh is already running.
+    
+    Args:
+        url: The URL of the webpage to refetch
+    """
+    key = _cache_key(url)
+    
+    def done(_):
+        with _refresh_lock:
+            _refreshing.pop(key, None)
+    
+    with _refresh_lock:
+        if key in _refreshing:
+            return
+        future = background_executor.submit(_refresh_page, url)
+        _refreshing[key] = future
+    future.add_done_callback(done)
+
+
+def _refresh_page(url: str) -> None:
+    """
+    Refetch a stale page with requests only and cache it on success.
+    
+    A browser is never started here: the pool's worker threads are not daemons, so
+    a slow Selenium fetch would keep the CLI from exiting. If requests fails, the
+    stale copy is kept and the next fetch after it expires tries the browser.
+    
+    Args:
+        url: The URL of the webpage to refetch
+    """
+    result = fetch_with_requests(url)
+    if result["status"] == "success":
+        _extract_page(url, result)
+
+
+def _fetch_page(url: str) -> str:
+    """
+    Fetch and extract a webpage, caching the text on success.
+    
+    Args:
+        url: The URL of the webpage to fetch
+    
+    Returns:
+        Clean text content from the webpage (max 25,000 characters) or an error message
+    """
     # Try fetching with requests first (faster, with retry logic)
-    result = fetch_with_requests(url, max_retries=3)
+    result = fetch_with_requests(url)
     
     # If requests fails or hits Cloudflare, try Selenium with undetected-chromedriver
     if result["status"] in ["error", "cloudflare"]:
         # Store the requests error for fallback message
         requests_error = result.get("error", "Unknown error")
         
-        # Try Selenium as fallback
-        result = fetch_with_selenium(url, use_undetected=True)
+        # Try Selenium as fallback, unless a browser would get the same answer
+        if _should_try_selenium(result):
+            result = fetch_with_selenium(url, use_undetected=True)
+        else:
+            result = {"status": "error", "error": "Not attempted - a browser would get the same response"}
         
         # If Selenium also fails, provide detailed error
         if result["status"] == "error":
@@ -324,9 +732,26 @@ def fetch_webpage(url: str) -> str:
             
             return error_output
     
-    # Extract clean text from HTML
+    return _extract_page(url, result)
+
+
+def _extract_page(url: str, result: Dict[str, Any]) -> str:
+    """
+    Extract the text of a fetched page, caching it on success.
+    
+    Args:
+        url: The URL of the webpage
+        result: Successful result dictionary from fetch_with_requests or fetch_with_selenium
+    
+    Returns:
+        Clean text content from the webpage (max 25,000 characters) or an error message
+    """
+    # Extract clean text from HTML (plain text, JSON and the like need no parsing)
     try:
-        clean_text = extract_text_from_html(result["content"])
+        if _is_markup_content_type(result.get("content_type", "")):
+            clean_text = extract_text_from_html(result["content"])
+        else:
+            clean_text = _normalize_whitespace(result["content"])
     except Exception as e:
         return f"❌ Error: Failed to parse webpage content\n\nDetails: {str(e)}\n\n💡 The page may have an unusual structure or encoding."
     
@@ -335,26 +760,14 @@ def fetch_webpage(url: str) -> str:
         return f"⚠️  Warning: Very little content extracted\n\nURL: {url}\n\nThe page may be empty, require authentication, or use complex JavaScript rendering."
     
     # Limit to 25,000 characters
-    truncated = False
+    truncated = result.get("truncated", False)
     if len(clean_text) > 25000:
         clean_text = clean_text[:25000]
         truncated = True
     
-    # Add metadata header
-    output = f"Content length: {len(clean_text):,} characters"
-    if truncated:
-        output += " (truncated)"
-    output += f"\n{'-' * 80}\n\n"
-    output += clean_text
-    
-    if truncated:
-        output += "\n\n[Content truncated at 25,000 characters]"
-    
-    # Cache the result for future requests
-    try:
-        from services.cache_manager import web_cache
-        web_cache.set(url, output)
-    except ImportError:
-        pass
+    # Cache the text for future requests; the header is added when it is returned
+    web_cache = _page_cache()
+    if web_cache:
+        web_cache.set(_cache_key(url), {"text": clean_text, "truncated": truncated})
     
-    return f"✓ Successfully fetched: {url}\n{output}"
+    return f"✓ Successfully fetched: {url}\n{_format_page(clean_text, truncated)}"
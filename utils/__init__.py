@@ -1,4 +1,6 @@
 """Utilities package."""
 from .performance import PerformanceMonitor, perf_monitor, print_optimization_tips
+from .background import background_executor, drain_pipe
+from . import fast_json
 
-__all__ = ["PerformanceMonitor", "perf_monitor", "print_optimization_tips"]
+__all__ = ["PerformanceMonitor", "perf_monitor", "print_optimization_tips", "background_executor", "drain_pipe", "fast_json"]
@@ -0,0 +1,31 @@
+"""Shared thread pool for short background work in the tools."""
+import atexit
+from concurrent.futures import ThreadPoolExecutor
+
+# One pool for the tools' background work (edit input encoding, subprocess pipe draining,
+# stale page refreshes) instead of each tool creating its own threads. Sized for one
+# edit's 11 input encodes plus the two pipe readers of a running command or
+# execute_python fallback.
+# Threads are only started when work is submitted.
+background_executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="lolo-bg")
+
+# Drop queued work at exit instead of finishing it
+atexit.register(background_executor.shutdown, wait=False, cancel_futures=True)
+
+
+def drain_pipe(pipe, parts: list, limit: int) -> None:
+    """
+    Read a pipe to EOF, keeping its first `limit` characters.
+    
+    Reading continues after the limit so the child never blocks on a full pipe.
+    
+    Args:
+        pipe: Text-mode pipe of the child process
+        parts: List the kept chunks are appended to
+        limit: Number of characters to keep
+    """
+    with pipe:
+        for chunk in iter(lambda: pipe.read(4096), ''):
+            if limit > 0:
+                parts.append(chunk[:limit])
+                limit -= len(chunk)
@@ -0,0 +1,75 @@
+"""JSON helpers that use orjson when available and fall back to the stdlib."""
+import json
+from typing import Any, Callable, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, stdlib json works everywhere
+    orjson = None
+
+# Raised by loads() on malformed input (orjson.JSONDecodeError subclasses it)
+JSONDecodeError = json.JSONDecodeError
+
+
+def sdk_default(obj: Any) -> Any:
+    """
+    `default` hook for dumps() that serializes SDK (pydantic) objects.
+    
+    Args:
+        obj: Object the JSON encoder could not handle
+    
+    Returns:
+        Plain JSON data for the object
+    """
+    if hasattr(obj, "model_dump"):
+        # Match the SDK's own request serialization: only fields that were actually set
+        return obj.model_dump(mode="json", exclude_unset=True)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """
+    Parse a JSON document.
+    
+    Args:
+        data: JSON text as str or bytes
+    
+    Returns:
+        The decoded Python object
+    """
+    if orjson:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dumps(obj: Any, sort_keys: bool = False, default: Optional[Callable[[Any], Any]] = None) -> str:
+    """
+    Serialize an object to a JSON string.
+    
+    Args:
+        obj: JSON-serializable object
+        sort_keys: Whether to emit object keys in sorted order
+        default: Optional callable converting unsupported objects to serializable ones
+    
+    Returns:
+        JSON text as str
+    """
+    if orjson:
+        option = orjson.OPT_SORT_KEYS if sort_keys else 0
+        return orjson.dumps(obj, default=default, option=option).decode("utf-8")
+    return json.dumps(obj, sort_keys=sort_keys, default=default)
+
+
+def dumpb(obj: Any) -> bytes:
+    """
+    Serialize an object to UTF-8 encoded JSON bytes.
+    
+    Args:
+        obj: JSON-serializable object
+    
+    Returns:
+        JSON text as bytes (orjson produces these directly, no str round trip)
+    """
+    if orjson:
+        return orjson.dumps(obj)
+    return json.dumps(obj).encode("utf-8")
@@ -1,6 +1,7 @@
 """Performance monitoring and profiling utilities."""
+import threading
 import time
-from typing import Optional, Dict
+from typing import Optional, Dict, List
 from contextlib import contextmanager
 
 
@@ -9,7 +10,13 @@ class PerformanceMonitor:
     
     def __init__(self):
         """Initialize performance monitor."""
-        self.timings: Dict[str, list] = {}
+        # operation -> [count, total, min, max], durations in integer nanoseconds
+        # (monotonic clock). Running totals keep memory and get_stats constant however
+        # long the session runs; seconds are computed in get_stats.
+        self.timings: Dict[str, List[int]] = {}
+        # measure() runs from tool threads too; the read-modify-write of the totals
+        # is a handful of integer ops, so one lock is held only briefly
+        self._lock = threading.Lock()
     
     @contextmanager
     def measure(self, operation: str):
@@ -23,14 +30,22 @@ class PerformanceMonitor:
             with perf_monitor.measure("api_call"):
                 response = api.call()
         """
-        start_time = time.time()
+        start = time.perf_counter_ns()
         try:
             yield
         finally:
-            duration = time.time() - start_time
-            if operation not in self.timings:
-                self.timings[operation] = []
-            self.timings[operation].append(duration)
+            duration = time.perf_counter_ns() - start
+            with self._lock:
+                totals = self.timings.get(operation)
+                if totals is None:
+                    self.timings[operation] = [1, duration, duration, duration]
+                else:
+                    totals[0] += 1
+                    totals[1] += duration
+                    if duration < totals[2]:
+                        totals[2] = duration
+                    if duration > totals[3]:
+                        totals[3] = duration
     
     def get_stats(self, operation: str) -> Optional[Dict[str, float]]:
         """
@@ -42,17 +57,12 @@ class PerformanceMonitor:
         Returns:
             Dictionary with min, max, avg, total times or None if no data
         """
-        if operation not in self.timings or not self.timings[operation]:
-            return None
-        
-        timings = self.timings[operation]
-        return {
-            "count": len(timings),
-            "min": min(timings),
-            "max": max(timings),
-            "avg": sum(timings) / len(timings),
-            "total": sum(timings)
-        }
+        with self._lock:
+            totals = self.timings.get(operation)
+            if totals is None:
+                return None
+            totals = tuple(totals)
+        return self._format_stats(totals)
     
     def get_all_stats(self) -> Dict[str, Dict[str, float]]:
         """
@@ -61,15 +71,35 @@ class PerformanceMonitor:
         Returns:
             Dictionary mapping operation names to their statistics
         """
+        # One snapshot under the lock, so the report is consistent across operations
+        with self._lock:
+            snapshot = [(operation, tuple(totals)) for operation, totals in self.timings.items()]
+        return {operation: self._format_stats(totals) for operation, totals in snapshot}
+    
+    @staticmethod
+    def _format_stats(totals) -> Dict[str, float]:
+        """
+        Convert running totals to a statistics dictionary in seconds.
+        
+        Args:
+            totals: (count, total, min, max) with durations in nanoseconds
+        
+        Returns:
+            Dictionary with count and min, max, avg, total times
+        """
+        count, total, minimum, maximum = totals
         return {
-            operation: self.get_stats(operation)
-            for operation in self.timings
-            if self.get_stats(operation) is not None
+            "count": count,
+            "min": minimum / 1e9,
+            "max": maximum / 1e9,
+            "avg": total / count / 1e9,
+            "total": total / 1e9
         }
     
     def reset(self):
         """Reset all timing data."""
-        self.timings.clear()
+        with self._lock:
+            self.timings.clear()
     
     def print_report(self):
         """Print a performance report to console."""